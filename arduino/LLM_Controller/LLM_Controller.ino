@@ -6,6 +6,7 @@
 
 #include <DHT.h>
 #include <DHT_U.h>
+#include <util/crc16.h>
 
 
 #define LED_PIN 2
@@ -16,8 +17,71 @@
 #define DHTPIN 6
 #define DHTTYPE DHT11
 
+// 0 = text lines ("DIST:12.3"), 1 = compact binary frames with CRC-16:
+//   0xA5 | type | len | payload | crc16 XMODEM(type, len, payload), little-endian
+// Must match serial_framing in config/settings.yaml
+#define BINARY_FRAMING 0
+
+#define FRAME_SYNC 0xA5
+#define FRAME_DIST 0x01   // int16 distance in mm
+#define FRAME_TEMP 0x02   // int16 temperature x10, uint16 humidity x10
+#define FRAME_TEXT 0x7F   // raw text line
+
 DHT dht(DHTPIN, DHTTYPE);
 
+uint16_t crc16(uint16_t crc, const uint8_t *data, uint8_t len) {
+  while (len--) {
+    crc = _crc_xmodem_update(crc, *data++);
+  }
+  return crc;
+}
+
+void sendFrame(uint8_t type, const uint8_t *payload, uint8_t len) {
+  uint8_t header[2] = {type, len};
+  uint16_t crc = crc16(crc16(0, header, 2), payload, len);
+  Serial.write(FRAME_SYNC);
+  Serial.write(header, 2);
+  Serial.write(payload, len);
+  Serial.write((uint8_t)(crc & 0xFF));
+  Serial.write((uint8_t)(crc >> 8));
+}
+
+void sendText(const String &text) {
+#if BINARY_FRAMING
+  sendFrame(FRAME_TEXT, (const uint8_t *)text.c_str(), min(text.length(), (unsigned int)255));
+#else
+  Serial.println(text);
+#endif
+}
+
+void sendDistance(float distance) {
+#if BINARY_FRAMING
+  int16_t mm = (int16_t)(distance * 10.0 + 0.5);
+  sendFrame(FRAME_DIST, (const uint8_t *)&mm, 2);   // AVR is little-endian
+#else
+  Serial.print("DIST:");
+  Serial.println(distance, 1);
+#endif
+}
+
+void sendTemp(float t, float h) {
+#if BINARY_FRAMING
+  struct { int16_t t; uint16_t h; } payload;
+  payload.t = isnan(t) ? INT16_MIN : (int16_t)(t * 10.0);
+  payload.h = isnan(h) ? 0 : (uint16_t)(h * 10.0);
+  sendFrame(FRAME_TEMP, (const uint8_t *)&payload, 4);
+#else
+  if (isnan(t) || isnan(h)) {
+    Serial.println("TEMP:ERROR");
+    return;
+  }
+  Serial.print("TEMP:");
+  Serial.print(t, 1);
+  Serial.print(",HUM:");
+  Serial.println(h, 1);
+#endif
+}
+
 void setup() {
   Serial.begin(9600);        // USB serial
   pinMode(LED_PIN, OUTPUT);       // onboard LED
@@ -26,7 +90,7 @@ void setup() {
   pinMode(ECHO_PIN, INPUT);
   dht.begin();
   
-  Serial.println("Arduino ready");
+  sendText("Arduino ready");
 }
 
 unsigned long lastPing = 0;
@@ -53,8 +117,7 @@ void loop() {
 
     long duration = pulseIn(ECHO_PIN, HIGH, 30000); // timeout 30ms
     float distance = duration * 0.0343 / 2.0;
-    Serial.print("DIST:");
-    Serial.println(distance, 1);
+    sendDistance(distance);
   }
 
   // DHT every 2 s
@@ -62,14 +125,7 @@ void loop() {
     lastDHT = millis();
     float t = dht.readTemperature();
     float h = dht.readHumidity();
-    if (!isnan(t) && !isnan(h)) {
-      Serial.print("TEMP:");
-      Serial.print(t, 1);
-      Serial.print(",HUM:");
-      Serial.println(h, 1);
-    } else {
-      Serial.println("TEMP:ERROR");
-    }
+    sendTemp(t, h);
   }
 
 }
@@ -79,21 +135,20 @@ void Action(String action) {
 
     if (action.indexOf("LED_ON") >= 0) {
       digitalWrite(LED_PIN, HIGH);
-      Serial.println("LED turned ON");
+      sendText("LED turned ON");
     } else if (action.indexOf("LED_OFF") >= 0) {
       digitalWrite(LED_PIN, LOW);
-      Serial.println("LED turned OFF");
+      sendText("LED turned OFF");
     } else if (action.indexOf("TOGGLE_LED") >= 0) {
       digitalWrite(LED_PIN, LOW);
-      Serial.println("LED toggled");
+      sendText("LED toggled");
     } else if (action.indexOf("MOTOR_ON") >= 0) {
       digitalWrite(MOTOR_PIN, HIGH);
-      Serial.println("MOTOR turned ON");
+      sendText("MOTOR turned ON");
     } else if (action.indexOf("MOTOR_OFF") >= 0) {
       digitalWrite(MOTOR_PIN, LOW);
-      Serial.println("MOTOR turned OFF");
+      sendText("MOTOR turned OFF");
     } else {
-      Serial.print("Unknown command: ");
-      Serial.println(action);
+      sendText("Unknown command: " + action);
     }
 }
\ No newline at end of file
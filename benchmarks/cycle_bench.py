@@ -0,0 +1,252 @@
+# benchmarks/cycle_bench.py
+"""
+End-to-end reasoning-cycle benchmark without Ollama or an Arduino.
+Starts the local fake Ollama server, feeds simulated DIST/TEMP lines into
+the real sensor classes, runs N cycles of (summarization pass + agent.step)
+and reports p50/p95/p99 latency for summarization, retrieval, context
+build, reasoning and the whole cycle, plus prompt tokens per cycle that
+were served from the (simulated) KV cache instead of being prefilled.
+Bridge commands go to a recording transport; the report gives their
+latency from the triggering token and how long before the end of the
+stream they were written.
+
+Run from the repo root:
+    python -m benchmarks.cycle_bench --cycles 50 --ttft 0.05 --rate 200
+    python -m benchmarks.cycle_bench --pipeline   # overlap preparation with generation
+    python -m benchmarks.cycle_bench --budget reasoning=400 --budget cycle=800   # CI gate
+    python -m benchmarks.cycle_bench --metrics metrics.txt   # what GET /metrics would serve
+"""
+import argparse
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.fake_ollama import FakeOllamaConfig, start_fake_ollama
+from benchmarks.sim_sensors import SimulatedSensorFeed, use_hash_embedder
+from llm.client import configure_client, get_client
+from llm.high_level import ReasoningAgent
+from llm.pipeline import StepPipeline
+from sensors.distance_sensor import DistanceSensor
+from sensors.temp_sensor import TempSensor
+from sensors.timeseries import TimeSeriesStore
+from sensors.time_sensor import TimeSensor
+from utils.settings import load_settings
+from utils.tracing import tracer
+
+STAGES = ["summarize", "retrieval", "context", "reasoning", "cycle"]
+
+
+class NullLogger:
+    output_queue = None
+
+    async def aprint(self, msg: str):
+        pass
+
+
+def _timed(samples: list, fn):
+    """Wrap a sync or async callable so each call's duration lands in `samples`."""
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - start)
+    else:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - start)
+    return wrapper
+
+
+class _RecordingTransport:
+    """Stands in for the serial transport; remembers when each command was written."""
+
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(time.perf_counter())
+
+    def is_closing(self):
+        return False
+
+
+def _acting(leads: list, transport: _RecordingTransport, query):
+    """Wrap query_llm so each command's lead over the end of its stream lands in `leads`."""
+    @functools.wraps(query)
+    async def wrapper(*args, **kwargs):
+        first = len(transport.writes)
+        try:
+            return await query(*args, **kwargs)
+        finally:
+            done = time.perf_counter()
+            leads.extend(done - t for t in transport.writes[first:])
+    return wrapper
+
+
+def _percentiles(values):
+    ms = 1000 * np.asarray(values)
+    return {p: float(np.percentile(ms, p)) for p in (50, 95, 99)} if len(ms) else {}
+
+
+async def run(args):
+    runner, url = await start_fake_ollama(
+        FakeOllamaConfig(args.ttft, args.rate, args.tokens, args.fail_rate,
+                         prefill_tokens_per_s=args.prefill_rate)
+    )
+    configure_client(base_url=url, history=100_000)
+
+    settings = {**load_settings(), "memory_db": None, "vector_index": None}
+    agent = ReasoningAgent(settings)
+    agent.logger = NullLogger()
+    if args.real_embedder:
+        await agent.memory_store.wait_until_ready()
+    else:
+        use_hash_embedder(agent.memory_store)
+
+    timeseries = TimeSeriesStore()
+    agent.timeseries = timeseries
+    agent.summarizer.timeseries = timeseries
+    temp, dist, clock = TempSensor(timeseries), DistanceSensor(timeseries), TimeSensor()
+    sensors = [temp, dist, clock]
+    feed = SimulatedSensorFeed({"DIST:": dist.handle_line, "TEMP:": temp.handle_line},
+                               speedup=args.speedup)
+
+    samples = {stage: [] for stage in STAGES}
+    agent.summarizer.summarize_batch = _timed(samples["summarize"], agent.summarizer.summarize_batch)
+    agent.memory_store.retrieve_from_keywords = _timed(
+        samples["retrieval"], agent.memory_store.retrieve_from_keywords)
+    agent.context_builder.compose_messages = _timed(
+        samples["context"], agent.context_builder.compose_messages)
+    agent.query_llm = _timed(samples["reasoning"], agent.query_llm)
+    transport, leads = _RecordingTransport(), []
+    agent.bridge.attach(transport)
+    agent.query_llm = _acting(leads, transport, agent.query_llm)
+
+    pipeline = StepPipeline(agent) if args.pipeline else None
+    step = pipeline.step if pipeline else agent.step
+
+    feed_task = asyncio.create_task(feed.run())
+    memory_task = asyncio.create_task(agent.memory_manager.run())
+    await asyncio.sleep(0.1)
+
+    wall = time.perf_counter()
+    for _ in range(args.cycles):
+        start = time.perf_counter()
+        await agent.summarizer.push_data({s.name: s.read() for s in sensors})
+        await agent.summarizer.summarize_batch()
+        await step({s.name: s.read() for s in sensors})
+        samples["cycle"].append(time.perf_counter() - start)
+    wall = time.perf_counter() - wall
+    requests = [t for t in get_client().recent if t.prompt_tokens]
+
+    if pipeline:
+        pipeline.cancel()
+    for task in (feed_task, memory_task):
+        task.cancel()
+    await get_client().close()
+    await runner.cleanup()
+
+    return {
+        "cycles": args.cycles,
+        "cycles_per_min": 60 * args.cycles / wall,
+        "memories": len(agent.memory_store),
+        "sensor_lines": feed.lines_sent,
+        "prompt_tokens_per_cycle": sum(t.prompt_tokens for t in requests) / args.cycles,
+        "prefilled_per_cycle": sum(t.prompt_eval_count or 0 for t in requests) / args.cycles,
+        "saved_per_cycle": sum(t.prompt_tokens_saved or 0 for t in requests) / args.cycles,
+        "summary_gate": agent.summarizer.gate.stats() if agent.summarizer.gate else None,
+        "pipeline": pipeline.stats() if pipeline else None,
+        "actions": {
+            **agent.bridge.stats(),
+            "latency_ms": _percentiles(list(agent.bridge.latencies)),
+            "lead_ms": _percentiles(leads),
+        },
+        "stages_ms": {stage: _percentiles(v) for stage, v in samples.items()},
+    }
+
+
+def _report(result):
+    print(f"\n{result['cycles']} cycles, {result['cycles_per_min']:.1f} cycles/min, "
+          f"{result['memories']} memories, {result['sensor_lines']} sensor lines")
+    print(f"prompt tokens/cycle: {result['prompt_tokens_per_cycle']:.0f}, "
+          f"prefilled {result['prefilled_per_cycle']:.0f}, "
+          f"served from KV cache {result['saved_per_cycle']:.0f}")
+    if result["summary_gate"]:
+        gate = result["summary_gate"]
+        print(f"summary gate: {gate['calls_saved']}/{gate['checks']} LLM calls saved, "
+              f"{gate['calls_forced']} forced by max age")
+    if result["pipeline"]:
+        p = result["pipeline"]
+        print(f"pipeline: {p['reused']} prepared cycles reused, {p['refreshed']} refreshed, "
+              f"{p['invalidated']} invalidated ({p['discarded_ms']} ms discarded), "
+              f"{100 * p['overlap']:.0f}% of preparation overlapped generation "
+              f"({p['overlapped_ms']} of {p['stage_ms']} ms), waited {p['wait_ms']} ms")
+    a = result["actions"]
+    if a["sent"]:
+        print(f"actions: {a['sent']} sent, {a['deduplicated']} deduplicated, {a['coalesced']} coalesced; "
+              f"p50 {a['latency_ms'][50]:.2f} ms after the triggering token, "
+              f"{a['lead_ms'][50]:.0f} ms before the stream ended")
+    print(f"{'stage':>10} | {'p50 (ms)':>9} | {'p95 (ms)':>9} | {'p99 (ms)':>9}")
+    print("-" * 46)
+    for stage, p in result["stages_ms"].items():
+        if p:
+            print(f"{stage:>10} | {p[50]:>9.2f} | {p[95]:>9.2f} | {p[99]:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--cycles", type=int, default=50)
+    parser.add_argument("--ttft", type=float, default=0.05, help="fake Ollama time to first token (s)")
+    parser.add_argument("--rate", type=float, default=200.0, help="fake Ollama tokens per second")
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--prefill-rate", type=float, default=500.0,
+                        help="fake Ollama prompt tokens prefilled per second")
+    parser.add_argument("--speedup", type=float, default=10.0, help="simulated sensor time compression")
+    parser.add_argument("--pipeline", action="store_true", help="run cycles through StepPipeline")
+    parser.add_argument("--real-embedder", action="store_true", help="load sentence-transformers")
+    parser.add_argument("--json", help="also write results to this file")
+    parser.add_argument("--metrics", help="also write the tracer's Prometheus text to this file")
+    parser.add_argument("--budget", action="append", default=[],
+                        help="stage=ms p95 budget; exit 1 if exceeded (repeatable)")
+    parser.add_argument("--verbose", action="store_true", help="keep component console output")
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as devnull:
+        quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+        with quiet:
+            result = asyncio.run(run(args))
+
+    _report(result)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+    if args.metrics:
+        with open(args.metrics, "w") as f:
+            f.write(tracer.render())
+
+    failed = False
+    for budget in args.budget:
+        stage, limit = budget.split("=")
+        p95 = result["stages_ms"].get(stage, {}).get(95)
+        if p95 is not None and p95 > float(limit):
+            print(f"[cycle_bench] {stage} p95 {p95:.1f} ms exceeds budget {limit} ms")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+# benchmarks/fake_ollama.py
+"""
+Local stand-in for Ollama's /api/generate and /api/chat, for benchmarks
+and CI runs without a GPU box.
+- Streaming (NDJSON) and non-streaming responses
+- Configurable time to first token, token rate and response length
+- Simulated KV-cache prefix reuse: per model, only the part of the prompt
+  after the prefix shared with the previous request is prefilled (and paid for)
+- Failure injection: HTTP 500s and streams cut off mid-response
+- Reports prompt_eval_count / eval_count / eval_duration like Ollama does
+
+Run standalone (then point ollama_url at it):
+    python -m benchmarks.fake_ollama --port 11435 --ttft 0.3 --rate 25
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+from aiohttp import web
+
+from utils.tokens import CHARS_PER_TOKEN
+
+_REASONING = (
+    "Distance is steady near 15cm and temperature is flat. "
+    "Path ahead looks clear so MOTOR_ON and move forward slowly, keep watching distance."
+)
+_SUMMARY = (
+    "Temperature and humidity stay stable. Distance readings hover around the same value "
+    "with small fluctuations and no clear trend."
+)
+
+
+class FakeOllamaConfig:
+    def __init__(self, ttft_s: float = 0.2, tokens_per_s: float = 30.0, tokens: int = 40,
+                 fail_rate: float = 0.0, seed: int = 0, prefill_tokens_per_s: float = 0.0):
+        self.ttft_s = ttft_s
+        self.tokens_per_s = tokens_per_s
+        self.prefill_tokens_per_s = prefill_tokens_per_s  # 0 = prefill is free
+        self.tokens = tokens
+        self.fail_rate = fail_rate
+        self.rng = random.Random(seed)
+
+
+def _tokens(text: str, n: int):
+    words = text.split(" ")
+    return [(words[i % len(words)] + " ") for i in range(n)]
+
+
+def _final(prompt_eval: int, n_tokens: int, gen_s: float) -> dict:
+    return {
+        "done": True,
+        "prompt_eval_count": prompt_eval,
+        "eval_count": n_tokens,
+        "eval_duration": int(gen_s * 1e9),
+    }
+
+
+def _render(body: dict) -> str:
+    """The prompt text the model would see (a minimal chat template for /api/chat)."""
+    if "messages" in body:
+        return "".join(f"<|{m.get('role')}|>\n{m.get('content', '')}<|end|>\n" for m in body["messages"])
+    return body.get("system", "") + body.get("prompt", "")
+
+
+def create_app(config: FakeOllamaConfig) -> web.Application:
+    app = web.Application()
+    app["config"] = config
+    app["requests"] = 0
+    app["kv_cache"] = {}  # model -> last prompt text
+
+    def chunk(chat: bool, text: str) -> dict:
+        if chat:
+            return {"message": {"role": "assistant", "content": text}}
+        return {"response": text}
+
+    async def handle(request: web.Request, chat: bool):
+        cfg = request.app["config"]
+        request.app["requests"] += 1
+        body = await request.json()
+        prompt = _render(body)
+        stream = body.get("stream", True)
+
+        if not prompt:  # warmup / model preload
+            return web.json_response({"model": body.get("model"), "done": True, **chunk(chat, "")})
+
+        failure = cfg.rng.random() < cfg.fail_rate
+        if failure and (not stream or cfg.rng.random() < 0.5):
+            return web.Response(status=500, text='{"error":"injected failure"}')
+
+        # Prefill only what follows the prefix shared with this model's last prompt
+        cache = request.app["kv_cache"]
+        cached = os.path.commonprefix([cache.get(body.get("model"), ""), prompt])
+        cache[body.get("model")] = prompt
+        prompt_eval = max(1, round((len(prompt) - len(cached)) / CHARS_PER_TOKEN))
+        prefill_s = prompt_eval / cfg.prefill_tokens_per_s if cfg.prefill_tokens_per_s else 0.0
+
+        text = _SUMMARY if not stream else _REASONING
+        tokens = _tokens(text, cfg.tokens)
+        await asyncio.sleep(cfg.ttft_s + prefill_s)
+        gen_start = time.perf_counter()
+
+        if not stream:
+            await asyncio.sleep(len(tokens) / cfg.tokens_per_s)
+            gen_s = time.perf_counter() - gen_start
+            return web.json_response({**chunk(chat, "".join(tokens)), **_final(prompt_eval, len(tokens), gen_s)})
+
+        resp = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await resp.prepare(request)
+        cut = cfg.rng.randrange(1, len(tokens)) if failure else None
+        for i, tok in enumerate(tokens):
+            if i == cut:
+                request.transport.close()  # injected mid-stream disconnect
+                return resp
+            await resp.write(json.dumps({**chunk(chat, tok), "done": False}).encode() + b"\n")
+            await asyncio.sleep(1.0 / cfg.tokens_per_s)
+        gen_s = time.perf_counter() - gen_start
+        final = {**chunk(chat, ""), **_final(prompt_eval, len(tokens), gen_s)}
+        await resp.write(json.dumps(final).encode() + b"\n")
+        await resp.write_eof()
+        return resp
+
+    async def generate(request: web.Request):
+        return await handle(request, chat=False)
+
+    async def chat(request: web.Request):
+        return await handle(request, chat=True)
+
+    app.router.add_post("/api/generate", generate)
+    app.router.add_post("/api/chat", chat)
+    return app
+
+
+async def start_fake_ollama(config: FakeOllamaConfig = None, host: str = "127.0.0.1", port: int = 0):
+    """Start the fake server in the running loop. Returns (runner, base_url)."""
+    runner = web.AppRunner(create_app(config or FakeOllamaConfig()), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound = runner.addresses[0][1]
+    return runner, f"http://{host}:{bound}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--ttft", type=float, default=0.2, help="seconds to first token")
+    parser.add_argument("--rate", type=float, default=30.0, help="tokens per second")
+    parser.add_argument("--tokens", type=int, default=40, help="tokens per response")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--prefill-rate", type=float, default=0.0,
+                        help="prompt tokens prefilled per second (0 = free)")
+    args = parser.parse_args()
+    cfg = FakeOllamaConfig(args.ttft, args.rate, args.tokens, args.fail_rate,
+                           prefill_tokens_per_s=args.prefill_rate)
+    web.run_app(create_app(cfg), host=args.host, port=args.port, access_log=None)
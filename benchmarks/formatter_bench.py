@@ -0,0 +1,86 @@
+# benchmarks/formatter_bench.py
+"""
+Scaling benchmark for data_formatter.
+Times format_sensor_batch (list of dicts) and format_sensor_columns (ring
+buffer window) from 1k to 100k backlogged samples at the summarizer's
+budget, and reports time per 1k samples to show linear scaling. The old
+flatten-twice + _cull_rows path is timed alongside up to --legacy-max.
+
+Run from the repo root:
+    python -m benchmarks.formatter_bench [--sizes 1000 10000 100000] [--method minmax]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from utils.data_formatter import LTTB, MINMAX, flatten, format_sensor_batch, format_sensor_columns
+from utils.ring_buffer import DROP_OLDEST, SensorRingBuffer
+
+
+def _samples(n, rng):
+    distance = 60 + np.cumsum(rng.normal(0, 1.5, n))
+    distance[rng.random(n) < 0.01] = 8.0  # short obstacle events
+    return [
+        {"time": round(0.5 * i, 3),
+         "temperature": {"temperature_c": round(22 + 0.001 * i, 1), "humidity": 45.0},
+         "distance": round(float(distance[i]), 1)}
+        for i in range(n)
+    ]
+
+
+def _legacy(batch, max_chars):
+    """The pre-columnar formatter: flatten twice per entry, cull one middle row at a time."""
+    keys = sorted({k for entry in batch for k in flatten(entry)})
+    header = "|".join(keys)
+    rows = ["|".join(str(flatten(entry).get(k, "")) for k in keys) for entry in batch]
+    while True:
+        text = header + "\n" + "\n".join(rows)
+        if len(text) <= max_chars or len(rows) <= 2:
+            return text
+        del rows[len(rows) // 2]
+
+
+def _median_ms(fn, reps):
+    times = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return 1000 * float(np.median(times))
+
+
+def run(sizes, max_chars=1700, method=LTTB, reps=5, legacy_max=20_000):
+    rng = np.random.default_rng(0)
+
+    print(f"{'samples':>8} | {'batch (ms)':>10} | {'ms/1k':>6} | {'columns (ms)':>12} | "
+          f"{'ms/1k':>6} | {'legacy (ms)':>11}")
+    print("-" * 70)
+    for n in sizes:
+        batch = _samples(n, rng)
+        buffer = SensorRingBuffer(n, DROP_OLDEST)
+        for i, sample in enumerate(batch):
+            buffer.append(sample, timestamp=i)
+        window = buffer.window()
+
+        batch_ms = _median_ms(lambda: format_sensor_batch(batch, max_chars, method), reps)
+        columns_ms = _median_ms(
+            lambda: format_sensor_columns(window.keys, window.columns, max_chars, method), reps)
+
+        legacy = "-"
+        if n <= legacy_max:
+            legacy = f"{_median_ms(lambda: _legacy(batch, max_chars), 1):.1f}"
+
+        print(f"{n:>8} | {batch_ms:>10.1f} | {1000 * batch_ms / n:>6.2f} | {columns_ms:>12.1f} | "
+              f"{1000 * columns_ms / n:>6.2f} | {legacy:>11}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--max-chars", type=int, default=1700)
+    parser.add_argument("--method", choices=[LTTB, MINMAX], default=LTTB)
+    parser.add_argument("--reps", type=int, default=5)
+    parser.add_argument("--legacy-max", type=int, default=20_000)
+    args = parser.parse_args()
+    run(args.sizes, args.max_chars, args.method, args.reps, args.legacy_max)
@@ -0,0 +1,82 @@
+# benchmarks/index_bench.py
+"""
+Recall/latency benchmark for the memory index layer against the exact scan.
+Uses clustered synthetic unit vectors (a stand-in for sentence embeddings,
+which are far from uniform) and queries drawn near stored fragments.
+
+Run from the repo root:
+    python -m benchmarks.index_bench [--sizes 10000 100000 300000] [--kinds ivf faiss]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from memory.embedding_matrix import EmbeddingMatrix
+from memory.index import create_index, faiss
+
+
+def _clustered(rng, n, dim, n_topics=2000, spread=0.35):
+    topics = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    v = topics[rng.integers(0, n_topics, n)] + spread * rng.standard_normal((n, dim)).astype(np.float32)
+    v /= np.linalg.norm(v, axis=1, keepdims=True)
+    return v
+
+
+def _latencies_ms(index, queries, top_k):
+    times, results = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        rows, _ = index.search(q, top_k)
+        times.append(time.perf_counter() - t0)
+        results.append(rows[0])
+    times = 1000 * np.array(times)
+    return np.percentile(times, 50), np.percentile(times, 99), results
+
+
+def run(sizes, kinds, dim=384, top_k=3, n_queries=200, nprobe=8):
+    rng = np.random.default_rng(0)
+    print(f"{'fragments':>10} | {'index':>5} | {'build (s)':>9} | {'p50 (ms)':>8} | "
+          f"{'p99 (ms)':>8} | {'recall@' + str(top_k):>8}")
+    print("-" * 66)
+    for n in sizes:
+        vectors = _clustered(rng, n, dim)
+        matrix = EmbeddingMatrix(dim, capacity=n)
+        matrix.append(np.arange(n), vectors)
+
+        picks = rng.integers(0, n, n_queries)
+        queries = vectors[picks] + 0.05 * rng.standard_normal((n_queries, dim)).astype(np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        exact = create_index("flat", matrix)
+        p50, p99, truth = _latencies_ms(exact, queries, top_k)
+        print(f"{n:>10} | {'flat':>5} | {0:>9.2f} | {p50:>8.3f} | {p99:>8.3f} | {1:>8.3f}")
+
+        for kind in kinds:
+            if kind == "faiss" and faiss is None:
+                print(f"{n:>10} | {kind:>5} | (faiss not installed)")
+                continue
+            t0 = time.perf_counter()
+            if kind == "ivf":
+                index = create_index("ivf", matrix, nprobe=nprobe, min_train=0)
+                index.adopt(index.train(matrix.vectors))
+            else:
+                index = create_index(kind, matrix)
+            build = time.perf_counter() - t0
+
+            p50, p99, found = _latencies_ms(index, queries, top_k)
+            recall = np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(found, truth)])
+            print(f"{n:>10} | {kind:>5} | {build:>9.2f} | {p50:>8.3f} | {p99:>8.3f} | {recall:>8.3f}")
+        del matrix, vectors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 300_000])
+    parser.add_argument("--kinds", nargs="+", default=["ivf", "faiss"])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+    run(args.sizes, args.kinds, args.dim, args.top_k, args.queries, args.nprobe)
@@ -0,0 +1,79 @@
+# benchmarks/keyword_bench.py
+"""
+Retrieval latency with and without the keyword prefilter in MemoryStore.
+Fills an in-memory store with synthetic memories (Zipf-distributed words,
+random unit embeddings, no model needed) and times the search step for
+queries drawn from the same vocabulary: dense scan of every fragment vs
+BM25 candidates + dot products on the candidates only.
+
+Run from the repo root:
+    python -m benchmarks.keyword_bench [--sizes 10000 100000] [--vocab 5000]
+"""
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from memory.vector_store import MemoryStore
+
+
+def _texts(rng, n, vocab, words, s=1.1):
+    ranks = np.arange(1, vocab + 1)
+    p = ranks ** -s / np.sum(ranks ** -s)
+    draws = rng.choice(vocab, size=(n, words), p=p)
+    return [" ".join(f"w{w}" for w in row) for row in draws]
+
+
+def _unit(rng, n, dim):
+    v = rng.standard_normal((n, dim)).astype(np.float32)
+    v /= np.linalg.norm(v, axis=1, keepdims=True)
+    return v
+
+
+async def _fill(n, dim, vocab, words, rng, chunk=10_000):
+    store = MemoryStore(dim=dim, index_type="flat")
+    for start in range(0, n, chunk):
+        m = min(chunk, n - start)
+        items = list(zip(_texts(rng, m, vocab, words), ["ctx"] * m))
+        await store.add_encoded(store.make_records(items), _unit(rng, m, dim))
+    return store
+
+
+def _time_ms(store, queries, q_embs, prefilter, top_k):
+    store.keyword_prefilter = prefilter
+    times = []
+    for key, q in zip(queries, q_embs):
+        t0 = time.perf_counter()
+        store._search([key], q[None, :], top_k)
+        times.append(time.perf_counter() - t0)
+    return 1000 * float(np.median(times)), 1000 * float(np.percentile(times, 95))
+
+
+async def run(sizes, dim=384, vocab=5000, words=15, query_words=8, n_queries=200, top_k=3):
+    rng = np.random.default_rng(0)
+    print(f"{'fragments':>10} | {'dense p50/p95 (ms)':>18} | {'hybrid p50/p95 (ms)':>19} | "
+          f"{'candidates':>10} | {'prefiltered':>11}")
+    print("-" * 82)
+    for n in sizes:
+        store = await _fill(n, dim, vocab, words, rng)
+        queries = _texts(rng, n_queries, vocab, query_words)
+        q_embs = _unit(rng, n_queries, dim)
+        candidates = [len(store.keywords.candidates(q)[0]) for q in queries]
+
+        dense = _time_ms(store, queries, q_embs, False, top_k)
+        store.keyword_searches = store.dense_searches = 0
+        hybrid = _time_ms(store, queries, q_embs, True, top_k)
+        share = store.keyword_searches / n_queries
+        print(f"{n:>10} | {dense[0]:>8.2f} / {dense[1]:>7.2f} | {hybrid[0]:>8.2f} / {hybrid[1]:>8.2f} | "
+              f"{np.median(candidates) / n:>9.1%} | {share:>10.0%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--vocab", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=15, help="words per memory")
+    parser.add_argument("--query-words", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(run(args.sizes, vocab=args.vocab, words=args.words, query_words=args.query_words))
@@ -0,0 +1,69 @@
+# benchmarks/quant_bench.py
+"""
+Quantized embedding storage benchmark for EmbeddingMatrix.
+Fills float32, float16 and int8 matrices with the same clustered unit
+vectors (near neighbours are close, so precision matters) and reports:
+- bytes per fragment (vectors, scales and ids)
+- single-query and batched exact top-k latency
+- top-k recall against the float32 results
+
+Run from the repo root:
+    python -m benchmarks.quant_bench [--sizes 10000 100000 1000000] [--top-k 10]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from memory.embedding_matrix import DTYPES, EmbeddingMatrix
+
+
+def _clustered(rng, n, dim, clusters=1000, noise=0.35, chunk=65536):
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    for start in range(0, n, chunk):
+        m = min(chunk, n - start)
+        v = centers[rng.integers(clusters, size=m)] + noise * rng.standard_normal((m, dim)).astype(np.float32)
+        v /= np.linalg.norm(v, axis=1, keepdims=True)
+        yield start, v
+
+
+def _median_ms(fn, reps):
+    times = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return 1000 * float(np.median(times))
+
+
+def run(sizes, dim=384, top_k=10, batch=16, n_queries=64, reps=10):
+    print(f"{'fragments':>10} | {'dtype':>7} | {'bytes/frag':>10} | {'single (ms)':>11} | "
+          f"{'batch/q (ms)':>12} | {f'recall@{top_k}':>9}")
+    print("-" * 76)
+    for n in sizes:
+        rng = np.random.default_rng(0)
+        matrices = {dtype: EmbeddingMatrix(dim, capacity=n, dtype=dtype) for dtype in DTYPES}
+        queries = None
+        for start, v in _clustered(rng, n, dim):
+            if queries is None:
+                queries = v[:n_queries] + 0.05 * rng.standard_normal((n_queries, dim)).astype(np.float32)
+                queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+            for matrix in matrices.values():
+                matrix.append(np.arange(start, start + len(v)), v)
+
+        exact, _ = matrices["float32"].search(queries, top_k)
+        for dtype, matrix in matrices.items():
+            rows, _ = matrix.search(queries, top_k)
+            recall = np.mean([len(set(a) & set(b)) / top_k for a, b in zip(rows.tolist(), exact.tolist())])
+            single = _median_ms(lambda: matrix.search(queries[0], top_k), reps)
+            batched = _median_ms(lambda: matrix.search(queries[:batch], top_k), max(3, reps // 2)) / batch
+            print(f"{n:>10} | {dtype:>7} | {matrix.nbytes / n:>10.0f} | {single:>11.2f} | "
+                  f"{batched:>12.3f} | {recall:>9.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+    run(args.sizes, top_k=args.top_k)
@@ -0,0 +1,77 @@
+# benchmarks/retrieval_bench.py
+"""
+Retrieval latency benchmark for EmbeddingMatrix.
+Fills the matrix with random unit vectors (no embedding model needed) and
+times single-query and batched top-k search from 1k to 1M fragments.
+The old list + np.argsort path is timed alongside up to --legacy-max.
+
+Run from the repo root:
+    python -m benchmarks.retrieval_bench [--sizes 1000 10000 100000 1000000]
+"""
+import argparse
+import time
+
+import numpy as np
+
+from memory.embedding_matrix import EmbeddingMatrix
+
+
+def _unit(rng, n, dim):
+    v = rng.standard_normal((n, dim)).astype(np.float32)
+    v /= np.linalg.norm(v, axis=1, keepdims=True)
+    return v
+
+
+def _median_ms(fn, reps):
+    times = []
+    for _ in range(reps):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return 1000 * float(np.median(times))
+
+
+def _fill(n, dim, rng, chunk=65536):
+    matrix = EmbeddingMatrix(dim)
+    for start in range(0, n, chunk):
+        m = min(chunk, n - start)
+        matrix.append(np.arange(start, start + m), _unit(rng, m, dim))
+    return matrix
+
+
+def run(sizes, dim=384, top_k=3, batch=16, reps=20, legacy_max=100_000):
+    rng = np.random.default_rng(0)
+    queries = _unit(rng, batch, dim)
+
+    print(f"{'fragments':>10} | {'single (ms)':>11} | {'batch/q (ms)':>12} | {'legacy (ms)':>11}")
+    print("-" * 54)
+    for n in sizes:
+        matrix = _fill(n, dim, rng)
+
+        single = _median_ms(lambda: matrix.search(queries[0], top_k), reps)
+        batched = _median_ms(lambda: matrix.search(queries, top_k), max(3, reps // 4)) / batch
+
+        legacy = "-"
+        if n <= legacy_max:
+            as_list = list(matrix.vectors)
+            legacy_ms = _median_ms(
+                lambda: np.argsort(np.dot(as_list, queries[0]))[-top_k:][::-1],
+                max(3, reps // 4),
+            )
+            legacy = f"{legacy_ms:.3f}"
+            del as_list
+
+        print(f"{n:>10} | {single:>11.3f} | {batched:>12.3f} | {legacy:>11}")
+        del matrix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--reps", type=int, default=20)
+    parser.add_argument("--legacy-max", type=int, default=100_000)
+    args = parser.parse_args()
+    run(args.sizes, args.dim, args.top_k, args.batch, args.reps, args.legacy_max)
@@ -0,0 +1,121 @@
+# benchmarks/serial_bench.py
+"""
+Throughput benchmark for SerialProtocol, driven through a fake transport.
+Feeds the same DIST:/TEMP: traffic the Arduino sends, cut into USB-sized
+chunks, through the old str-buffer protocol, the bytearray text framing
+and the binary framing, with a small and a large handler table, and
+reports lines per second and microseconds per line.
+
+Run from the repo root:
+    python -m benchmarks.serial_bench [--lines 200000] [--chunk 64] [--extra-handlers 30]
+"""
+import argparse
+import random
+import struct
+import time
+
+from sensors.serial_dispatcher import (
+    BINARY, FRAME_DIST, FRAME_TEMP, TEXT, SerialProtocol, encode_frame,
+)
+
+
+class FakeSerial:
+    port = "FAKE"
+    baudrate = 115200
+
+
+class FakeTransport:
+    serial = FakeSerial()
+
+    def write(self, data):
+        pass
+
+
+class LegacyProtocol:
+    """The previous str-buffer protocol, kept here for comparison."""
+
+    def __init__(self, handlers: dict):
+        self.handlers = handlers
+        self.buffer = ""
+
+    def data_received(self, data):
+        text = data.decode(errors="ignore")
+        self.buffer += text
+        while "\n" in self.buffer:
+            line, self.buffer = self.buffer.split("\n", 1)
+            line = line.strip()
+            if line:
+                for prefix, func in self.handlers.items():
+                    if line.startswith(prefix):
+                        func(line)
+                        break
+
+
+def _traffic(n: int, rng: random.Random):
+    """(text bytes, binary bytes) for n readings, 4 distance lines per temperature line."""
+    text, binary = bytearray(), bytearray()
+    for i in range(n):
+        if i % 5 == 4:
+            t, h = rng.uniform(18, 30), rng.uniform(30, 70)
+            text += f"TEMP:{t:.1f},HUM:{h:.1f}\n".encode()
+            binary += encode_frame(FRAME_TEMP, struct.pack("<hH", int(t * 10), int(h * 10)))
+        else:
+            d = rng.uniform(2, 400)
+            text += f"DIST:{d:.1f}\n".encode()
+            binary += encode_frame(FRAME_DIST, struct.pack("<h", int(d * 10)))
+    return bytes(text), bytes(binary)
+
+
+def _chunks(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def _handlers(extra: int):
+    counts = {"n": 0}
+
+    def count(line):
+        counts["n"] += 1
+
+    # Unused tags first, so the legacy linear scan has to walk past them
+    handlers = {f"X{i:02d}:": count for i in range(extra)}
+    handlers.update({"DIST:": count, "TEMP:": count})
+    return handlers, counts
+
+
+def _run(make_protocol, chunks, extra):
+    handlers, counts = _handlers(extra)
+    protocol = make_protocol(handlers)
+    if hasattr(protocol, "connection_made"):
+        protocol.connection_made(FakeTransport())
+    t0 = time.perf_counter()
+    for chunk in chunks:
+        protocol.data_received(chunk)
+    return time.perf_counter() - t0, counts["n"]
+
+
+def run(lines=200_000, chunk=64, extra_handlers=30, seed=0):
+    text, binary = _traffic(lines, random.Random(seed))
+    text_chunks, binary_chunks = _chunks(text, chunk), _chunks(binary, chunk)
+    print(f"{lines} readings, text {len(text) / 1e6:.2f} MB, binary {len(binary) / 1e6:.2f} MB, "
+          f"{chunk}-byte chunks")
+
+    cases = [
+        ("legacy str", LegacyProtocol, text_chunks),
+        ("bytearray text", lambda h: SerialProtocol(h, TEXT), text_chunks),
+        ("binary frames", lambda h: SerialProtocol(h, BINARY), binary_chunks),
+    ]
+    print(f"{'protocol':>15} | {'handlers':>8} | {'lines/s':>10} | {'us/line':>8}")
+    print("-" * 52)
+    for extra in (0, extra_handlers):
+        for name, make, chunks in cases:
+            elapsed, n = _run(make, chunks, extra)
+            print(f"{name:>15} | {extra + 2:>8} | {n / elapsed:>10.0f} | {1e6 * elapsed / n:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, default=200_000)
+    parser.add_argument("--chunk", type=int, default=64)
+    parser.add_argument("--extra-handlers", type=int, default=30)
+    args = parser.parse_args()
+    run(args.lines, args.chunk, args.extra_handlers)
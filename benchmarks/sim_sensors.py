@@ -0,0 +1,78 @@
+# benchmarks/sim_sensors.py
+"""
+Hardware-free stand-ins used by the benchmarks.
+- SimulatedSensorFeed: emits the same DIST:/TEMP: lines the Arduino sends,
+  through the same handler table main.py passes to the serial dispatcher
+- HashEmbedder: deterministic 384-d unit vectors, for runs where
+  sentence-transformers is not installed
+"""
+import asyncio
+import hashlib
+import random
+
+import numpy as np
+
+
+class SimulatedSensorFeed:
+    """
+    Random-walk distance (every 500 ms) and temperature/humidity (every 2 s),
+    with occasional obstacle events. `speedup` compresses simulated time.
+    """
+
+    def __init__(self, handlers: dict, speedup: float = 1.0, seed: int = 0):
+        self.handlers = handlers
+        self.speedup = speedup
+        self.rng = random.Random(seed)
+        self.distance = 60.0
+        self.temp = 22.0
+        self.hum = 45.0
+        self.lines_sent = 0
+
+    def distance_line(self) -> str:
+        if self.rng.random() < 0.05:
+            self.distance = self.rng.uniform(5.0, 20.0)  # something moved in front
+        self.distance = min(400.0, max(2.0, self.distance + self.rng.gauss(0.0, 1.5)))
+        return f"DIST:{self.distance:.1f}"
+
+    def temp_line(self) -> str:
+        self.temp += self.rng.gauss(0.0, 0.05)
+        self.hum = min(100.0, max(0.0, self.hum + self.rng.gauss(0.0, 0.2)))
+        return f"TEMP:{self.temp:.1f},HUM:{self.hum:.1f}"
+
+    def emit(self, line: str):
+        tag = line[:line.index(":") + 1]
+        handler = self.handlers.get(tag)
+        if handler:
+            handler(line)
+            self.lines_sent += 1
+
+    async def run(self):
+        tick = 0
+        while True:
+            self.emit(self.distance_line())
+            if tick % 4 == 0:
+                self.emit(self.temp_line())
+            tick += 1
+            await asyncio.sleep(0.5 / self.speedup)
+
+
+class HashEmbedder:
+    """Drop-in for SentenceTransformer.encode with hash-seeded random vectors."""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=True, **kwargs):
+        single = isinstance(texts, str)
+        rows = []
+        for text in [texts] if single else texts:
+            seed = int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+            v = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+            rows.append(v / np.linalg.norm(v))
+        out = np.stack(rows) if rows else np.empty((0, self.dim), dtype=np.float32)
+        return out[0] if single else out
+
+
+def use_hash_embedder(store):
+    """Install a HashEmbedder on a MemoryStore instead of loading the real model."""
+    store.set_model(HashEmbedder(store.matrix.dim))
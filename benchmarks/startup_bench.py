@@ -0,0 +1,52 @@
+# benchmarks/startup_bench.py
+"""
+Startup-time benchmark for the warm-start phases in main.py.
+Runs the phases that do not need hardware (memory store open, embedding
+model load, Ollama model preload) once sequentially and once concurrently,
+and prints the StartupTimer breakdown for each.
+
+Run from the repo root (Ollama should be running for the warmup phase):
+    python -m benchmarks.startup_bench
+"""
+import asyncio
+import time
+
+from llm.high_level import ReasoningAgent
+from utils.startup import StartupTimer
+
+
+async def _open_agent():
+    return ReasoningAgent()
+
+
+async def sequential():
+    timer = StartupTimer()
+    agent = await timer.track("agent + memory store", _open_agent())
+    await timer.track("embedding model", agent.memory_store.wait_until_ready())
+    await timer.track("ollama warmup", agent.warm_up())
+    agent.memory_store.close()
+    return timer
+
+
+async def concurrent():
+    timer = StartupTimer()
+    agent = await timer.track("agent + memory store", _open_agent())
+    agent.memory_store.load_model_async()
+    await asyncio.gather(
+        timer.track("embedding model", agent.memory_store.wait_until_ready()),
+        timer.track("ollama warmup", agent.warm_up()),
+    )
+    agent.memory_store.close()
+    return timer
+
+
+async def run():
+    for name, phase in (("sequential", sequential), ("concurrent", concurrent)):
+        start = time.perf_counter()
+        timer = await phase()
+        print(f"\n=== {name}: {time.perf_counter() - start:.2f}s total ===")
+        print(timer.report())
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
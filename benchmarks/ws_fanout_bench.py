@@ -0,0 +1,144 @@
+# benchmarks/ws_fanout_bench.py
+"""
+WebSocket fan-out load test for the broadcast hub in web/server.py.
+Serves the real FastAPI app with uvicorn on a local port, connects N
+clients (a few of them deliberately slow readers), streams tokens through
+BroadcastLogger at a reasoning-like rate and reports:
+- frames delivered per client and frames dropped for slow ones
+- time spent inside publish (what the reasoning loop pays per frame)
+- event-loop lag seen by a 10 ms ticker standing in for the reasoning loop
+Clients run in the same process and loop, so the lag figure is a worst case.
+
+Run from the repo root:
+    python -m benchmarks.ws_fanout_bench --clients 150 --slow 5 --seconds 5
+"""
+import argparse
+import asyncio
+import socket
+import time
+
+import aiohttp
+import numpy as np
+import uvicorn
+
+from utils.logger import BroadcastLogger
+from web.server import app, hub, output_queue
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _client(url: str, received: list, i: int, delay_s: float, ready: asyncio.Event):
+    async with aiohttp.ClientSession() as session:
+        async with session.ws_connect(url) as ws:
+            ready.set()
+            async for msg in ws:
+                if msg.type != aiohttp.WSMsgType.TEXT:
+                    break
+                received[i] += 1
+                if delay_s > 0:
+                    await asyncio.sleep(delay_s)
+
+
+async def _ticker(lags: list, stop: asyncio.Event, interval: float = 0.01):
+    """Stands in for the reasoning loop: how late does each 10 ms tick fire?"""
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - t0 - interval)
+
+
+async def run(args):
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(
+        app, host="127.0.0.1", port=port, log_level="error",
+        ws_per_message_deflate=args.deflate,
+    ))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    url = f"ws://127.0.0.1:{port}/ws?topics=reasoning"
+    n = args.clients
+    received = [0] * n
+    clients = []
+    for i in range(n):
+        ready = asyncio.Event()
+        delay = args.slow_delay if i < args.slow else 0.0
+        clients.append(asyncio.create_task(_client(url, received, i, delay, ready)))
+        await ready.wait()
+    while len(hub.clients) < n:
+        await asyncio.sleep(0.01)
+
+    logger = BroadcastLogger(output_queue, flush_interval=args.flush_ms / 1000)
+    publish_s, lags, stop = [], [], asyncio.Event()
+    ticker = asyncio.create_task(_ticker(lags, stop))
+
+    # Stream tokens like query_llm does, timing each publish
+    original = hub.publish
+
+    def timed_publish(frame, topic="reasoning"):
+        t0 = time.perf_counter()
+        original(frame, topic)
+        publish_s.append(time.perf_counter() - t0)
+
+    hub.publish = timed_publish
+    tokens = int(args.seconds * args.rate)
+    start = time.perf_counter()
+    for i in range(tokens):
+        await logger.aprint(f"tok{i} ")
+        await asyncio.sleep(max(0.0, start + (i + 1) / args.rate - time.perf_counter()))
+    logger.flush()
+    hub.publish = original
+
+    await asyncio.sleep(args.drain)
+    stop.set()
+    await ticker
+
+    fast = received[args.slow:]
+    result = {
+        "clients": n,
+        "frames_published": hub.published,
+        "fast_min": min(fast) if fast else 0,
+        "fast_mean": float(np.mean(fast)) if fast else 0.0,
+        "slow_mean": float(np.mean(received[:args.slow])) if args.slow else None,
+        "frames_dropped": hub.dropped,
+        "publish_us_p50": 1e6 * float(np.percentile(publish_s, 50)),
+        "publish_us_p99": 1e6 * float(np.percentile(publish_s, 99)),
+        "lag_ms_p50": 1000 * float(np.percentile(lags, 50)),
+        "lag_ms_p99": 1000 * float(np.percentile(lags, 99)),
+    }
+
+    for task in clients:
+        task.cancel()
+    server.should_exit = True
+    await server_task
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=150)
+    parser.add_argument("--slow", type=int, default=5, help="clients that read slowly")
+    parser.add_argument("--slow-delay", type=float, default=0.5, help="seconds per frame for slow clients")
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--rate", type=float, default=50.0, help="tokens per second")
+    parser.add_argument("--flush-ms", type=float, default=50.0)
+    parser.add_argument("--drain", type=float, default=1.0, help="seconds to let clients catch up")
+    parser.add_argument("--deflate", action="store_true", help="enable permessage-deflate")
+    args = parser.parse_args()
+
+    r = asyncio.run(run(args))
+    print(f"{r['clients']} clients, {r['frames_published']} frames published")
+    print(f"fast clients: min {r['fast_min']}, mean {r['fast_mean']:.1f} frames received")
+    if r["slow_mean"] is not None:
+        print(f"slow clients: mean {r['slow_mean']:.1f} frames received, {r['frames_dropped']} dropped in total")
+    print(f"publish: p50 {r['publish_us_p50']:.0f} us, p99 {r['publish_us_p99']:.0f} us")
+    print(f"reasoning-loop tick lag: p50 {r['lag_ms_p50']:.2f} ms, p99 {r['lag_ms_p99']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,168 @@
+# llm/bridge.py
+"""
+Turns reasoning output into Arduino commands while it is still streaming.
+- ActionParser consumes tokens and yields a command as soon as a directive
+  word is complete (the next token starts with a non-word character), so
+  "MOTOR_ON" split across tokens still counts and "MOTOR_ONE" does not
+- Directives are only the explicit Arduino command names (MOTOR_ON,
+  LED_OFF, ...) the reasoning instructions ask for; prose such as "move on"
+  or "no need to stop" never drives an actuator
+- Bridge writes commands to the serial transport from create_dispatcher,
+  one "COMMAND\\n" line each (what LLM_Controller.ino reads)
+- Repeats of an actuator's last command are dropped unless `refresh_s` has
+  passed; commands for an actuator closer than `min_interval_s` to the
+  previous write are held and the latest one is written when the gap ends.
+  MOTOR_OFF is never held
+- Latency is measured from the arrival of the token that completed the
+  directive to the serial write
+"""
+import asyncio
+import re
+import time
+from collections import deque
+
+from utils.tracing import tracer
+
+# Arduino command -> actuator it drives (see Action() in LLM_Controller.ino)
+COMMANDS = {
+    "MOTOR_ON": "motor",
+    "MOTOR_OFF": "motor",
+    "LED_ON": "led",
+    "LED_OFF": "led",
+    "TOGGLE_LED": "led",
+}
+URGENT = {"MOTOR_OFF"}      # written immediately, never held back by the rate limit
+NOT_IDEMPOTENT = {"TOGGLE_LED"}
+
+_WORD = re.compile(r"[A-Za-z0-9_]+")
+
+tracer.histogram("action_latency_seconds", "Time from the token that completed a directive to its serial write.")
+tracer.counter("actions_total", "Recognized directives by command and outcome.")
+
+
+class ActionParser:
+    """Incremental directive recognizer for one token stream."""
+
+    def __init__(self):
+        self._tail = ""  # trailing text that may be an unfinished word
+
+    def feed(self, token: str, t: float = None) -> list:
+        """Returns [(command, t)] for directives completed by `token`."""
+        t = time.perf_counter() if t is None else t
+        text = self._tail + token
+        found = []
+        for m in _WORD.finditer(text):
+            if m.end() == len(text):
+                self._tail = m.group()  # the word may continue in the next token
+                return found
+            self._word(m.group(), t, found)
+        self._tail = ""
+        return found
+
+    def flush(self, t: float = None) -> list:
+        """End of stream: the trailing word is complete now."""
+        t = time.perf_counter() if t is None else t
+        found = []
+        if self._tail:
+            self._word(self._tail, t, found)
+        self._tail = ""
+        return found
+
+    @staticmethod
+    def _word(word: str, t: float, found: list):
+        command = word.upper()
+        if command in COMMANDS:
+            found.append((command, t))
+
+
 class Bridge:
-    def process_reasoning(self, reasoning_text: str):
-        print("\n[Bridge] Received reasoning to act on.")
-        # Example: extract actions and forward them to Arduino
-        if "move" in reasoning_text.lower():
-            print("[Bridge] Would send: MOTOR_ON")
-        if "stop" in reasoning_text.lower():
-            print("[Bridge] Would send: MOTOR_OFF")
\ No newline at end of file
+    def __init__(self, transport=None, min_interval_s: float = 0.25, refresh_s: float = 5.0):
+        self.transport = transport
+        self.min_interval_s = min_interval_s
+        self.refresh_s = refresh_s
+        self.parser = ActionParser()
+        self._last = {}      # actuator -> (command, perf_counter of write)
+        self._pending = {}   # actuator -> (command, trigger time, TimerHandle)
+        self.latencies = deque(maxlen=256)
+        self.counts = {"sent": 0, "deduplicated": 0, "coalesced": 0, "failed": 0}
+
+    def attach(self, transport):
+        """Write commands to this serial transport (from create_dispatcher)."""
+        self.transport = transport
+
+    # --------------------------------------------------------------
+    # Streaming
+    # --------------------------------------------------------------
+    def begin(self):
+        """Start a new reasoning stream."""
+        self.parser = ActionParser()
+
+    def feed(self, token: str, t: float = None):
+        for command, trigger in self.parser.feed(token, t):
+            self.dispatch(command, trigger)
+
+    def end(self):
+        for command, trigger in self.parser.flush():
+            self.dispatch(command, trigger)
+
+    # --------------------------------------------------------------
+    # Deduplication and rate limiting
+    # --------------------------------------------------------------
+    def dispatch(self, command: str, trigger: float):
+        actuator = COMMANDS[command]
+        now = time.perf_counter()
+        pending = self._pending.pop(actuator, None)
+        if pending:
+            pending[2].cancel()
+            self.counts["coalesced"] += 1
+            tracer.inc("actions_total", command=pending[0], outcome="coalesced")
+
+        last, sent_at = self._last.get(actuator, (None, float("-inf")))
+        if command == last and command not in NOT_IDEMPOTENT and now - sent_at < self.refresh_s:
+            self.counts["deduplicated"] += 1
+            tracer.inc("actions_total", command=command, outcome="deduplicated")
+            return
+
+        wait = sent_at + self.min_interval_s - now
+        if wait <= 0 or command in URGENT:
+            self._write(actuator, command, trigger)
+            return
+        handle = asyncio.get_running_loop().call_later(wait, self._release, actuator)
+        self._pending[actuator] = (command, trigger, handle)
+
+    def _release(self, actuator: str):
+        command, trigger, _ = self._pending.pop(actuator)
+        self._write(actuator, command, trigger)
+
+    def _write(self, actuator: str, command: str, trigger: float):
+        if self.transport is None:
+            print(f"[Bridge] Would send: {command}")
+        elif self.transport.is_closing():
+            self.counts["failed"] += 1
+            tracer.inc("actions_total", command=command, outcome="failed")
+            print(f"[Bridge] Serial closed, dropped: {command}")
+            return
+        else:
+            self.transport.write(f"{command}\n".encode())
+        latency = time.perf_counter() - trigger
+        self._last[actuator] = (command, time.perf_counter())
+        self.latencies.append(latency)
+        self.counts["sent"] += 1
+        tracer.inc("actions_total", command=command, outcome="sent")
+        tracer.observe("action_latency_seconds", latency, command=command)
+        print(f"[Bridge] Sent {command} ({latency * 1000:.1f} ms after its token)")
+
+    def cancel(self):
+        """Drop held commands (shutdown)."""
+        for _, _, handle in self._pending.values():
+            handle.cancel()
+        self._pending.clear()
+
+    def stats(self) -> dict:
+        lat = sorted(self.latencies)
+        return {
+            **self.counts,
+            "pending": len(self._pending),
+            "latency_ms_p50": round(lat[len(lat) // 2] * 1000, 2) if lat else None,
+            "latency_ms_max": round(lat[-1] * 1000, 2) if lat else None,
+        }
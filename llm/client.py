@@ -0,0 +1,289 @@
+# llm/client.py
+"""
+Shared HTTP client for every Ollama call.
+- One long-lived aiohttp session and connection pool (keep-alive reuse)
+- Streaming NDJSON parser that splits raw bytes on newlines
+- Per-request timings: connect time, time to first token, tokens/s, and
+  prompt tokens Ollama did not have to prefill (KV-cache prefix reuse)
+"""
+import asyncio
+import json
+import time
+from collections import deque
+
+import aiohttp
+
+from utils.settings import load_settings
+from utils.tracing import tracer
+from utils.tokens import estimate_prompt_tokens, estimator, prompt_chars, template_tokens
+
+
+class OllamaHTTPError(aiohttp.ClientError):
+    """Non-200 response from Ollama."""
+
+    def __init__(self, status: int, body: str):
+        super().__init__(f"HTTP {status}: {body}")
+        self.status = status
+        self.body = body
+
+
+class RequestTimings:
+    """Timing record for one Ollama request (seconds unless noted)."""
+
+    def __init__(self, model: str, endpoint: str):
+        self.model = model
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.queue_wait_s = None      # set by callers that go through the LLM scheduler
+        self.connect_s = 0.0          # 0 when a pooled connection was reused
+        self.reused_connection = True
+        self.ttft_s = None
+        self.total_s = None
+        self.tokens = 0
+        self.prompt_tokens = None     # estimated size of the whole prompt
+        self.prompt_eval_count = None # tokens Ollama actually prefilled
+        self.eval_count = None
+        self.eval_duration_s = None
+
+    @property
+    def tokens_per_s(self):
+        """Ollama's own eval rate when reported, else measured after the first token."""
+        if self.eval_count and self.eval_duration_s:
+            return self.eval_count / self.eval_duration_s
+        if self.tokens and self.total_s and self.ttft_s is not None and self.total_s > self.ttft_s:
+            return self.tokens / (self.total_s - self.ttft_s)
+        return None
+
+    @property
+    def prompt_tokens_saved(self):
+        """Prompt tokens served from the KV cache instead of being prefilled (estimate)."""
+        if self.prompt_tokens is None or self.prompt_eval_count is None:
+            return None
+        return max(0, self.prompt_tokens - self.prompt_eval_count)
+
+    def first_token(self):
+        if self.ttft_s is None:
+            self.ttft_s = time.perf_counter() - self.started
+
+    def finish(self, final: dict = None):
+        self.total_s = time.perf_counter() - self.started
+        if final:
+            self.prompt_eval_count = final.get("prompt_eval_count", self.prompt_eval_count)
+            self.eval_count = final.get("eval_count", self.eval_count)
+            if final.get("eval_duration"):
+                self.eval_duration_s = final["eval_duration"] / 1e9
+
+    def as_dict(self) -> dict:
+        return {
+            "model": self.model,
+            "endpoint": self.endpoint,
+            "queue_wait_s": self.queue_wait_s,
+            "connect_s": self.connect_s,
+            "reused_connection": self.reused_connection,
+            "ttft_s": self.ttft_s,
+            "total_s": self.total_s,
+            "tokens": self.eval_count or self.tokens,
+            "tokens_per_s": self.tokens_per_s,
+            "prompt_tokens": self.prompt_tokens,
+            "prompt_eval_count": self.prompt_eval_count,
+            "prompt_tokens_saved": self.prompt_tokens_saved,
+        }
+
+    def __str__(self):
+        ttft = f"{self.ttft_s * 1000:.0f} ms" if self.ttft_s is not None else "-"
+        rate = f"{self.tokens_per_s:.1f} tok/s" if self.tokens_per_s else "-"
+        conn = "reused" if self.reused_connection else f"{self.connect_s * 1000:.1f} ms"
+        total = f"{self.total_s:.2f}s" if self.total_s is not None else "-"
+        wait = f"queue {self.queue_wait_s * 1000:.0f} ms, " if self.queue_wait_s is not None else ""
+        prefill = ""
+        if self.prompt_tokens_saved is not None:
+            prefill = f", prefill {self.prompt_eval_count}/{self.prompt_tokens} tok"
+        return f"{self.model}: {wait}connect {conn}, ttft {ttft}{prefill}, {rate}, total {total}"
+
+
+class NDJSONParser:
+    """
+    Incremental newline-delimited JSON parser.
+    Splits raw bytes on b"\\n" and only decodes complete lines.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, chunk: bytes) -> list:
+        self._buffer += chunk
+        end = self._buffer.rfind(b"\n")
+        if end < 0:
+            return []
+        lines = bytes(self._buffer[:end]).split(b"\n")
+        del self._buffer[:end + 1]
+        return [obj for obj in map(_loads, lines) if obj is not None]
+
+    def flush(self) -> list:
+        """Parse whatever is left once the stream has ended."""
+        rest, self._buffer = bytes(self._buffer), bytearray()
+        obj = _loads(rest)
+        return [obj] if obj is not None else []
+
+
+def _loads(line: bytes):
+    if not line.strip():
+        return None
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError:
+        return None
+
+
+# ---------------------------------------------------------------------
+# Client
+# ---------------------------------------------------------------------
+class OllamaClient:
+    """
+    Owns the one aiohttp session used for every Ollama call.
+    Obtain the shared instance with get_client().
+    """
+
+    def __init__(self, base_url: str = "http://localhost:11434", max_connections: int = 4,
+                 keepalive_s: float = 300.0, history: int = 100):
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.keepalive_s = keepalive_s
+        self.recent = deque(maxlen=history)   # RequestTimings of the latest requests
+        self._session = None
+        self._loop = None
+
+    async def session(self) -> aiohttp.ClientSession:
+        """The shared session, created on first use (and again if its loop is gone)."""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._loop is not loop:
+            trace = aiohttp.TraceConfig()
+            trace.on_connection_create_start.append(_on_connect_start)
+            trace.on_connection_create_end.append(_on_connect_end)
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections, keepalive_timeout=self.keepalive_s
+            )
+            self._session = aiohttp.ClientSession(connector=connector, trace_configs=[trace])
+            self._loop = loop
+        return self._session
+
+    async def generate(self, payload: dict, endpoint: str = "/api/generate", timeout_s: float = 30.0):
+        """Non-streaming request. Returns (response dict, RequestTimings)."""
+        timings = RequestTimings(payload.get("model"), endpoint)
+        timings.prompt_tokens = estimate_prompt_tokens(payload)
+        session = await self.session()
+        async with session.post(
+            self.base_url + endpoint,
+            json={**payload, "stream": False},
+            timeout=aiohttp.ClientTimeout(total=timeout_s),
+            trace_request_ctx=timings,
+        ) as resp:
+            if resp.status != 200:
+                raise OllamaHTTPError(resp.status, await resp.text())
+            data = await resp.json(content_type=None)
+        timings.first_token()
+        timings.finish(data)
+        self._record(payload, timings)
+        return data, timings
+
+    async def stream(self, payload: dict, timings: RequestTimings = None,
+                     endpoint: str = "/api/generate", timeout_s: float = 30.0):
+        """
+        Streaming request. Yields each parsed NDJSON object as it arrives and
+        fills `timings` (pass one in to read it after the loop).
+        """
+        timings = timings or RequestTimings(payload.get("model"), endpoint)
+        if timings.prompt_tokens is None:
+            timings.prompt_tokens = estimate_prompt_tokens(payload)
+        session = await self.session()
+        parser = NDJSONParser()
+        final = None
+        try:
+            async with session.post(
+                self.base_url + endpoint,
+                json={**payload, "stream": True},
+                timeout=aiohttp.ClientTimeout(total=timeout_s),
+                trace_request_ctx=timings,
+            ) as resp:
+                if resp.status != 200:
+                    raise OllamaHTTPError(resp.status, await resp.text())
+                async for chunk in resp.content.iter_any():
+                    for obj in parser.feed(chunk):
+                        final = _count_token(obj, timings)
+                        yield obj
+                for obj in parser.flush():
+                    final = _count_token(obj, timings)
+                    yield obj
+        finally:
+            timings.finish(final if final and final.get("done") else None)
+            self._record(payload, timings)
+
+    def _record(self, payload: dict, timings: RequestTimings):
+        self.recent.append(timings)
+        model = timings.model
+        tracer.inc("llm_requests_total", model=model)
+        tracer.observe("llm_ttft_seconds", timings.ttft_s, model=model)
+        tracer.observe("llm_request_seconds", timings.total_s, model=model)
+        tracer.observe("llm_tokens_per_second", timings.tokens_per_s, model=model)
+        tracer.observe("llm_prompt_eval_tokens", timings.prompt_eval_count, model=model)
+        tracer.inc("llm_prompt_tokens_saved_total", timings.prompt_tokens_saved or 0, model=model)
+        if timings.prompt_eval_count:
+            estimator.observe(prompt_chars(payload), timings.prompt_eval_count - template_tokens(payload))
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+def token_text(obj: dict) -> str:
+    """Generated text of one chunk from /api/generate or /api/chat."""
+    if "response" in obj:
+        return obj["response"]
+    return (obj.get("message") or {}).get("content", "")
+
+
+def _count_token(obj: dict, timings: RequestTimings):
+    if token_text(obj):
+        timings.first_token()
+        timings.tokens += 1
+    return obj
+
+
+async def _on_connect_start(session, ctx, params):
+    timings = ctx.trace_request_ctx
+    if isinstance(timings, RequestTimings):
+        timings.reused_connection = False
+        ctx.connect_started = time.perf_counter()
+
+
+async def _on_connect_end(session, ctx, params):
+    timings = ctx.trace_request_ctx
+    if isinstance(timings, RequestTimings):
+        timings.connect_s = time.perf_counter() - ctx.connect_started
+
+
+# ---------------------------------------------------------------------
+# Shared instance
+# ---------------------------------------------------------------------
+_client = None
+
+
+def get_client() -> OllamaClient:
+    """Process-wide OllamaClient configured from settings.yaml."""
+    global _client
+    if _client is None:
+        settings = load_settings()
+        _client = OllamaClient(
+            base_url=settings.get("ollama_url", "http://localhost:11434"),
+            max_connections=settings.get("ollama_max_connections", 4),
+            keepalive_s=settings.get("ollama_keepalive_s", 300),
+        )
+    return _client
+
+
+def configure_client(**kwargs) -> OllamaClient:
+    """Replace the shared client (e.g. to point benchmarks at a local fake server)."""
+    global _client
+    _client = OllamaClient(**kwargs)
+    return _client
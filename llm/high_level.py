@@ -1,24 +1,79 @@
 import asyncio
-import json
 import time
+from contextlib import aclosing, contextmanager
+
 import aiohttp
 
 from utils.context_builder import ContextBuilder
 from memory.vector_store import MemoryStore
 from llm.summarizer import Summarizer
 from llm.bridge import Bridge
-from utils.llm_lock import global_llm_lock
+from llm.client import RequestTimings, get_client, token_text
+from llm.scheduler import REASONING, get_scheduler
 from memory.memory_manager import MemoryManager
-from memory.vector_store import MemoryStore
+from utils.change_gate import ChangeGate
+from utils.settings import load_settings, resolve_path
+
+
+class PreparedStep:
+    """Inputs of one reasoning cycle, built ahead of the LLM call."""
+
+    def __init__(self, sensor_data: dict):
+        self.sensor_data = sensor_data
+        self.summary = None
+        self.memories = None
+        self.memory_version = None  # MemoryStore.version the memories were retrieved at
+        self.messages = None
+        self.packed = None   # ContextBuilder.last_tokens for these messages
+        self.stages = {}     # stage -> (start, end), perf_counter seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = (start, time.perf_counter())
 
 
 class ReasoningAgent:
-    def __init__(self):
-        self.memory_store = MemoryStore()
-        self.memory_manager = MemoryManager(self.memory_store)
-        self.summarizer = Summarizer()
-        self.bridge = Bridge()
-        self.context_builder = ContextBuilder()
+    def __init__(self, settings: dict = None):
+        settings = load_settings() if settings is None else settings
+        self.memory_store = MemoryStore(
+            dim=settings.get("embedding_dim", 384),
+            db_path=resolve_path(settings.get("memory_db")),
+            index_type=settings.get("vector_index_type", "auto"),
+            index_path=resolve_path(settings.get("vector_index")),
+            keyword_prefilter=settings.get("keyword_prefilter", True),
+            keyword_weight=settings.get("keyword_weight", 0.3),
+            embedding_dtype=settings.get("embedding_dtype", "float32"),
+        )
+        self.memory_manager = MemoryManager(
+            self.memory_store,
+            consolidate_every=settings.get("memory_consolidate_s", 60),
+            dedup_threshold=settings.get("memory_dedup_threshold", 0.95),
+            capacity=settings.get("memory_capacity"),
+            eviction=settings.get("memory_eviction", "lru"),
+        )
+        gate = None
+        if settings.get("summary_gate", True):
+            gate = ChangeGate(
+                settings.get("summary_thresholds"),
+                max_defer_s=settings.get("summary_max_defer_s", 60.0),
+                min_span_s=settings.get("summary_min_span_s", 10.0),
+            )
+        self.summarizer = Summarizer(gate=gate, horizon_s=settings.get("summary_horizon_s", 3600))
+        self.model = settings.get("ollama_model", "phi3")
+        self.keep_alive = "30m"
+        self.bridge = Bridge(
+            min_interval_s=settings.get("action_min_interval_s", 0.25),
+            refresh_s=settings.get("action_refresh_s", 5.0),
+        )
+        self.num_ctx = settings.get("reasoning_num_ctx", 2048)
+        self.context_builder = ContextBuilder(
+            num_ctx=self.num_ctx,
+            reserve_output=settings.get("reasoning_reserve_tokens", 256),
+        )
         self.initial_prompt = (
             "You are a high-level reasoning system.\n"
             "You think step-by-step, remember experiences, and plan actions.\n"
@@ -27,6 +82,12 @@ class ReasoningAgent:
 
         # Logger placeholder — set externally (e.g., in main.py)
         self.logger = None
+        # Startup timer — set by main.py to record time to first reasoning token
+        self.startup_timer = None
+        # Full-rate sensor history (TimeSeriesStore) — set by main.py
+        self.timeseries = None
+        self.trend_horizon_s = settings.get("reasoning_trend_s", 60)
+        self.last_timings = None
 
     # -----------------------------------------------------------
     # Async initializer (external summarizer control)
@@ -48,74 +109,174 @@ class ReasoningAgent:
         """Graceful stop for summarizer (if needed)."""
         self.summarizer.stop()
 
+    async def warm_up(self, timeout_s: float = 120.0):
+        """
+        Preload the reasoning and summarizer models in Ollama concurrently.
+        An empty-prompt request loads the model and pins it with keep_alive,
+        so the first real query does not pay the cold model-load cost.
+        """
+        async def load(model, num_ctx):
+            # Same num_ctx as the real requests, or Ollama reloads the model
+            payload = {"model": model, "keep_alive": self.keep_alive, "options": {"num_ctx": num_ctx}}
+            try:
+                _, timings = await get_client().generate(payload, timeout_s=timeout_s)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"[ReasoningAgent] Warmup of {model} failed: {e}")
+                return False
+            print(f"[ReasoningAgent] {model} loaded in {timings.total_s:.1f}s.")
+            return True
+
+        results = await asyncio.gather(
+            load(self.model, self.num_ctx),
+            load(self.summarizer.model, self.summarizer.num_ctx),
+        )
+        return all(results)
+
     # -----------------------------------------------------------
     # Reasoning cycle
     # -----------------------------------------------------------
     async def step(self, sensor_data: dict):
         """Perform one reasoning cycle."""
-        # Push new sensor data into summarizer queue
+        # Push new sensor data into the summarizer buffer
         await self.summarizer.push_data(sensor_data)
+        prepared = await self.prepare(sensor_data)
+        return await self.execute(prepared)
+
+    async def prepare(self, sensor_data: dict, summary: str = None, memories: list = None,
+                      memory_version: int = None, context: bool = True):
+        """
+        Everything before the LLM call: summary, retrieval and context.
+        Pass `summary` / `memories` (and their `memory_version`) to reuse
+        them from an earlier preparation; `context=False` stops before the
+        context is built. Nothing is logged here, so it can run ahead of
+        the current cycle.
+        """
+        prepared = PreparedStep(sensor_data)
 
         # Retrieve latest summary (updated by external summarization loop)
-        short_context = await self.summarizer.get_summary()
-        await self._log(f"[Agent] Summarizer output: {short_context}")
+        with prepared.stage("summary"):
+            if summary is None:
+                summary = await self.summarizer.get_summary()
+        prepared.summary = summary
 
         # Retrieve relevant memories
-        memories = await self.memory_store.retrieve_from_keywords(short_context)
-
-        # Build full reasoning context
-        full_context = self.context_builder.compose(
-            initial=self.initial_prompt,
-            memory=memories,
-            short_term=short_context,
-            sensors=sensor_data,
+        with prepared.stage("retrieval"):
+            if memories is None:
+                memory_version = self.memory_store.version
+                memories = await self.memory_store.retrieve_from_keywords(summary)
+        prepared.memories = memories
+        prepared.memory_version = memory_version
+        if not context:
+            return prepared
+
+        with prepared.stage("context"):
+            # Snapshot plus rollups of every sample over the trend horizon
+            sensors = sensor_data
+            if self.timeseries is not None:
+                trend = {
+                    name: {k: v for k, v in stats.items() if v is not None}
+                    for name, stats in self.timeseries.summary(self.trend_horizon_s).items()
+                }
+                sensors = {**sensor_data, f"last {self.trend_horizon_s}s": trend}
+
+            # Build reasoning context: static system prefix + this cycle's content
+            prepared.messages = self.context_builder.compose_messages(
+                initial=self.initial_prompt,
+                memory=memories,
+                short_term=summary,
+                sensors=sensors,
+            )
+            prepared.packed = dict(self.context_builder.last_tokens)
+        return prepared
+
+    async def execute(self, prepared: "PreparedStep") -> str:
+        """Stream the reasoning for a prepared cycle, then store and act on it."""
+        await self._log(f"[Agent] Summarizer output: {prepared.summary}")
+        full_context = "\n".join(m["content"] for m in prepared.messages)
+        packed = prepared.packed
+        await self._log(
+            f"[Agent] Packed context: ~{packed['total']}/{self.num_ctx} tokens "
+            f"(sensors {packed['sensors']}, short-term {packed['short_term']}, "
+            f"memory {packed['memory']}, {packed['memories_dropped']} memories dropped)"
         )
-        await self._log(f"[payload size: ] + {len(full_context)}")
 
         await self._log("\n[Agent] Full Context:\n" + full_context)
         await self._log("\n[Agent] Reasoning Output:\n")
 
         # Query reasoning LLM asynchronously
         #reasoning = await self.query_llm(full_context)
-        reasoning = await self.query_llm(full_context, model="phi3", timeout_s=30.0)
+        # (actions go to the bridge while the output streams)
+        reasoning = await self.query_llm(prepared.messages, model=self.model, timeout_s=30.0, act=True)
 
         await self._log("\n[Agent] Finished Reasoning Output\n")
 
-        # Store reasoning in memory and forward actions to bridge
-        await self.memory_manager.push_memory(reasoning, short_context)
-        self.bridge.process_reasoning(reasoning)
+        # Store reasoning in memory
+        await self.memory_manager.push_memory(reasoning, prepared.summary)
+        return reasoning
 
     # -----------------------------------------------------------
     # Asynchronous LLM query (streaming)
     # -----------------------------------------------------------
-    async def query_llm(self, prompt: str, model="phi3", timeout_s: float = 8.0):
-        url = "http://localhost:11434/api/generate"
-        payload = {"model": model, "prompt": prompt, "stream": True}
+    async def query_llm(self, prompt, model=None, timeout_s: float = 8.0, act: bool = False):
+        """
+        Stream a reasoning completion. `prompt` is a list of chat messages
+        (sent to /api/chat, so the system prefix stays KV-cached) or a plain
+        string (sent to /api/generate). With `act`, every token also goes to
+        the bridge, which sends commands as soon as a directive is complete.
+        """
+        payload = {
+            "model": model or self.model,
+            "keep_alive": self.keep_alive,
+            "options": {"num_ctx": self.num_ctx},
+        }
+        if isinstance(prompt, str):
+            payload["prompt"], endpoint = prompt, "/api/generate"
+        else:
+            payload["messages"], endpoint = prompt, "/api/chat"
+
+        parts = []
+        timings = RequestTimings(payload["model"], endpoint)
+        queued_at = time.perf_counter()
 
-        output = ""
-        start_time = time.time()
+        async def run():
+            # Timeout counts from the moment the scheduler grants a slot
+            timings.queue_wait_s = time.perf_counter() - queued_at
+            start_time = time.time()
+            stream = get_client().stream(payload, timings, endpoint=endpoint, timeout_s=timeout_s + 2)
+            if act:
+                self.bridge.begin()
+            try:
+                async with aclosing(stream):
+                    async for data in stream:
+                        if time.time() - start_time > timeout_s:
+                            break
+                        token = token_text(data)
+                        if token:
+                            if act:
+                                self.bridge.feed(token)  # before logging, which may await
+                            if not parts and self.startup_timer:
+                                self._mark_first_token()
+                            parts.append(token)
+                            await self._log(token, end="")
+            finally:
+                if act:
+                    self.bridge.end()
 
         try:
-            async with global_llm_lock:  # ⬅ same global lock
-                async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout_s + 2)) as session:
-                    async with session.post(url, json=payload) as resp:
-                        async for line in resp.content:
-                            if time.time() - start_time > timeout_s:
-                                break
-                            if not line.strip():
-                                continue
-                            try:
-                                data = json.loads(line.decode())
-                                token = data.get("response", "")
-                                if token:
-                                    output += token
-                                    await self._log(token, end="")
-                            except json.JSONDecodeError:
-                                continue
+            await get_scheduler().submit(run, cls="reasoning", priority=REASONING)
         except Exception as e:
             await self._log(f"[Agent] LLM query failed: {e}")
 
-        return output.strip()
+        self.last_timings = timings
+        print(f"[Agent] LLM timings: {timings}")
+        return "".join(parts).strip()
+
+    def _mark_first_token(self):
+        """Report the startup breakdown once, at the first reasoning token."""
+        if "first reasoning token" in self.startup_timer.marks:
+            return
+        self.startup_timer.mark("first reasoning token")
+        print(self.startup_timer.report())
 
     # -----------------------------------------------------------
     # Internal logging helper
@@ -0,0 +1,113 @@
+# llm/pipeline.py
+"""
+Pipelined reasoning cycles.
+While cycle N's reasoning streams, the next cycle's summary and
+retrieval are prepared ahead. Cycle N+1 then takes them if they still hold:
+- summary changed: both are redone and the speculative time is discarded
+- fragments were stored since the retrieval (cycle N's reasoning usually
+  is by then): retrieval runs again, and MemoryStore answers it from the
+  speculative result by scoring only the new fragments against it
+- otherwise both are reused
+The context (sensor snapshot and trend) is always built from cycle N+1's
+own snapshot, so it never lags. Per-stage time of the work each cycle
+used, the share of it hidden behind generation, and the speculative time
+thrown away are reported.
+"""
+import asyncio
+import time
+
+STAGES = ("summary", "retrieval", "context")
+
+
+class StepPipeline:
+    def __init__(self, agent):
+        self.agent = agent
+        self._next = None                   # task preparing the next cycle
+        self._window = None                 # (start, end) of the generation it overlapped
+
+        self.cycles = 0
+        self.reused = 0
+        self.refreshed = 0  # retrieval topped up with fragments stored since
+        self.cold = 0
+        self.invalidated = {"summary": 0, "failed": 0}
+        self.stage_s = dict.fromkeys(STAGES, 0.0)    # work the cycles used
+        self.overlap_s = dict.fromkeys(STAGES, 0.0)  # ... of which ran during generation
+        self.discarded_s = 0.0  # speculative work thrown away
+        self.wait_s = 0.0       # time a cycle waited for its speculative preparation
+
+    async def step(self, sensor_data: dict) -> str:
+        """One reasoning cycle; starts preparing the next one while generating."""
+        agent = self.agent
+        await agent.summarizer.push_data(sensor_data)
+        prepared = await self._take(sensor_data)
+
+        generation = asyncio.create_task(agent.execute(prepared))
+        started = time.perf_counter()
+        self._next = asyncio.create_task(self._speculate())
+        reasoning = await generation
+        self._window = (started, time.perf_counter())
+        self.cycles += 1
+        return reasoning
+
+    def cancel(self):
+        if self._next is not None:
+            self._next.cancel()
+            self._next = None
+
+    def stats(self) -> dict:
+        total = sum(self.stage_s.values())
+        return {
+            "cycles": self.cycles,
+            "reused": self.reused,
+            "refreshed": self.refreshed,
+            "cold": self.cold,
+            "invalidated": dict(self.invalidated),
+            "stage_ms": {k: round(1000 * v, 1) for k, v in self.stage_s.items()},
+            "overlapped_ms": {k: round(1000 * v, 1) for k, v in self.overlap_s.items()},
+            "overlap": round(sum(self.overlap_s.values()) / total, 3) if total else 0.0,
+            "discarded_ms": round(1000 * self.discarded_s, 1),
+            "wait_ms": round(1000 * self.wait_s, 1),
+        }
+
+    # --------------------------------------------------------------
+    async def _speculate(self):
+        await asyncio.sleep(0)  # let the generation request go out first
+        return await self.agent.prepare(None, context=False)
+
+    async def _take(self, sensor_data: dict):
+        """This cycle's inputs, reusing the speculative summary and memories if still valid."""
+        task, self._next = self._next, None
+        if task is None:
+            self.cold += 1
+            return self._account(await self.agent.prepare(sensor_data))
+
+        waited = time.perf_counter()
+        try:
+            ahead = await task
+        except Exception as e:
+            print(f"[StepPipeline] Speculative preparation failed: {e}")
+            self.invalidated["failed"] += 1
+            return self._account(await self.agent.prepare(sensor_data))
+        finally:
+            self.wait_s += time.perf_counter() - waited
+
+        summary = await self.agent.summarizer.get_summary()
+        if summary != ahead.summary:
+            self.invalidated["summary"] += 1
+            self.discarded_s += sum(end - start for start, end in ahead.stages.values())
+            return self._account(await self.agent.prepare(sensor_data, summary=summary))
+        self._account(ahead, self._window)
+        if ahead.memory_version != self.agent.memory_store.version:
+            self.refreshed += 1  # the retrieval cache folds the new fragments into `ahead`'s result
+            return self._account(await self.agent.prepare(sensor_data, summary=summary))
+        self.reused += 1
+        return self._account(await self.agent.prepare(
+            sensor_data, summary=summary, memories=ahead.memories, memory_version=ahead.memory_version))
+
+    def _account(self, prepared, window=None):
+        """Add stage times, and the part of them that ran during `window` (generation)."""
+        for name, (start, end) in prepared.stages.items():
+            self.stage_s[name] += end - start
+            if window is not None:
+                self.overlap_s[name] += max(0.0, min(end, window[1]) - max(start, window[0]))
+        return prepared
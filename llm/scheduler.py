@@ -0,0 +1,199 @@
+# llm/scheduler.py
+"""
+Priority scheduler for Ollama requests (replaces the old global LLM mutex).
+- Lower priority number runs first; reasoning outranks summarization
+- Optional start deadline: a request that cannot start in time is dropped
+- `concurrency` > 1 lets several requests run at once (OLLAMA_NUM_PARALLEL)
+- Requests sharing a `coalesce_key` collapse: a newer one replaces a queued one
+- Preemptible requests are cancelled and re-queued when urgent work arrives
+- Queue-wait time is tracked per request class
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+
+from utils.settings import load_settings
+from utils.tracing import tracer
+
+REASONING = 0
+SUMMARIZATION = 10
+
+
+class LLMRequestDropped(Exception):
+    """The request never ran (or stopped) because it was coalesced or expired."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class _Request:
+    def __init__(self, factory, cls, priority, deadline, coalesce_key, preemptible, seq):
+        self.factory = factory
+        self.cls = cls
+        self.priority = priority
+        self.deadline = deadline
+        self.coalesce_key = coalesce_key
+        self.preemptible = preemptible
+        self.seq = seq
+        self.future = asyncio.get_running_loop().create_future()
+        self.submitted = time.monotonic()
+        self.started = None
+        self.task = None
+        self.preemptions = 0
+        self.preempting = False
+
+
+class LLMScheduler:
+    def __init__(self, concurrency: int = 1, max_preemptions: int = 1, history: int = 200):
+        self.concurrency = max(1, concurrency)
+        self.max_preemptions = max_preemptions  # a request is preempted at most this often
+        self.history = history
+        self._heap = []
+        self._seq = itertools.count()
+        self._running = set()
+        self._queued_by_key = {}
+        self._stats = {}
+
+    # --------------------------------------------------------------
+    async def submit(self, factory, cls: str, priority: int, deadline_s: float = None,
+                     coalesce_key: str = None, preemptible: bool = False):
+        """
+        Run `factory()` (a coroutine function) once a slot is free and return
+        its result. Raises LLMRequestDropped if it is coalesced or expires.
+        A preempted request is re-run from scratch by calling `factory` again.
+        """
+        deadline = time.monotonic() + deadline_s if deadline_s is not None else None
+        req = _Request(factory, cls, priority, deadline, coalesce_key, preemptible, next(self._seq))
+        self._stat(cls)["submitted"] += 1
+
+        self._enqueue(req)
+        self._dispatch()
+        if req.task is None:
+            self._maybe_preempt(req)
+
+        try:
+            return await req.future
+        except asyncio.CancelledError:
+            if req.task is not None:
+                req.task.cancel()
+            raise
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, r in self._heap if not r.future.done())
+
+    def stats(self) -> dict:
+        """Per-class counters and queue-wait percentiles (ms)."""
+        out = {}
+        for cls, s in self._stats.items():
+            waits = sorted(s["waits"])
+            row = {k: v for k, v in s.items() if k != "waits"}
+            if waits:
+                row["wait_p50_ms"] = round(1000 * waits[len(waits) // 2], 1)
+                row["wait_p95_ms"] = round(1000 * waits[min(len(waits) - 1, int(0.95 * len(waits)))], 1)
+                row["wait_max_ms"] = round(1000 * waits[-1], 1)
+            out[cls] = row
+        return out
+
+    # --------------------------------------------------------------
+    def _enqueue(self, req):
+        key = req.coalesce_key
+        if key is not None:
+            older = self._queued_by_key.get(key)
+            if older is not None and older.task is None and not older.future.done():
+                self._drop(older, "coalesced")
+            self._queued_by_key[key] = req
+        heapq.heappush(self._heap, (req.priority, req.seq, req))
+
+    def _dispatch(self):
+        now = time.monotonic()
+        while len(self._running) < self.concurrency and self._heap:
+            _, _, req = heapq.heappop(self._heap)
+            if req.future.done():
+                continue
+            if req.started is None and req.deadline is not None and now > req.deadline:
+                self._drop(req, "expired")
+                continue
+            if self._queued_by_key.get(req.coalesce_key) is req:
+                del self._queued_by_key[req.coalesce_key]
+            if req.started is None:
+                req.started = now
+                self._stat(req.cls)["waits"].append(now - req.submitted)
+                tracer.observe("llm_queue_wait_seconds", now - req.submitted, cls=req.cls)
+            self._running.add(req)
+            req.task = asyncio.create_task(self._run(req))
+
+    def _maybe_preempt(self, urgent):
+        """Cancel the least urgent preemptible running request, if outranked."""
+        victims = [
+            r for r in self._running
+            if r.preemptible and not r.preempting and r.priority > urgent.priority
+            and r.preemptions < self.max_preemptions
+        ]
+        if len(self._running) < self.concurrency or not victims:
+            return
+        victim = max(victims, key=lambda r: (r.priority, r.seq))
+        victim.preempting = True
+        victim.preemptions += 1
+        self._stat(victim.cls)["preempted"] += 1
+        victim.task.cancel()
+
+    async def _run(self, req):
+        try:
+            result = await req.factory()
+        except asyncio.CancelledError:
+            if req.preempting and not req.future.done():
+                # Re-queue behind the urgent request; runs again from scratch,
+                # unless a newer request with the same key is already waiting
+                req.preempting = False
+                req.task = None
+                if req.coalesce_key in self._queued_by_key:
+                    self._drop(req, "coalesced")
+                else:
+                    self._enqueue(req)
+            elif not req.future.done():
+                req.future.cancel()
+        except Exception as e:
+            self._stat(req.cls)["failed"] += 1
+            if not req.future.done():
+                req.future.set_exception(e)
+        else:
+            self._stat(req.cls)["completed"] += 1
+            if not req.future.done():
+                req.future.set_result(result)
+        finally:
+            self._running.discard(req)
+            self._dispatch()
+
+    def _drop(self, req, reason: str):
+        self._stat(req.cls)[reason] += 1
+        if self._queued_by_key.get(req.coalesce_key) is req:
+            del self._queued_by_key[req.coalesce_key]
+        if not req.future.done():
+            req.future.set_exception(LLMRequestDropped(reason))
+
+    def _stat(self, cls: str) -> dict:
+        if cls not in self._stats:
+            self._stats[cls] = {
+                "submitted": 0, "completed": 0, "failed": 0,
+                "coalesced": 0, "expired": 0, "preempted": 0,
+                "waits": deque(maxlen=self.history),
+            }
+        return self._stats[cls]
+
+
+# ---------------------------------------------------------------------
+# Shared instance
+# ---------------------------------------------------------------------
+_scheduler = None
+
+
+def get_scheduler() -> LLMScheduler:
+    """Process-wide LLMScheduler configured from settings.yaml."""
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler(concurrency=load_settings().get("llm_concurrency", 1))
+    return _scheduler
@@ -1,109 +1,172 @@
 import asyncio
 import aiohttp
-from utils.data_formatter import format_sensor_batch
-from utils.llm_lock import global_llm_lock
+from llm.client import get_client, token_text
+from llm.scheduler import SUMMARIZATION, LLMRequestDropped, get_scheduler
+from utils.data_formatter import format_sensor_columns
+from utils.change_gate import ChangeGate, WindowStats
+from utils.ring_buffer import DOWNSAMPLE, SensorRingBuffer
+from utils.tokens import MESSAGE_OVERHEAD, estimator
+from utils.tracing import tracer
 
 class Summarizer:
     """
     Incremental asynchronous summarizer:
       - Keeps prior summary for continuity
-      - Dynamically computes remaining context budget for data section
+      - Dynamically computes remaining token budget for the data section
       - Uses data_formatter to prepare compact time-series text
       - Sends old summary + structured batch to the LLM
+      - Buffers samples in a bounded columnar ring buffer and reads each
+        pass's window straight from it (cursor = first unsummarized sample)
+      - Optional ChangeGate defers the LLM call while readings stay flat
+      - With a TimeSeriesStore (`timeseries`), each pass also gets min / max /
+        mean of every sample over the last `horizon_s`, from its rollups
     """
 
-    def __init__(self, model="phi3:mini"):
+    def __init__(self, model="phi3:mini", buffer_capacity=2048, overflow=DOWNSAMPLE,
+                 gate: ChangeGate = None, horizon_s: float = 3600):
         self.model = model
-        self.queue = asyncio.Queue()
+        self.gate = gate
+        self.timeseries = None  # set by main.py
+        self.horizon_s = horizon_s
+        self.buffer = SensorRingBuffer(buffer_capacity, overflow)
+        self._cursor = 0  # seq of the first sample not yet summarized
         self.latest_summary = "No summary yet."
         self.running = True
         self.summary_lock = asyncio.Lock()
         self.keep_alive = "30m"
-        self.max_chars = 2048  # total context character budget for model
+        self.num_ctx = 2048  # model context window (tokens)
+        self.reserve_output = 256  # tokens left free for the reply
+        self.start_deadline_s = 20.0  # drop a pass that cannot start in time
         self.initial_prompt = (
             "You are a summarizer that interprets sensor readings over time.\n"
             "Maintain continuity from previous summaries and describe changes, trends, "
             "growth, or stability without providing explanation or commentary. Focus on how readings evolve across time slots.\n"
             "Be concise (2–3 sentences)."
         )
+        # Instructions live in the system message, ahead of anything that
+        # changes, so the model's KV cache for them survives between passes
+        self.system_prompt = (
+            f"{self.initial_prompt}\n\n"
+            "Given the previous summary and a batch of new readings, provide an updated summary "
+            "that integrates the previous summary and describes changes, patterns, or growth "
+            "observed in the new data. Reply with the updated summary only."
+        )
+        self.last_timings = None
 
     # --------------------------------------------------------------
     async def push_data(self, sensor_data: dict):
-        await self.queue.put(sensor_data)
+        self.buffer.append(sensor_data)
+
+    def has_new_data(self) -> bool:
+        return self.buffer.seq > self._cursor
 
     async def get_summary(self):
         async with self.summary_lock:
             return self.latest_summary
 
     async def summarize_batch(self):
-        """Summarize all new data since last cycle."""
-        if self.queue.empty():
+        """
+        Summarize all new data since last cycle.
+        Goes through the LLM scheduler at low priority: a newer pass replaces
+        a queued one, and a running pass is preempted (and retried) when a
+        reasoning request arrives. The cursor only advances once a pass has
+        run, so a replaced or preempted pass loses no data.
+        With a change gate, flat windows are deferred (not dropped): they stay
+        behind the cursor and are summarized once something moves.
+        """
+        if not self.has_new_data():
             return
+        if self.gate and not self.gate.should_summarize(WindowStats.of(self.buffer.window(self._cursor))):
+            return
+        try:
+            with tracer.span("summarize"):  # includes the wait for a scheduler slot
+                await get_scheduler().submit(
+                    self._summarize_now,
+                    cls="summarization",
+                    priority=SUMMARIZATION,
+                    deadline_s=self.start_deadline_s,
+                    coalesce_key="summarizer",
+                    preemptible=True,
+                )
+        except LLMRequestDropped as e:
+            print(f"[Summarizer] Pass {e.reason}; data kept for the next pass.")
 
-        # Drain queue into batch
-        batch = []
-        while not self.queue.empty():
-            batch.append(await self.queue.get())
+    async def _summarize_now(self):
+        # Everything since the cursor, read straight from the ring buffer
+        end_seq = self.buffer.seq
+        window = self.buffer.window(self._cursor)
+        if not len(window):
+            return
 
-        # --- Compute remaining character budget dynamically ---
+        # --- Compute remaining token budget dynamically ---
         old_summary = self.latest_summary.strip()
-        wrapper = (
-            f"{self.initial_prompt}\n\n"
+        context = (
             f"Previous summary:\n{old_summary}\n\n"
+            f"{self._long_horizon()}"
             f"New sensor readings (most recent batch):\n"
         )
-        tail = (
-            "\n\nPlease provide an updated summary that integrates the previous summary "
-            "and describes changes, patterns, or growth observed in the new data.\n"
-            "Updated summary:"
-        )
 
-        static_length = len(wrapper) + len(tail)
-        remaining_chars = max(256, self.max_chars - static_length)  # ensure floor limit
+        static_tokens = estimator.estimate(self.system_prompt) + estimator.estimate(context) + 2 * MESSAGE_OVERHEAD
+        remaining_tokens = max(64, self.num_ctx - self.reserve_output - static_tokens)  # ensure floor limit
 
         # --- Format data within remaining budget ---
-        formatted = format_sensor_batch(batch, max_chars=remaining_chars)
+        formatted = format_sensor_columns(
+            window.keys, window.columns, max_chars=estimator.chars_for(remaining_tokens)
+        )
 
-        # --- Build full prompt (final payload) ---
-        prompt = wrapper + formatted + tail
+        # --- Build messages: static system prefix first, changing content after ---
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": context + formatted},
+        ]
+        stats = WindowStats.of(window) if self.gate else None  # before the view can be overwritten
 
-        print("[Summarizer] Completed prompt:\n",prompt)
-        # --- Send to model ---
-        summary = await self._query_ollama_async(prompt)
+        print("[Summarizer] Completed prompt:\n", messages[1]["content"])
+        # --- Send to model (a preempted pass leaves the cursor where it was) ---
+        summary = await self._query_ollama_async(messages)
+        self._cursor = end_seq
 
         if summary:
             async with self.summary_lock:
                 self.latest_summary = summary.strip()
+            if self.gate:
+                self.gate.accept(stats)
             print(f"[Summarizer] Updated summary:\n{summary}...\n")
         else:
             print("[Summarizer] No summary returned or model timeout.")
 
+    def _long_horizon(self) -> str:
+        """Per-channel stats of every sample over `horizon_s` (constant cost, from the rollups)."""
+        if self.timeseries is None:
+            return ""
+        lines = [
+            f"{name}: min {s['min']:.1f}, max {s['max']:.1f}, mean {s['mean']:.1f} ({s['count']} samples)"
+            for name, s in self.timeseries.summary(self.horizon_s).items()
+            if s["count"]
+        ]
+        if not lines:
+            return ""
+        return f"All readings over the last {self.horizon_s / 60:.0f} min:\n" + "\n".join(lines) + "\n\n"
+
     def stop(self):
         self.running = False
 
     # --------------------------------------------------------------
-    async def _query_ollama_async(self, prompt, timeout_s=30.0):
-        url = "http://localhost:11434/api/generate"
+    async def _query_ollama_async(self, messages, timeout_s=30.0):
         payload = {
             "model": self.model,
-            "prompt": prompt,
-            "stream": False,
+            "messages": messages,
             "keep_alive": self.keep_alive,
-            "options": {"temperature": 0.2, "num_ctx": 2048},
+            "options": {"temperature": 0.2, "num_ctx": self.num_ctx},
         }
 
         try:
-            async with global_llm_lock:  # ⬅ only one LLM call at a time
-                async with aiohttp.ClientSession() as session:
-                    async with session.post(url, json=payload, timeout=timeout_s) as resp:
-                        if resp.status != 200:
-                            text = await resp.text()
-                            print(f"[Summarizer] HTTP {resp.status}: {text}")
-                            return ""
-                        data = await resp.json()
-                        return data.get("response", "")
+            data, timings = await get_client().generate(payload, endpoint="/api/chat", timeout_s=timeout_s)
+            self.last_timings = timings
+            print(f"[Summarizer] LLM timings: {timings}")
+            return token_text(data)
         except asyncio.TimeoutError:
             print("[Summarizer] LLM request timed out.")
         except aiohttp.ClientError as e:
             print(f"[Summarizer] LLM error: {e}")
-        return ""
\ No newline at end of file
+        return ""
@@ -1,68 +1,75 @@
 import asyncio
 import uvicorn
 
+from llm.client import get_client
 from llm.high_level import ReasoningAgent
+from llm.pipeline import StepPipeline
 from sensors.temp_sensor import TempSensor
 from sensors.time_sensor import TimeSensor
 from sensors.distance_sensor import DistanceSensor
 from sensors.serial_dispatcher import create_dispatcher
-from web.server import app, input_queue, output_queue
+from sensors.timeseries import TimeSeriesStore
+from web.server import app, hub, input_queue, output_queue
 from utils.logger import BroadcastLogger  # only used for reasoning
+from utils.settings import load_settings
+from utils.startup import StartupTimer
+from utils.tracing import tracer
+from utils.trigger import ReasoningTrigger
 
 
 # ---------------------------------------------------------------------
 #  WebSocket Server Task
 # ---------------------------------------------------------------------
-async def websocket_server():
+async def websocket_server(server):
     """Run FastAPI WebSocket server in background."""
-    config = uvicorn.Config(app, host="0.0.0.0", port=8000, log_level="warning")
-    server = uvicorn.Server(config)
     await server.serve()
 
 
+async def wait_for_server(server, task):
+    """Resolve once uvicorn is accepting connections (or has exited)."""
+    while not server.started and not task.done():
+        await asyncio.sleep(0.05)
+
+
 # ---------------------------------------------------------------------
-#  Reasoning Loop (client-controlled)
+#  Reasoning Loop (event-driven)
 # ---------------------------------------------------------------------
-async def reasoning_loop(agent, sensors):
-    """Perform reasoning cycles controlled by client input."""
+async def reasoning_loop(agent, sensors, trigger, pipeline=None):
+    """Perform reasoning cycles when the trigger says something happened (or it has been quiet too long)."""
     if agent.logger.output_queue:
         print("[DEBUG] Logger connected to WebSocket output queue.")
     else:
         print("[DEBUG] Logger missing output queue!")
 
-    cycle = 1
+    cycle = 0
     while True:
-
-        # # --- Wait for valid input from WebSocket client ---
-        # while True:
-        #     print("[Main] Awaiting client input: send 'continue' to proceed or 'exit' to stop.\n")
-        #     await output_queue.put(
-        #         "Awaiting client input: send 'continue' to proceed or 'exit' to stop."
-        #     )
-        #     msg = await input_queue.get()
-        #     msg_lower = msg.strip().lower()
-
-        #     if msg_lower in ["continue", "c"]:
-        #         print("[Main] Continuing to next cycle...\n")
-        #         cycle += 1
-        #         break
-        #     elif msg_lower in ["exit", "stop", "quit"]:
-        #         print("[Main] Exiting on client request.")
-        #         return
-        #     else:
-        #         await output_queue.put(
-        #             f"[Main] Unrecognized command: {msg}. Type 'continue' or 'exit'."
-        #         )
+        reasons = await trigger.wait()
+        cycle += 1
 
         # --- Read current sensor data snapshot ---
-        sensor_data = {s.name: s.read() for s in sensors}
-        print(f"[Main] Starting reasoning cycle {cycle}...")
+        with tracer.span("sensor_snapshot"):
+            sensor_data = {s.name: s.read() for s in sensors}
+        print(f"[Main] Starting reasoning cycle {cycle} ({', '.join(reasons)})...")
         print(f"[Main] Current sensor snapshot: {sensor_data}")
 
         # --- Run one reasoning step (this is what goes to the client) ---
-        await agent.step(sensor_data)
+        with tracer.span("reasoning_cycle"):
+            if pipeline:
+                await pipeline.step(sensor_data)  # also prepares the next cycle while generating
+            else:
+                await agent.step(sensor_data)
 
-        print(f"[Main] Reasoning cycle {cycle} complete.")
+        print(f"[Main] Reasoning cycle {cycle} complete; next idle wait {trigger.interval:.1f}s.")
+
+
+# ---------------------------------------------------------------------
+#  Client Input Loop
+# ---------------------------------------------------------------------
+async def input_loop(trigger):
+    """Any message from a WebSocket client asks for a reasoning cycle."""
+    while True:
+        msg = await input_queue.get()
+        trigger.notify(f"client: {msg.strip()[:40]}")
 
 
 # ---------------------------------------------------------------------
@@ -71,76 +78,162 @@ async def reasoning_loop(agent, sensors):
 async def sensor_loop(agent, sensors):
     """Continuously push sensor data snapshots to summarizer (≈2 Hz)."""
     while True:
-        data = {s.name: s.read() for s in sensors}
+        with tracer.span("sensor_snapshot"):
+            data = {s.name: s.read() for s in sensors}
         await agent.summarizer.push_data(data)
+        hub.publish(data, topic="sensors")
         await asyncio.sleep(0.5)
 
 
 # ---------------------------------------------------------------------
 #  NEW: Summarization Loop
 # ---------------------------------------------------------------------
-async def summarization_loop(agent):
+async def summarization_loop(agent, trigger):
     """
-    Periodically checks for new data and triggers summarization
-    if no other summarization is running.
+    Periodically checks for new data and triggers summarization.
+    Ordering against reasoning is handled by the LLM scheduler.
     """
-    llm_lock = asyncio.Lock()
     print("[Main] Summarization loop started.")
 
     while True:
         await asyncio.sleep(1.0)  # ≈1 Hz summarization check
-        if agent.summarizer.queue.empty():
-            continue
-        if llm_lock.locked():
+        if not agent.summarizer.has_new_data():
             continue
 
-        async with llm_lock:
-            print("[Main] Starting summarization pass...")
-            await agent.summarizer.summarize_batch()
-            print("[Main] Summarization pass complete.")
+        print("[Main] Starting summarization pass...")
+        previous = await agent.summarizer.get_summary()
+        await agent.summarizer.summarize_batch()
+        summary = await agent.summarizer.get_summary()
+        if summary != previous:
+            hub.publish(summary, topic="summarizer")
+            trigger.notify("new summary")
+        print("[Main] Summarization pass complete.")
+
+
+# ---------------------------------------------------------------------
+#  Metrics (GET /metrics)
+# ---------------------------------------------------------------------
+def register_gauges(agent, protocol):
+    """Scrape-time gauges for state that already lives in the components."""
+    tracer.gauge("memory_fragments", "Fragments in the memory store.", lambda: len(agent.memory_store.matrix))
+    manager = agent.memory_manager
+    tracer.gauge("memory_queue_depth", "Experiences waiting to be encoded.", lambda: manager.queue_depth)
+    tracer.gauge("memory_last_batch_size", "Fragments in the last encoded batch.", lambda: manager.last_batch_size)
+    tracer.gauge("memory_encode_seconds_per_batch", "Mean encode latency per batch.",
+                 lambda: manager.encode_seconds / manager.batches_stored if manager.batches_stored else 0)
+    tracer.gauge("memory_encode_per_second", "Fragments encoded per second of encode time.",
+                 lambda: manager.stats()["encode_per_second"])
+    gate = agent.summarizer.gate
+    if gate:
+        tracer.gauge("summary_gate", "Summary gate checks, LLM calls saved and passes forced by max age.", lambda: {
+            (("kind", k),): v for k, v in gate.stats().items()
+        })
+    tracer.gauge("serial_lines", "Serial lines (or frames) since start, by kind.", lambda: {
+        (("kind", k),): v for k, v in protocol.stats().items()
+    })
 
 
 # ---------------------------------------------------------------------
 #  Main Entry Point
 # ---------------------------------------------------------------------
 async def main():
-    # --- Initialize sensors ---
-    temp_sensor = TempSensor()
-    dist_sensor = DistanceSensor()
+    startup = StartupTimer()
+    settings = load_settings()
+    tracer.enabled = settings.get("tracing", True)
+
+    # --- Initialize sensors (every serial sample is kept in the time-series store) ---
+    timeseries = TimeSeriesStore()
+    temp_sensor = TempSensor(timeseries)
+    dist_sensor = DistanceSensor(timeseries)
     time_sensor = TimeSensor()
     sensors = [temp_sensor, dist_sensor, time_sensor]
-
-    # --- Start serial dispatcher for hardware data ---
     handlers = {
         "DIST:": dist_sensor.handle_line,
         "TEMP:": temp_sensor.handle_line,
     }
-    transport, protocol = await create_dispatcher("COM4", 9600, handlers)
-    print("[Main] Serial dispatcher started for sensors on COM4.")
 
-    # --- Initialize reasoning agent ---
+    # --- Initialize reasoning agent (embedding model loads in the background) ---
     agent = ReasoningAgent()
-    agent.logger = BroadcastLogger(output_queue)
-    await agent.start()
-    print("[Main] ReasoningAgent will send its output to connected clients only.")
+    agent.logger = BroadcastLogger(
+        output_queue,
+        flush_interval=settings.get("ws_flush_interval_ms", 50) / 1000,
+        max_frame_chars=settings.get("ws_max_frame_chars", 2048),
+    )
+    agent.startup_timer = startup
+    agent.timeseries = timeseries
+    agent.summarizer.timeseries = timeseries
+
+    # --- Reasoning pace: events first, loop_interval (backing off) when idle ---
+    trigger = ReasoningTrigger(
+        interval=settings.get("loop_interval", 3),
+        min_interval=settings.get("reasoning_min_interval_s", 0.5),
+        max_interval=settings.get("reasoning_max_interval_s", 30),
+    )
+    trigger.watch(timeseries, settings.get("reasoning_triggers", {}))
+    pipeline = None
+    if settings.get("reasoning_pipeline", True):
+        pipeline = StepPipeline(agent)
+    agent.memory_store.load_model_async()
+    model_task = asyncio.create_task(
+        startup.track("embedding model", agent.memory_store.wait_until_ready())
+    )
 
     # --- Start WebSocket server ---
     print("[Main] Starting WebSocket server on ws://localhost:8000/ws")
-    memory_task = asyncio.create_task(agent.memory_manager.run())
-    # --- Run everything concurrently ---
-    await asyncio.gather(
-        websocket_server(),                # client connection handler
-        reasoning_loop(agent, sensors),    # client-controlled reasoning loop
-        sensor_loop(agent, sensors),       # sensor data producer (~2 Hz)
-        summarization_loop(agent),         # 🔥 new summarization scheduler (~1 Hz)
-        memory_task
+    server = uvicorn.Server(uvicorn.Config(
+        app, host="0.0.0.0", port=8000, log_level="warning",
+        ws_per_message_deflate=settings.get("ws_per_message_deflate", True),
+    ))
+    web_task = asyncio.create_task(websocket_server(server))
+
+    # --- Bring up serial, WebSocket and Ollama concurrently ---
+    (transport, protocol), _, _ = await asyncio.gather(
+        startup.track("serial (COM4)", create_dispatcher(
+            "COM4", 9600, handlers,
+            framing=settings.get("serial_framing", "text"),
+            max_line=settings.get("serial_max_line", 512),
+        )),
+        startup.track("websocket server", wait_for_server(server, web_task)),
+        startup.track("ollama warmup", agent.warm_up()),
     )
+    print("[Main] Serial dispatcher started for sensors on COM4.")
+    agent.bridge.attach(transport)  # reasoning actions go out on the same port
+    register_gauges(agent, protocol)
+    print(startup.report())
+
+    await agent.start()
+    print("[Main] ReasoningAgent will send its output to connected clients only.")
 
-    # --- Cleanup ---
-    transport.close()
-    agent.summarizer.stop()
-    agent.memory_manager.stop()
-    print("[Main] All tasks stopped. Serial closed.")
+    memory_task = asyncio.create_task(agent.memory_manager.run())
+    # --- Run everything concurrently (cleanup also runs on Ctrl-C) ---
+    try:
+        await asyncio.gather(
+            web_task,                          # client connection handler
+            reasoning_loop(agent, sensors, trigger, pipeline),   # event-driven reasoning loop
+            input_loop(trigger),               # client messages trigger reasoning
+            sensor_loop(agent, sensors),       # sensor data producer (~2 Hz)
+            summarization_loop(agent, trigger),   # 🔥 new summarization scheduler (~1 Hz)
+            memory_task,
+            model_task,
+        )
+    finally:
+        # --- Cleanup ---
+        agent.bridge.cancel()
+        transport.close()
+        agent.summarizer.stop()
+        agent.memory_manager.stop()
+        agent.memory_store.close()
+        await get_client().close()
+        print(f"[Main] WebSocket log frames: {agent.logger.stats()}, hub: {hub.stats()}")
+        print(f"[Main] Reasoning cycles: {trigger.stats()}")
+        print(f"[Main] Actions: {agent.bridge.stats()}")
+        print(f"[Main] Memory: {agent.memory_manager.stats()}")
+        if agent.summarizer.gate:
+            print(f"[Main] Summary gate: {agent.summarizer.gate.stats()}")
+        if pipeline:
+            pipeline.cancel()
+            print(f"[Main] Reasoning pipeline: {pipeline.stats()}")
+        print("[Main] All tasks stopped. Serial closed.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,45 @@
+# memory/cache.py
+from collections import OrderedDict
+
+
+def normalize_query(text: str) -> str:
+    """Cache key for a query: lower-cased with whitespace collapsed."""
+    return " ".join(text.lower().split())
+
+
+class LRUCache:
+    """
+    Small size-bounded LRU map with hit/miss counters.
+    Used by MemoryStore for query embeddings and retrieval results.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,108 @@
+# memory/consolidation.py
+"""
+Near-duplicate detection and capacity eviction for the embedding matrix.
+Pure NumPy over a snapshot of the vectors, so MemoryStore can plan a pass
+on a worker thread and only take its lock to apply the result.
+
+- Rows are compared block by block (rows x columns), so memory stays at
+  one block of scores however large the store is
+- A row whose cosine similarity to an earlier surviving row reaches
+  `threshold` is merged into it; the survivor collects its hits
+- Rows before `start` were consolidated by an earlier pass and are not
+  compared with each other again
+- Above `capacity`, the least recently used ("lru") or the least hit
+  ("importance") survivors are evicted
+"""
+import numpy as np
+
+LRU = "lru"
+IMPORTANCE = "importance"
+
+
+class ConsolidationPlan:
+    """Outcome of one pass, in snapshot rows."""
+
+    def __init__(self, n: int, keep, merged_into: dict, evicted, hits, last_used):
+        self.n = n                      # rows in the snapshot
+        self.keep = keep                # surviving rows, ascending
+        self.merged_into = merged_into  # duplicate row -> surviving row
+        self.evicted = evicted          # rows dropped for capacity
+        self.hits = hits                # per snapshot row, after merging
+        self.last_used = last_used
+
+    @property
+    def removed(self):
+        return np.sort(np.concatenate([
+            np.fromiter(self.merged_into, dtype=np.int64, count=len(self.merged_into)),
+            np.asarray(self.evicted, dtype=np.int64),
+        ]))
+
+
+def find_duplicates(vectors, start: int = 0, threshold: float = 0.95, block: int = 1024):
+    """
+    For every row at or after `start`, the earlier surviving row it
+    duplicates, or -1. Returns an int64 array over all rows.
+    """
+    n = len(vectors)
+    parent = np.full(n, -1, dtype=np.int64)
+    for b0 in range(start, n, block):
+        b1 = min(n, b0 + block)
+        rows = vectors[b0:b1]
+        best = np.full(b1 - b0, -np.inf, dtype=np.float32)
+        arg = np.full(b1 - b0, -1, dtype=np.int64)
+
+        # Earlier blocks: vectorized max over surviving columns
+        for c0 in range(0, b0, block):
+            c1 = min(b0, c0 + block)
+            survivors = np.flatnonzero(parent[c0:c1] < 0) + c0
+            if not len(survivors):
+                continue
+            scores = rows @ vectors[survivors].T
+            j = np.argmax(scores, axis=1)
+            s = scores[np.arange(len(rows)), j]
+            better = s > best
+            best[better], arg[better] = s[better], survivors[j[better]]
+
+        # Inside the block survivors are decided in order, so walk the rows
+        inner = rows @ rows.T
+        alive = []
+        for i in range(b1 - b0):
+            if alive:
+                scores = inner[i, alive]
+                j = int(np.argmax(scores))
+                if scores[j] > best[i]:
+                    best[i], arg[i] = scores[j], b0 + alive[j]
+            if best[i] >= threshold:
+                parent[b0 + i] = arg[i]
+            else:
+                alive.append(i)
+    return parent
+
+
+def plan(vectors, hits, last_used, start: int = 0, threshold: float = 0.95,
+         capacity: int = None, policy: str = LRU, block: int = 1024) -> ConsolidationPlan:
+    """Merge near-duplicates, then evict down to `capacity`."""
+    n = len(vectors)
+    hits = np.asarray(hits, dtype=np.int64).copy()
+    last_used = np.asarray(last_used, dtype=np.float64).copy()
+
+    parent = find_duplicates(vectors, start, threshold, block)
+    dups = np.flatnonzero(parent >= 0)
+    targets = parent[dups]  # always surviving rows, so no chains to follow
+    np.add.at(hits, targets, hits[dups])
+    np.maximum.at(last_used, targets, last_used[dups])
+
+    keep = np.flatnonzero(parent < 0)
+    evicted = np.empty(0, dtype=np.int64)
+    if capacity is not None and len(keep) > capacity:
+        if policy == LRU:
+            order = np.lexsort((hits[keep], last_used[keep]))   # oldest use first
+        elif policy == IMPORTANCE:
+            order = np.lexsort((last_used[keep], hits[keep]))   # fewest hits first
+        else:
+            raise ValueError(f"Unknown eviction policy: {policy}")
+        evicted = np.sort(keep[order[:len(keep) - capacity]])
+        keep = np.setdiff1d(keep, evicted, assume_unique=True)
+
+    merged_into = dict(zip(dups.tolist(), targets.tolist()))
+    return ConsolidationPlan(n, keep, merged_into, evicted, hits, last_used)
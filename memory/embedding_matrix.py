@@ -0,0 +1,387 @@
+# memory/embedding_matrix.py
+import os
+import re
+import struct
+from contextlib import contextmanager
+
+import numpy as np
+
+_NPY_MAGIC = b"\x93NUMPY\x01\x00"
+_NPY_HEADER_LEN = 128  # fixed, so the row count can be rewritten in place
+
+FLOAT32 = "float32"
+FLOAT16 = "float16"
+INT8 = "int8"
+DTYPES = (FLOAT32, FLOAT16, INT8)
+
+
+class EmbeddingMatrix:
+    """
+    Contiguous, preallocated matrix of L2-normalized embeddings.
+    - Grows by doubling, so appends are amortized O(1) and never re-stack rows
+    - Keeps the fragment id of every row alongside the vectors
+    - Answers top-k queries with argpartition instead of a full sort
+    - Optionally backed by an append-only memory-mapped .npy file (`path`)
+    - `compacting()` drops rows (memory consolidation); a file-backed matrix
+      writes the kept rows to the file of the next `generation`, which the
+      caller commits with its row mapping, so a crash leaves one or the other
+    - `dtype` "float16" or "int8" (per-row scale) stores 2x / 4x smaller
+      rows; scoring widens one block at a time to float32 for the BLAS product
+    """
+
+    def __init__(self, dim: int = 384, capacity: int = 1024, path: str = None,
+                 dtype: str = FLOAT32, block: int = 8192, generation: int = 0):
+        if dtype not in DTYPES:
+            raise ValueError(f"Unknown embedding dtype: {dtype}")
+        self.dim = dim
+        self.dtype = dtype
+        self.block = block
+        self.count = 0
+        self.generation = generation  # compactions applied; the owner persists it with the row mapping
+        self._base_path = path
+        self._base_scales = os.path.splitext(path)[0] + ".scales.npy" if path and dtype == INT8 else None
+        self.path = _generation_path(path, generation) if path else None
+        self.scales_path = _generation_path(self._base_scales, generation) if self._base_scales else None
+        capacity = max(1, capacity)
+        if path:
+            for base in filter(None, (self._base_path, self._base_scales)):
+                _remove_generations(base, keep=generation)  # staged by a compaction that never committed
+            self._data, self.count, capacity = _open_npy(self.path, dtype, (dim,), capacity)
+        else:
+            self._data = np.empty((capacity, dim), dtype=dtype)
+        self._scales = None
+        if dtype == INT8:
+            if self.scales_path:
+                self._scales, rows, _ = _open_npy(self.scales_path, FLOAT32, (), self.capacity)
+                self.count = min(self.count, rows)
+            else:
+                self._scales = np.empty(capacity, dtype=np.float32)
+        self._ids = np.empty(self.capacity, dtype=np.int64)
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def capacity(self):
+        return self._data.shape[0]
+
+    @property
+    def vectors(self):
+        """
+        Filled rows, no copy. float32 storage gives a plain view; quantized
+        storage gives a view that widens whatever is indexed to float32.
+        """
+        if self.dtype == FLOAT32:
+            return self._data[:self.count]
+        return QuantizedRows(self._data[:self.count], self.scales)
+
+    @property
+    def scales(self):
+        """Per-row int8 scales (None for float storage)."""
+        return None if self._scales is None else self._scales[:self.count]
+
+    @property
+    def ids(self):
+        """View of the fragment ids of the filled rows (no copy)."""
+        return self._ids[:self.count]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the filled rows: vectors, scales and ids."""
+        per_row = self._data.itemsize * self.dim + self._ids.itemsize
+        if self._scales is not None:
+            per_row += self._scales.itemsize
+        return per_row * self.count
+
+    # --------------------------------------------------------------
+    def append(self, ids, embeddings):
+        """Append one or more (id, embedding) rows. Returns the first row index."""
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim)
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        if len(ids) != len(embeddings):
+            raise ValueError(f"Got {len(ids)} ids for {len(embeddings)} embeddings")
+
+        start = self.count
+        end = start + len(ids)
+        self._reserve(end)
+        codes, scales = quantize(embeddings, self.dtype)
+        self._data[start:end] = codes
+        if self._scales is not None:
+            self._scales[start:end] = scales
+        self._ids[start:end] = ids
+        self.count = end
+        return start
+
+    def _reserve(self, needed: int):
+        """Grow storage by doubling until `needed` rows fit."""
+        capacity = self.capacity
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+
+        if self.path:
+            # Extend the file and remap; existing rows are never copied
+            self._data.flush()
+            self._data = _map_npy(self.path, self.dtype, (self.dim,), capacity)
+            if self.scales_path:
+                self._scales.flush()
+                self._scales = _map_npy(self.scales_path, FLOAT32, (), capacity)
+        else:
+            data = np.empty((capacity, self.dim), dtype=self.dtype)
+            data[:self.count] = self._data[:self.count]
+            self._data = data
+            if self._scales is not None:
+                scales = np.empty(capacity, dtype=np.float32)
+                scales[:self.count] = self._scales[:self.count]
+                self._scales = scales
+        ids = np.empty(capacity, dtype=np.int64)
+        ids[:self.count] = self._ids[:self.count]
+        self._ids = ids
+
+    @contextmanager
+    def compacting(self, keep_rows):
+        """
+        Keep only `keep_rows` (ascending), moved to the front in order.
+        Yields the next generation; commit it with the new row mapping inside
+        the block. A file-backed matrix first writes the kept rows to that
+        generation's file and syncs it, and switches to it only once the
+        block succeeds; the file in use is never rewritten, so views taken
+        earlier keep the old rows. In memory the rows move in place.
+        """
+        keep_rows = np.asarray(keep_rows, dtype=np.int64)
+        generation = self.generation + 1
+        capacity = self.capacity
+        staged = []
+        if self.path:
+            staged.append(_write_rows(_generation_path(self._base_path, generation), self._data,
+                                      keep_rows, (self.dim,), self.dtype, capacity, self.block))
+            if self.scales_path:
+                staged.append(_write_rows(_generation_path(self._base_scales, generation), self._scales,
+                                          keep_rows, (), FLOAT32, capacity, self.block))
+        try:
+            yield generation
+        except BaseException:
+            for path in staged:
+                _remove(path)
+            raise
+
+        m = len(keep_rows)
+        if self.path:
+            old = [self.path, self.scales_path]
+            self.path = staged[0]
+            self._data = _map_npy(self.path, self.dtype, (self.dim,), capacity)
+            if self.scales_path:
+                self.scales_path = staged[1]
+                self._scales = _map_npy(self.scales_path, FLOAT32, (), capacity)
+            for path in filter(None, old):
+                _remove(path)
+        else:
+            self._data[:m] = self._data[keep_rows]  # fancy indexing copies first, so overlap is safe
+            if self._scales is not None:
+                self._scales[:m] = self._scales[keep_rows]
+        self._ids[:m] = self._ids[keep_rows]
+        self.count = m
+        self.generation = generation
+
+    def restore_ids(self, ids):
+        """
+        Attach persisted fragment ids (ordered by row) after opening a file.
+        Rows beyond the last persisted id are treated as unwritten.
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        self.count = min(self.count, len(ids))
+        self._ids[:self.count] = ids[:self.count]
+
+    # --------------------------------------------------------------
+    # Memory-mapped .npy backing
+    # --------------------------------------------------------------
+    def flush(self):
+        """Write the current row count into the .npy header(s) and sync the map."""
+        if not self.path:
+            return
+        self._data.flush()
+        with open(self.path, "r+b") as f:
+            f.write(_npy_header(self.count, (self.dim,), self.dtype))
+        if self.scales_path:
+            self._scales.flush()
+            with open(self.scales_path, "r+b") as f:
+                f.write(_npy_header(self.count, (), FLOAT32))
+
+    # --------------------------------------------------------------
+    def search(self, queries, top_k: int = 3):
+        """
+        Score a (q, dim) batch of normalized queries against every row.
+        Returns (rows, scores), both (q, k) and sorted by descending score.
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if self.count == 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty.astype(np.float32)
+        if self.dtype == FLOAT32:
+            scores = queries @ self.vectors.T
+        else:
+            scores = np.empty((len(queries), self.count), dtype=np.float32)
+            for start in range(0, self.count, self.block):
+                end = min(self.count, start + self.block)
+                scores[:, start:end] = score_block(queries, self._data[start:end], self.scales_of(start, end))
+        return select_top_k(scores, top_k)
+
+    def scales_of(self, start: int, end: int):
+        return None if self._scales is None else self._scales[start:end]
+
+
+class QuantizedRows:
+    """Row view over quantized storage; indexing returns float32 rows."""
+
+    def __init__(self, codes, scales=None):
+        self.codes = codes
+        self.scales = scales
+
+    def __len__(self):
+        return len(self.codes)
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    def __getitem__(self, index):
+        return dequantize(self.codes[index], None if self.scales is None else self.scales[index])
+
+    def __array__(self, dtype=None, copy=None):
+        out = self[:]
+        return out if dtype is None else out.astype(dtype)
+
+
+# ---------------------------------------------------------------------
+# Helpers
+# ---------------------------------------------------------------------
+def quantize(embeddings, dtype: str):
+    """float32 rows -> (stored rows, per-row scales or None)."""
+    if dtype == FLOAT32:
+        return embeddings, None
+    if dtype == FLOAT16:
+        return embeddings.astype(np.float16), None
+    scales = np.abs(embeddings).max(axis=-1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(embeddings / scales[..., None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize(codes, scales=None):
+    """Stored rows -> float32 rows."""
+    out = codes.astype(np.float32)
+    if scales is not None:
+        out *= np.asarray(scales, dtype=np.float32)[..., None]
+    return out
+
+
+def score_block(queries, codes, scales=None):
+    """
+    (q, n) dot products of float32 queries with stored rows. NumPy has no
+    BLAS path for float16 or int8 products, so the block is widened to
+    float32 and scaled afterwards.
+    """
+    scores = queries @ codes.astype(np.float32).T
+    if scales is not None:
+        scores *= scales
+    return scores
+
+
+def _open_npy(path: str, dtype: str, tail: tuple, capacity: int):
+    """Map an existing .npy file in O(1), or create an empty one. Returns (map, rows, capacity)."""
+    rows = 0
+    row_bytes = np.dtype(dtype).itemsize * int(np.prod(tail, dtype=np.int64))
+    if os.path.exists(path) and os.path.getsize(path) >= _NPY_HEADER_LEN:
+        with open(path, "rb") as f:
+            np.lib.format.read_magic(f)
+            shape, _, file_dtype = np.lib.format.read_array_header_1_0(f)
+            if f.tell() != _NPY_HEADER_LEN or file_dtype != np.dtype(dtype) or shape[1:] != tail:
+                raise ValueError(f"{path} does not hold {dtype} rows of shape {tail}")
+        rows = shape[0]
+        capacity = max(capacity, rows, (os.path.getsize(path) - _NPY_HEADER_LEN) // row_bytes)
+    else:
+        with open(path, "wb") as f:
+            f.write(_npy_header(0, tail, dtype))
+    return _map_npy(path, dtype, tail, capacity), rows, capacity
+
+
+def _map_npy(path: str, dtype: str, tail: tuple, capacity: int):
+    row_bytes = np.dtype(dtype).itemsize * int(np.prod(tail, dtype=np.int64))
+    size = _NPY_HEADER_LEN + capacity * row_bytes
+    if os.path.getsize(path) < size:
+        os.truncate(path, size)
+    return np.memmap(path, dtype=dtype, mode="r+", offset=_NPY_HEADER_LEN, shape=(capacity,) + tail)
+
+
+def _write_rows(path: str, source, rows, tail: tuple, dtype: str, capacity: int, block: int) -> str:
+    """Write source[rows] as a new .npy with room for `capacity` rows, synced to disk."""
+    row_bytes = np.dtype(dtype).itemsize * int(np.prod(tail, dtype=np.int64))
+    with open(path, "wb") as f:
+        f.write(_npy_header(len(rows), tail, dtype))
+        for start in range(0, len(rows), block):
+            f.write(np.ascontiguousarray(source[rows[start:start + block]]).tobytes())
+        f.truncate(_NPY_HEADER_LEN + capacity * row_bytes)
+        os.fsync(f.fileno())
+    if os.name == "posix":  # make the new directory entry durable too
+        fd = os.open(os.path.dirname(path) or ".", os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    return path
+
+
+def _generation_path(path: str, generation: int) -> str:
+    """memories.npy for generation 0, memories.<generation>.npy after that."""
+    if not generation:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.{generation}{ext}"
+
+
+def _remove_generations(path: str, keep: int):
+    """Delete the files of every generation of `path` other than `keep`."""
+    root, ext = os.path.splitext(path)
+    directory = os.path.dirname(path) or "."
+    pattern = re.compile(re.escape(os.path.basename(root)) + r"(?:\.(\d+))?" + re.escape(ext))
+    for entry in os.listdir(directory):
+        m = pattern.fullmatch(entry)
+        if m and int(m.group(1) or 0) != keep:
+            _remove(os.path.join(directory, entry))
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass  # still mapped (Windows) or already gone; removed on the next open
+
+
+def _npy_header(rows: int, tail: tuple, dtype: str = FLOAT32) -> bytes:
+    """Fixed-length .npy v1.0 header, so np.load(path, mmap_mode='r') also works."""
+    body = repr({"descr": np.dtype(dtype).str, "fortran_order": False, "shape": (rows,) + tail})
+    pad = _NPY_HEADER_LEN - len(_NPY_MAGIC) - 2 - len(body) - 1
+    header = (body + " " * pad + "\n").encode("latin1")
+    return _NPY_MAGIC + struct.pack("<H", len(header)) + header
+
+
+def select_top_k(scores, k: int):
+    """
+    Row-wise top-k of a (q, n) score matrix in O(n + k log k).
+    Returns (indices, scores) sorted by descending score.
+    """
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        empty = np.empty(scores.shape[:-1] + (0,))
+        return empty.astype(np.int64), empty.astype(scores.dtype)
+
+    if k < n:
+        idx = np.argpartition(scores, n - k, axis=-1)[..., n - k:]
+    else:
+        idx = np.broadcast_to(np.arange(n), scores.shape).copy()
+
+    part = np.take_along_axis(scores, idx, axis=-1)
+    order = np.argsort(-part, axis=-1)
+    return np.take_along_axis(idx, order, axis=-1), np.take_along_axis(part, order, axis=-1)
@@ -1 +1,156 @@
-# Future: tools for loading/saving fragments to SQLite
\ No newline at end of file
+# memory/fragments.py
+"""
+SQLite persistence for memory fragments.
+Embeddings are not stored here: each fragment records the `row` it
+occupies in the memory-mapped embedding file next to the database, and
+`meta` records which generation of that file the rows refer to.
+"""
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fragments (
+    id         INTEGER PRIMARY KEY,
+    row        INTEGER NOT NULL,
+    text       TEXT    NOT NULL,
+    reasoning  TEXT,
+    context    TEXT,
+    created_at REAL    NOT NULL,
+    hits       INTEGER NOT NULL DEFAULT 1,
+    last_used  REAL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS fragments_row ON fragments(row);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT    PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Columns added after the first release, for databases created before them
+_MIGRATIONS = {
+    "hits": "ALTER TABLE fragments ADD COLUMN hits INTEGER NOT NULL DEFAULT 1",
+    "last_used": "ALTER TABLE fragments ADD COLUMN last_used REAL",
+}
+
+
+class FragmentDB:
+    """
+    Thin wrapper around the fragments table.
+    - Writes are grouped into explicit transactions (one per batch)
+    - Reads fetch only the rows a retrieval actually needs
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        if path != ":memory:" and os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)  # data/ is not tracked
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+        columns = {r[1] for r in self.conn.execute("PRAGMA table_info(fragments)")}
+        for column, ddl in _MIGRATIONS.items():
+            if column not in columns:
+                self.conn.execute(ddl)
+
+    # --------------------------------------------------------------
+    @contextmanager
+    def transaction(self):
+        """Commit everything inside the block at once, or roll it all back."""
+        self.conn.execute("BEGIN")
+        try:
+            yield self
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def insert_many(self, first_row: int, records: list):
+        """
+        Insert (text, reasoning, context) records at consecutive rows.
+        Returns the new fragment ids in insertion order.
+        """
+        now = time.time()
+        ids = []
+        for offset, (text, reasoning, context) in enumerate(records):
+            cur = self.conn.execute(
+                "INSERT INTO fragments (row, text, reasoning, context, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (first_row + offset, text, reasoning, context, now),
+            )
+            ids.append(cur.lastrowid)
+        return ids
+
+    # --------------------------------------------------------------
+    def load_ids(self):
+        """Fragment ids ordered by embedding row."""
+        return [r[0] for r in self.conn.execute("SELECT id FROM fragments ORDER BY row")]
+
+    def compactions(self) -> int:
+        """Generation of the embedding file the rows refer to (compactions committed)."""
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'compactions'").fetchone()
+        return row[0] if row else 0
+
+    def load_keyword_texts(self, start: int = 0, end: int = None, separate: bool = False):
+        """
+        Reasoning and context of the fragments at rows [start, end), ordered
+        by row. `separate` reads through a connection of its own, so a
+        worker thread can load while the event loop writes (WAL).
+        """
+        sql = (
+            "SELECT COALESCE(reasoning, '') || ' ' || COALESCE(context, '') FROM fragments "
+            "WHERE row >= ? AND row < ? ORDER BY row"
+        )
+        args = (start, end if end is not None else 2 ** 62)
+        if not separate or self.path == ":memory:":
+            return [r[0] for r in self.conn.execute(sql, args)]
+        conn = sqlite3.connect(self.path)
+        try:
+            return [r[0] for r in conn.execute(sql, args)]
+        finally:
+            conn.close()
+
+    def get_texts(self, ids) -> dict:
+        """Map fragment id -> text for the given ids."""
+        ids = [int(i) for i in ids]
+        if not ids:
+            return {}
+        marks = ",".join("?" * len(ids))
+        cur = self.conn.execute(f"SELECT id, text FROM fragments WHERE id IN ({marks})", ids)
+        return dict(cur.fetchall())
+
+    def get_usage(self, ids) -> dict:
+        """Map fragment id -> (hits, last used or created time) for the given ids."""
+        ids = [int(i) for i in ids]
+        usage = {}
+        for start in range(0, len(ids), 900):  # stay under SQLite's bound-parameter limit
+            chunk = ids[start:start + 900]
+            marks = ",".join("?" * len(chunk))
+            cur = self.conn.execute(
+                f"SELECT id, hits, COALESCE(last_used, created_at) FROM fragments WHERE id IN ({marks})",
+                chunk,
+            )
+            usage.update((i, (hits, used)) for i, hits, used in cur)
+        return usage
+
+    def compact(self, removed_ids, moves: list, usage: dict, generation: int):
+        """
+        Delete `removed_ids`, renumber rows with (id, new row) `moves` given
+        in ascending row order, store (hits, last_used) per id in `usage`,
+        and record the embedding file `generation` the new rows refer to.
+        Call inside a transaction.
+        """
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('compactions', ?)", (generation,))
+        self.conn.executemany("DELETE FROM fragments WHERE id = ?", [(int(i),) for i in removed_ids])
+        # Rows only ever move down and in order, so the unique row index never collides
+        self.conn.executemany("UPDATE fragments SET row = ? WHERE id = ?", [(r, i) for i, r in moves])
+        self.conn.executemany(
+            "UPDATE fragments SET hits = ?, last_used = ? WHERE id = ?",
+            [(hits, used, i) for i, (hits, used) in usage.items()],
+        )
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,395 @@
+# memory/index.py
+"""
+Pluggable nearest-neighbour index layer over an EmbeddingMatrix.
+All indexes speak in matrix rows; MemoryStore maps rows to fragment ids.
+`search()` returns (rows, scores) per query, best first; approximate
+indexes may return fewer than top_k rows for some queries. Saved files
+record the matrix generation and row count they were built against, and
+`load()` rejects a file from another generation (rows moved since) or
+one covering rows the matrix no longer has.
+
+- FlatIndex:  exact brute-force scan (the matrix itself)
+- IVFIndex:   pure-NumPy inverted-file index (spherical k-means + nprobe)
+- FaissIndex: FAISS HNSW, used when `faiss` is installed
+"""
+import os
+
+import numpy as np
+
+from memory.embedding_matrix import INT8, quantize, score_block, select_top_k
+
+try:
+    import faiss
+except ImportError:  # optional dependency
+    faiss = None
+
+
+class FlatIndex:
+    """Exact scan. Nothing to train, insert or persist."""
+
+    kind = "flat"
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def add(self, start_row: int, embeddings):
+        pass
+
+    def needs_training(self) -> bool:
+        return False
+
+    def compact(self, new_rows):
+        pass
+
+    def search(self, queries, top_k: int = 3):
+        return self.matrix.search(queries, top_k)
+
+    def save(self, path: str):
+        pass
+
+    def load(self, path: str) -> bool:
+        return False
+
+
+class IVFIndex:
+    """
+    Inverted-file index built in NumPy.
+    - Rows are clustered around `nlist` centroids (spherical k-means)
+    - Each list keeps its own contiguous copy of its vectors, so a query
+      scores `nprobe` small blocks instead of gathering rows
+    - New rows are assigned to their nearest centroid on insert
+    - Falls back to an exact scan until `min_train` rows exist, and asks to
+      be retrained once the store has grown `retrain_factor` times
+    """
+
+    kind = "ivf"
+
+    def __init__(self, matrix, nlist: int = None, nprobe: int = 8,
+                 min_train: int = 4096, retrain_factor: float = 4.0, seed: int = 0):
+        self.matrix = matrix
+        self.dim = matrix.dim
+        self.fixed_nlist = nlist
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self.retrain_factor = retrain_factor
+        self.seed = seed
+
+        self.centroids = None
+        self.trained_on = 0
+        self.ntotal = 0
+        self._list_rows = []
+        self._list_vecs = []     # stored in the matrix dtype
+        self._list_scales = []   # per-row scales when that dtype is int8
+        self._list_sizes = None
+
+    def __len__(self):
+        return self.ntotal
+
+    @property
+    def is_trained(self):
+        return self.centroids is not None
+
+    # --------------------------------------------------------------
+    # Training
+    # --------------------------------------------------------------
+    def needs_training(self) -> bool:
+        n = len(self.matrix)
+        if not self.is_trained:
+            return n >= self.min_train
+        return n >= self.retrain_factor * self.trained_on
+
+    def train(self, vectors, iters: int = 8):
+        """
+        Cluster a snapshot of the matrix and rebuild every list from it.
+        Pure function of `vectors`, so it can run on a worker thread and be
+        swapped in afterwards with `adopt()`.
+        """
+        n = len(vectors)
+        nlist = self.fixed_nlist or max(16, int(2 * np.sqrt(n)))
+        rng = np.random.default_rng(self.seed)
+        sample = vectors[rng.choice(n, size=min(n, 32 * nlist), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+        for _ in range(iters):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            sums[empty] = centroids[empty]  # keep empty clusters where they were
+            norms[empty] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+
+        trained = IVFIndex(self.matrix, self.fixed_nlist, self.nprobe,
+                           self.min_train, self.retrain_factor, self.seed)
+        trained.centroids = centroids
+        trained.trained_on = n
+        trained._reset_lists()
+        trained._insert(0, vectors)
+        return trained
+
+    def adopt(self, trained):
+        """Swap in an index produced by `train()` and catch up on newer rows."""
+        self.centroids = trained.centroids
+        self.trained_on = trained.trained_on
+        self._list_rows, self._list_vecs = trained._list_rows, trained._list_vecs
+        self._list_scales = trained._list_scales
+        self._list_sizes = trained._list_sizes
+        self.ntotal = trained.ntotal
+        if self.ntotal < len(self.matrix):
+            self._insert(self.ntotal, self.matrix.vectors[self.ntotal:])
+
+    # --------------------------------------------------------------
+    # Insert / search
+    # --------------------------------------------------------------
+    def add(self, start_row: int, embeddings):
+        if self.is_trained:
+            self._insert(start_row, np.asarray(embeddings, dtype=np.float32).reshape(-1, self.dim))
+
+    def compact(self, new_rows):
+        """Follow EmbeddingMatrix.compact(): `new_rows[old row]` is the new row, or -1 if dropped."""
+        if not self.is_trained:
+            return
+        for l in range(len(self._list_rows)):
+            size = self._list_sizes[l]
+            rows = new_rows[self._list_rows[l][:size]]
+            keep = rows >= 0
+            m = int(keep.sum())
+            self._list_vecs[l][:m] = self._list_vecs[l][:size][keep]
+            if self._list_scales:
+                self._list_scales[l][:m] = self._list_scales[l][:size][keep]
+            self._list_rows[l][:m] = rows[keep]
+            self._list_sizes[l] = m
+        # Row order is preserved, so the indexed prefix stays a prefix
+        self.ntotal = int((new_rows[:self.ntotal] >= 0).sum())
+
+    def search(self, queries, top_k: int = 3):
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, self.dim)
+        if not self.is_trained:
+            return self.matrix.search(queries, top_k)
+
+        nprobe = min(self.nprobe, len(self.centroids))
+        probes, _ = select_top_k(queries @ self.centroids.T, nprobe)
+
+        all_rows, all_scores = [], []
+        for q, lists in zip(queries, probes):
+            rows = [self._list_rows[l][:self._list_sizes[l]] for l in lists]
+            scores = [self._score_list(l, q) for l in lists]
+            rows, scores = np.concatenate(rows), np.concatenate(scores)
+            idx, best = select_top_k(scores[None, :], top_k)
+            all_rows.append(rows[idx[0]])
+            all_scores.append(best[0])
+        return all_rows, all_scores  # per query: sparse probes may hold fewer than top_k rows
+
+    def _score_list(self, l: int, q):
+        size = self._list_sizes[l]
+        scales = self._list_scales[l][:size] if self._list_scales else None
+        return score_block(q[None, :], self._list_vecs[l][:size], scales)[0]
+
+    def _reset_lists(self):
+        nlist = len(self.centroids)
+        self._list_rows = [np.empty(16, dtype=np.int64) for _ in range(nlist)]
+        self._list_vecs = [np.empty((16, self.dim), dtype=self.matrix.dtype) for _ in range(nlist)]
+        self._list_scales = []
+        if self.matrix.dtype == INT8:
+            self._list_scales = [np.empty(16, dtype=np.float32) for _ in range(nlist)]
+        self._list_sizes = np.zeros(nlist, dtype=np.int64)
+        self.ntotal = 0
+
+    def _insert(self, start_row: int, vectors):
+        if len(vectors) == 0:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        assign = np.argmax(vectors @ self.centroids.T, axis=1)
+        rows = np.arange(start_row, start_row + len(vectors))
+        order = np.argsort(assign, kind="stable")
+        lists, starts = np.unique(assign[order], return_index=True)
+        for l, chunk in zip(lists, np.split(order, starts[1:])):
+            size = self._list_sizes[l]
+            self._put(l, size, rows[chunk], vectors[chunk])
+        self.ntotal = max(self.ntotal, start_row + len(vectors))
+
+    def _put(self, l: int, at: int, rows, vectors):
+        """Write rows and their (quantized) vectors into list `l` from position `at`."""
+        end = at + len(rows)
+        self._grow(l, end)
+        codes, scales = quantize(vectors, self.matrix.dtype)
+        self._list_rows[l][at:end] = rows
+        self._list_vecs[l][at:end] = codes
+        if self._list_scales:
+            self._list_scales[l][at:end] = scales
+        self._list_sizes[l] = end
+
+    def _grow(self, l: int, needed: int):
+        capacity = len(self._list_rows[l])
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        size = self._list_sizes[l]
+        rows = np.empty(capacity, dtype=np.int64)
+        rows[:size] = self._list_rows[l][:size]
+        vecs = np.empty((capacity, self.dim), dtype=self._list_vecs[l].dtype)
+        vecs[:size] = self._list_vecs[l][:size]
+        self._list_rows[l], self._list_vecs[l] = rows, vecs
+        if self._list_scales:
+            scales = np.empty(capacity, dtype=np.float32)
+            scales[:size] = self._list_scales[l][:size]
+            self._list_scales[l] = scales
+
+    # --------------------------------------------------------------
+    # Persistence
+    # --------------------------------------------------------------
+    def save(self, path: str):
+        """Store centroids and list membership; vectors are re-read from the matrix."""
+        if not self.is_trained:
+            return
+        list_rows = np.concatenate([r[:s] for r, s in zip(self._list_rows, self._list_sizes)])
+        with open(path, "wb") as f:
+            np.savez(f, centroids=self.centroids, sizes=self._list_sizes, rows=list_rows,
+                     meta=np.array([self.trained_on, self.ntotal, self.matrix.generation]))
+
+    def load(self, path: str) -> bool:
+        if not os.path.exists(path):
+            return False
+        try:
+            with np.load(path) as data:
+                if "centroids" not in data or data["centroids"].shape[1] != self.dim:
+                    return False
+                centroids, sizes, list_rows = data["centroids"], data["sizes"], data["rows"]
+                trained_on, ntotal, generation = (int(x) for x in data["meta"])
+        except (OSError, ValueError, AttributeError):
+            return False  # not an IVF file (another backend's, or saved without a generation)
+        if not _matches(self.matrix, ntotal, generation):
+            return False
+
+        self.centroids, self.trained_on = centroids, trained_on
+        vectors = self.matrix.vectors
+        self._reset_lists()
+        for l, rows in enumerate(np.split(list_rows, np.cumsum(sizes)[:-1])):
+            self._put(l, 0, rows, vectors[rows])
+        self.ntotal = ntotal
+        if ntotal < len(self.matrix):  # rows written after the last save
+            self._insert(ntotal, vectors[ntotal:])
+        return True
+
+
+class FaissIndex:
+    """FAISS HNSW over inner product; rows are inserted in matrix order."""
+
+    kind = "faiss"
+
+    def __init__(self, matrix, m: int = 32, ef_search: int = 64):
+        if faiss is None:
+            raise ImportError("faiss is not installed")
+        self.matrix = matrix
+        self.m = m
+        self.ef_search = ef_search
+        self.index = self._new_index()
+        self.stale = False  # emptied by compact(), rebuilt through train()/adopt()
+
+    def _new_index(self):
+        index = faiss.IndexHNSWFlat(self.matrix.dim, self.m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efSearch = self.ef_search
+        return index
+
+    def __len__(self):
+        return self.index.ntotal
+
+    def needs_training(self) -> bool:
+        return self.stale
+
+    def train(self, vectors):
+        index = self._new_index()
+        index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+        return index
+
+    def adopt(self, trained):
+        self.index = trained
+        self.stale = False
+        self._catch_up()
+
+    def compact(self, new_rows):
+        """HNSW cannot drop vectors: search exactly until the index is rebuilt."""
+        self.index = self._new_index()
+        self.stale = True
+
+    def add(self, start_row: int, embeddings):
+        if self.stale:
+            return
+        if start_row != self.index.ntotal:
+            self._catch_up()
+            return
+        self.index.add(np.ascontiguousarray(embeddings, dtype=np.float32).reshape(-1, self.matrix.dim))
+
+    def _catch_up(self):
+        n = self.index.ntotal
+        if n < len(self.matrix):
+            self.index.add(np.ascontiguousarray(self.matrix.vectors[n:]))
+
+    def search(self, queries, top_k: int = 3):
+        queries = np.ascontiguousarray(queries, dtype=np.float32).reshape(-1, self.matrix.dim)
+        if self.index.ntotal == 0:
+            return self.matrix.search(queries, top_k)
+        scores, rows = self.index.search(queries, min(top_k, self.index.ntotal))
+        found = rows >= 0  # HNSW pads with -1 when it finds fewer than top_k
+        return [r[f] for r, f in zip(rows, found)], [s[f] for s, f in zip(scores, found)]
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            np.savez(f, index=faiss.serialize_index(self.index),
+                     meta=np.array([self.index.ntotal, self.matrix.generation]))
+
+    def load(self, path: str) -> bool:
+        if not os.path.exists(path):
+            return False
+        try:
+            with np.load(path) as data:
+                index = faiss.deserialize_index(data["index"])
+                ntotal, generation = (int(x) for x in data["meta"])
+        except (OSError, ValueError, KeyError, RuntimeError):
+            return False  # not a FAISS file (another backend's, or saved without a generation)
+        if index.d != self.matrix.dim or not _matches(self.matrix, ntotal, generation):
+            return False  # stale or foreign file: rebuild from the matrix
+        index.hnsw.efSearch = self.ef_search
+        self.index = index
+        self._catch_up()
+        return True
+
+
+def _matches(matrix, ntotal: int, generation: int) -> bool:
+    """Whether a saved index still describes `matrix`: same rows, none of them lost."""
+    return generation == matrix.generation and ntotal <= len(matrix)
+
+
+# ---------------------------------------------------------------------
+# Factory
+# ---------------------------------------------------------------------
+def create_index(kind: str, matrix, path: str = None, **kwargs):
+    """
+    Build the index named by `kind` ("flat", "ivf", "faiss" or "auto")
+    and load its saved state from `path` if there is one.
+    """
+    if kind == "auto":
+        kind = "faiss" if faiss is not None else "ivf"
+    if kind == "faiss" and faiss is None:
+        print("[Index] faiss not installed, falling back to the NumPy IVF index.")
+        kind = "ivf"
+
+    if kind == "flat":
+        index = FlatIndex(matrix)
+    elif kind == "ivf":
+        index = IVFIndex(matrix, **kwargs)
+    elif kind == "faiss":
+        index = FaissIndex(matrix, **kwargs)
+    else:
+        raise ValueError(f"Unknown vector index type: {kind}")
+
+    if path and index.load(path):
+        print(f"[Index] Loaded {index.kind} index from {path} ({len(index)} vectors).")
+    elif isinstance(index, FaissIndex):
+        index._catch_up()
+    return index
@@ -1 +1,124 @@
-# Future: tools for extracting keywords from summaries
\ No newline at end of file
+# memory/keywords.py
+"""
+Keyword extraction and an incremental inverted index over memory fragments.
+Like the vector indexes it speaks in embedding-matrix rows, so MemoryStore
+can score just the rows that share a term with the query.
+
+- Terms are lower-cased words minus stopwords and bare numbers
+- Postings grow by doubling (rows ascending, with term frequencies)
+- Candidates come with Okapi BM25 scores; terms found in more than
+  `max_df` of all fragments do not select candidates, since past that
+  share scoring the candidates costs more than a full dense scan
+"""
+import re
+from collections import Counter
+
+import numpy as np
+
+_WORD = re.compile(r"[a-z][a-z0-9_']+")
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being
+below between both but by can could did do does doing down during each few for from
+further had has have having he her here hers him his how i if in into is it its itself
+just me memory more most my no nor not now of off on once only or other our out over
+own same she should so some such than that the their them then there these they this
+those through to too under until up very was we were what when where which while who
+whom why will with would you your context
+""".split())
+
+
+def extract_keywords(text: str) -> list:
+    """Index terms of `text`, in order, with repeats."""
+    return [w for w in _WORD.findall(text.lower()) if w not in STOPWORDS]
+
+
+class KeywordIndex:
+    def __init__(self, k1: float = 1.2, b: float = 0.75, max_df: float = 0.1):
+        self.k1 = k1
+        self.b = b
+        self.max_df = max_df
+        self._postings = {}   # term -> [rows, tfs, size]
+        self._doc_len = np.zeros(1024, dtype=np.float32)
+        self.count = 0
+        self._total_len = 0.0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def terms(self):
+        return len(self._postings)
+
+    # --------------------------------------------------------------
+    def add(self, start_row: int, texts: list):
+        """Index `texts` at consecutive rows from `start_row` (must be the next row)."""
+        if start_row != self.count:
+            raise ValueError(f"Keyword index holds {self.count} rows, got start row {start_row}")
+        end = start_row + len(texts)
+        if end > len(self._doc_len):
+            grown = np.zeros(max(end, 2 * len(self._doc_len)), dtype=np.float32)
+            grown[:self.count] = self._doc_len[:self.count]
+            self._doc_len = grown
+
+        for row, text in enumerate(texts, start_row):
+            terms = extract_keywords(text)
+            self._doc_len[row] = len(terms)
+            self._total_len += len(terms)
+            for term, tf in Counter(terms).items():
+                posting = self._postings.get(term)
+                if posting is None:
+                    posting = self._postings[term] = [
+                        np.empty(4, dtype=np.int64), np.empty(4, dtype=np.float32), 0,
+                    ]
+                rows, tfs, size = posting
+                if size == len(rows):
+                    posting[0] = rows = np.resize(rows, 2 * size)
+                    posting[1] = tfs = np.resize(tfs, 2 * size)
+                rows[size], tfs[size] = row, tf
+                posting[2] = size + 1
+        self.count = end
+
+    def candidates(self, query: str):
+        """
+        (rows, BM25 scores) of fragments sharing a selective term with
+        `query`, rows ascending. Both empty if no query term is selective.
+        """
+        n = self.count
+        rows, scores = [], []
+        if n:
+            avg_len = self._total_len / n
+            for term in set(extract_keywords(query)):
+                posting = self._postings.get(term)
+                if posting is None:
+                    continue
+                size = posting[2]
+                if size > self.max_df * n:
+                    continue
+                r, tf = posting[0][:size], posting[1][:size]
+                idf = np.log(1.0 + (n - size + 0.5) / (size + 0.5))
+                norm = self.k1 * (1.0 - self.b + self.b * self._doc_len[r] / avg_len)
+                rows.append(r)
+                scores.append(idf * tf * (self.k1 + 1.0) / (tf + norm))
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        rows, inverse = np.unique(np.concatenate(rows), return_inverse=True)
+        return rows, np.bincount(inverse, weights=np.concatenate(scores)).astype(np.float32)
+
+    def compact(self, new_rows):
+        """Follow EmbeddingMatrix.compact(): `new_rows[old row]` is the new row, or -1 if dropped."""
+        for term in list(self._postings):
+            rows, tfs, size = self._postings[term]
+            mapped = new_rows[rows[:size]]
+            keep = mapped >= 0
+            m = int(keep.sum())
+            if not m:
+                del self._postings[term]
+                continue
+            tfs[:m] = tfs[:size][keep]
+            rows[:m] = mapped[keep]
+            self._postings[term][2] = m
+        kept = np.flatnonzero(new_rows[:self.count] >= 0)
+        self._doc_len[:len(kept)] = self._doc_len[kept]
+        self.count = len(kept)
+        self._total_len = float(self._doc_len[:self.count].sum())
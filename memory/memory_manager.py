@@ -1,33 +1,149 @@
 # memory/memory_manager.py
 import asyncio
+import time
+
+from memory.consolidation import LRU
+from utils.tracing import tracer
 
 class MemoryManager:
     """
     Background manager for saving and maintaining agent memory.
     - Collects new experiences from a queue.
-    - Periodically prunes or compresses old memories.
+    - Drains the queue into micro-batches, flushed when `max_batch` items are
+      waiting or `max_latency` seconds after the first one arrived.
+    - Encodes each batch in one call on a worker thread, so the event loop
+      (serial ingest, WebSocket, token streaming) never waits on the model.
+    - Every `consolidate_every` seconds, merges near-duplicate memories
+      (cosine >= `dedup_threshold`) and evicts down to `capacity` by
+      `eviction` ("lru" or "importance"), without blocking retrieval.
     """
 
-    def __init__(self, store):
+    def __init__(self, store, max_batch: int = 32, max_latency: float = 0.5,
+                 consolidate_every: float = None, dedup_threshold: float = 0.95,
+                 capacity: int = None, eviction: str = LRU):
         self.store = store
         self.input_queue = asyncio.Queue()
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.consolidate_every = consolidate_every
+        self.dedup_threshold = dedup_threshold
+        self.capacity = capacity
+        self.eviction = eviction
         self.running = True
 
+        # Throughput counters
+        self.fragments_stored = 0
+        self.batches_stored = 0
+        self.encode_seconds = 0.0
+        self.last_batch_size = 0
+        self.consolidations = 0
+        self.merged = 0
+        self.evicted = 0
+        self.consolidate_seconds = 0.0
+
     async def push_memory(self, reasoning: str, context: str):
         """Add new fragment to queue for async storage."""
         await self.input_queue.put((reasoning, context))
 
+    @property
+    def queue_depth(self) -> int:
+        return self.input_queue.qsize()
+
+    def stats(self) -> dict:
+        """Queue depth and encode throughput since start."""
+        rate = self.fragments_stored / self.encode_seconds if self.encode_seconds else 0.0
+        return {
+            "queue_depth": self.queue_depth,
+            "fragments_stored": self.fragments_stored,
+            "batches_stored": self.batches_stored,
+            "last_batch_size": self.last_batch_size,
+            "encode_seconds": round(self.encode_seconds, 3),
+            "encode_per_second": round(rate, 1),
+            "consolidations": self.consolidations,
+            "merged": self.merged,
+            "evicted": self.evicted,
+            "consolidate_seconds": round(self.consolidate_seconds, 3),
+        }
+
     async def run(self):
-        """Continuously store new memory fragments."""
+        """Continuously store new memory fragments in micro-batches."""
         print("[MemoryManager] Background task started.")
+        consolidator = asyncio.create_task(self._consolidate_loop()) if self.consolidate_every else None
+        try:
+            await self._store_loop()
+        finally:
+            if consolidator:
+                consolidator.cancel()
+
+    async def _store_loop(self):
         while self.running:
             try:
-                reasoning, context = await self.input_queue.get()
-                await self.store.add_fragment(reasoning, context)
-                print("[MemoryManager] Added new memory fragment.")
+                batch = await self._next_batch()
+                records = self.store.make_records(batch)
+
+                start = time.perf_counter()
+                with tracer.span("memory_encode"):
+                    embs = await asyncio.to_thread(self.store.encode, [r[0] for r in records])
+                elapsed = time.perf_counter() - start
+                tracer.observe("memory_encode_batch", len(records))
+
+                await self.store.add_encoded(records, embs)
+                self.fragments_stored += len(batch)
+                self.batches_stored += 1
+                self.encode_seconds += elapsed
+                self.last_batch_size = len(batch)
+                print(
+                    f"[MemoryManager] Added {len(batch)} new memory fragment(s) "
+                    f"(encode {elapsed * 1000:.0f} ms, queue depth {self.queue_depth})."
+                )
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 print(f"[MemoryManager] Error: {e}")
-            await asyncio.sleep(0.2)
+
+    async def consolidate(self):
+        """One consolidation pass over the store."""
+        start = time.perf_counter()
+        plan = await self.store.consolidate(self.dedup_threshold, self.capacity, self.eviction)
+        if plan is None:
+            return None
+        elapsed = time.perf_counter() - start
+        self.consolidations += 1
+        self.merged += len(plan.merged_into)
+        self.evicted += len(plan.evicted)
+        self.consolidate_seconds += elapsed
+        print(
+            f"[MemoryManager] Consolidated {plan.n} fragments: {len(plan.merged_into)} merged, "
+            f"{len(plan.evicted)} evicted, {len(self.store)} kept ({elapsed * 1000:.0f} ms)."
+        )
+        return plan
+
+    async def _consolidate_loop(self):
+        while self.running:
+            await asyncio.sleep(self.consolidate_every)
+            try:
+                await self.consolidate()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[MemoryManager] Consolidation error: {e}")
+
+    async def _next_batch(self):
+        """Wait for one item, then gather more until the size or latency limit."""
+        batch = [await self.input_queue.get()]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.max_batch:
+            if not self.input_queue.empty():
+                batch.append(self.input_queue.get_nowait())
+                continue
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.input_queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
 
     def stop(self):
-        self.running = False
\ No newline at end of file
+        self.running = False
@@ -1,35 +1,389 @@
 # memory/vector_store.py
 import asyncio
+import itertools
+import os
+import threading
+import time
 import numpy as np
-from sentence_transformers import SentenceTransformer
+
+from memory import consolidation
+from memory.cache import LRUCache, normalize_query
+from memory.consolidation import LRU
+from memory.embedding_matrix import EmbeddingMatrix, select_top_k
+from memory.fragments import FragmentDB
+from memory.index import create_index
+from memory.keywords import KeywordIndex
+from utils.tracing import tracer
 
 class MemoryStore:
     """
     Asynchronous memory system using semantic embeddings.
     Stores reasoning/context fragments and retrieves the most relevant ones.
+    - Fragment text and metadata persist in SQLite (`db_path`)
+    - Embeddings persist in an append-only memory-mapped .npy next to it,
+      so a restart maps the file instead of re-encoding anything;
+      `embedding_dtype` float16 / int8 stores them 2x / 4x smaller.
+      Consolidation writes a new generation of the file and the database
+      commit switches to it, so a crash never pairs ids with moved rows
+    - Without a `db_path` everything stays in memory
+    - Search goes through a pluggable index (flat / ivf / faiss / auto),
+      saved at `index_path` and retrained off the event loop as it grows
+    - A keyword inverted index is kept alongside; queries with selective
+      terms score only the fragments sharing them (dense + BM25). On
+      reopen it is rebuilt on a worker thread; until then search is dense
+    - Query embeddings are cached by normalized text, and results by
+      (query, top_k). A result older than the newest fragments is refreshed
+      by scoring only those against its hits; consolidation drops them all.
+      `version` bumps whenever fragments change
+    - The embedding model loads lazily on a background thread
+      (`load_model_async()`); encode() waits for it if it is not ready yet
+    - `consolidate()` merges near-duplicates and evicts down to a capacity;
+      it plans on a worker thread and holds the lock only to apply
     """
 
-    def __init__(self, model_name="all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
-        self.embeddings = []     # List[np.ndarray]
-        self.fragments = []      # List[str]
+    def __init__(self, model_name="all-MiniLM-L6-v2", dim=384, db_path=None,
+                 index_type="flat", index_path=None, query_cache_size=256, result_cache_size=128,
+                 keyword_prefilter=True, keyword_weight=0.3, embedding_dtype="float32"):
+        self.model_name = model_name
+        self.model = None
+        self.model_load_seconds = None
+        self._model_ready = threading.Event()
+        self._model_thread = None
+        self._model_error = None
+        self.db = FragmentDB(db_path or ":memory:")
+        emb_path = os.path.splitext(db_path)[0] + ".npy" if db_path else None
+        self.matrix = EmbeddingMatrix(dim, path=emb_path, dtype=embedding_dtype,
+                                      generation=self.db.compactions())
+        self.matrix.restore_ids(self.db.load_ids())
+        self.index = create_index(index_type, self.matrix, index_path)
+        self.index_path = index_path
+        self.keywords = KeywordIndex() if not len(self.matrix) else None  # None while rebuilding
+        self._keyword_task = None
+        self.keyword_prefilter = keyword_prefilter
+        self.keyword_weight = keyword_weight
+        self.keyword_searches = 0
+        self.dense_searches = 0
+        self.refreshed_results = 0
+        self._train_task = None
+        self.query_cache = LRUCache(query_cache_size)
+        self.result_cache = LRUCache(result_cache_size)
+        self.version = 0
         self.lock = asyncio.Lock()
+        self.last_used = {}          # fragment id -> last retrieval time, written on consolidation
+        self._consolidated_rows = 0  # rows already deduplicated against each other
+        self._consolidating = False
+        if db_path:
+            print(f"[MemoryStore] Loaded {len(self.matrix)} fragments from {db_path}.")
+
+    def __len__(self):
+        return len(self.matrix)
+
+    @property
+    def compactions(self) -> int:
+        """Bumped whenever rows move (persisted, see EmbeddingMatrix.generation)."""
+        return self.matrix.generation
 
     async def add_fragment(self, reasoning: str, context: str):
         """Adds a new memory fragment with its embedding."""
-        fragment = f"[MEMORY] {reasoning.strip()} | context: {context.strip()}"
-        emb = self.model.encode(fragment, convert_to_numpy=True, normalize_embeddings=True)
+        await self.add_fragments([(reasoning, context)])
+
+    async def add_fragments(self, items: list):
+        """Adds a batch of (reasoning, context) fragments in one encode and one transaction."""
+        if not items:
+            return
+        records = self.make_records(items)
+        embs = await asyncio.to_thread(self.encode, [r[0] for r in records])
+        await self.add_encoded(records, embs)
+
+    @staticmethod
+    def make_records(items: list):
+        """(reasoning, context) pairs -> (fragment text, reasoning, context) records."""
+        return [
+            (f"[MEMORY] {reasoning.strip()} | context: {context.strip()}", reasoning, context)
+            for reasoning, context in items
+        ]
+
+    def encode(self, texts: list):
+        """Blocking batch encode; call it through asyncio.to_thread from coroutines."""
+        return self._require_model().encode(texts, convert_to_numpy=True, normalize_embeddings=True)
+
+    async def add_encoded(self, records: list, embs):
+        """Stores already-encoded records in one transaction."""
         async with self.lock:
-            self.fragments.append(fragment)
-            self.embeddings.append(emb)
+            with self.db.transaction():
+                ids = self.db.insert_many(self.matrix.count, records)
+                start = self.matrix.append(ids, embs)
+                self.matrix.flush()  # header before commit: a crash never leaves ids without rows
+            self.index.add(start, embs)
+            if self.keywords is not None:
+                self.keywords.add(start, [f"{reasoning} {context}" for _, reasoning, context in records])
+            self.version += 1  # cached results fold the new rows in when next asked
+        self._maybe_train_index()
+        self._maybe_build_keywords()
 
     async def retrieve_from_keywords(self, query: str, top_k: int = 3):
         """Retrieves top-K semantically similar fragments."""
-        if not self.fragments:
-            return []
+        with tracer.span("retrieval"):
+            results = await self.retrieve_many([query], top_k=top_k)
+        return results[0]
 
-        q_emb = self.model.encode(query, convert_to_numpy=True, normalize_embeddings=True)
+    async def retrieve_many(self, queries: list, top_k: int = 3):
+        """
+        Retrieves top-K fragments for each query with one batched encode and scan.
+        Cached results are returned as-is; only unseen query texts hit the model.
+        A cached result from before the newest fragments is refreshed by
+        scoring just those against its hits, without a search.
+        """
+        if not len(self.matrix):
+            return [[] for _ in queries]
+        self._maybe_build_keywords()
+
+        keys = [normalize_query(q) for q in queries]
+        # entry: (ids, texts, rows, rows in the matrix then, compactions then)
+        cached = {k: self.result_cache.get((k, top_k)) for k in keys}
+        now = time.time()
+        pending = []
+        for key, entry in cached.items():
+            if entry is not None and entry[3:] == (len(self.matrix), self.compactions):
+                self.last_used.update(dict.fromkeys(entry[0], now))
+            else:
+                pending.append(key)
+        if not pending:
+            return [list(cached[k][1]) for k in keys]
+
+        q_embs = await self._embed_queries(pending)
         async with self.lock:
-            scores = np.dot(self.embeddings, q_emb)
-            top_indices = np.argsort(scores)[-top_k:][::-1]
-            return [self.fragments[i] for i in top_indices]
\ No newline at end of file
+            found = [None] * len(pending)
+            for i, key in enumerate(pending):
+                entry = cached[key]
+                if entry is not None and entry[4] == self.compactions:  # rows were only appended since
+                    found[i] = self._fold_in(entry[2], entry[3], q_embs[i], top_k)
+                    self.refreshed_results += 1
+            search = [i for i, rows in enumerate(found) if rows is None]
+            if search:
+                for i, rows in zip(search, self._search([pending[i] for i in search], q_embs[search], top_k)):
+                    found[i] = rows
+            hit_ids = [self.matrix.ids[rows].tolist() for rows in found]
+            texts = self.db.get_texts([i for row in hit_ids for i in row])
+            state = (len(self.matrix), self.compactions)
+
+        for key, rows, row in zip(pending, found, hit_ids):
+            hit = [j for j, i in enumerate(row) if i in texts]
+            ids = [row[j] for j in hit]
+            self.last_used.update(dict.fromkeys(ids, now))
+            cached[key] = (ids, [texts[i] for i in ids], np.asarray(rows)[hit], *state)
+            self.result_cache.put((key, top_k), cached[key])
+        return [list(cached[k][1]) for k in keys]
+
+    def _fold_in(self, rows, since: int, q, top_k: int):
+        """Top-k of an earlier result's `rows` and the rows appended from `since` on, by dense score."""
+        candidates = np.concatenate([rows, np.arange(since, len(self.matrix))])
+        scores = self.matrix.vectors[candidates] @ q
+        best, _ = select_top_k(scores[None, :], top_k)
+        return candidates[best[0]]
+
+    def _search(self, keys: list, q_embs, top_k: int):
+        """
+        Top-k rows per query. Queries with selective keywords score only the
+        rows sharing them (dense score plus weighted, max-normalized BM25);
+        the rest go through the vector index in one batch.
+        """
+        found = [None] * len(keys)
+        if self.keyword_prefilter and self.keywords is not None:
+            limit = self.keywords.max_df * len(self.matrix)
+            for i, (key, q) in enumerate(zip(keys, q_embs)):
+                rows, bm25 = self.keywords.candidates(key)
+                if len(rows) < top_k or len(rows) > limit:
+                    continue  # too few to fill top_k, or so many that a full scan is cheaper
+                scores = self.matrix.vectors[rows] @ q
+                if self.keyword_weight:
+                    scores += self.keyword_weight * bm25 / bm25.max()
+                best, _ = select_top_k(scores[None, :], top_k)
+                found[i] = rows[best[0]]
+                self.keyword_searches += 1
+
+        dense = [i for i, rows in enumerate(found) if rows is None]
+        if dense:
+            rows, _ = self.index.search(q_embs[dense], top_k)
+            for i, r in zip(dense, rows):
+                found[i] = r
+            self.dense_searches += len(dense)
+        return found
+
+    async def _embed_queries(self, keys: list):
+        """Embeddings for normalized query keys, encoding only cache misses."""
+        cached = {k: self.query_cache.get(k) for k in keys}
+        missing = [k for k, emb in cached.items() if emb is None]
+        if missing:
+            embs = await asyncio.to_thread(self.encode, missing)
+            for k, emb in zip(missing, embs):
+                self.query_cache.put(k, emb)
+                cached[k] = emb
+        return np.stack([cached[k] for k in keys])
+
+    # --------------------------------------------------------------
+    # Consolidation
+    # --------------------------------------------------------------
+    async def consolidate(self, threshold: float = 0.95, capacity: int = None, policy: str = LRU):
+        """
+        Merge near-duplicate fragments into the oldest one (adding up their
+        hits) and evict down to `capacity`. Returns the plan, or None if
+        there was nothing to do. Retrieval keeps running while the plan is
+        computed; rows appended meanwhile are kept and checked next time.
+        """
+        n = len(self.matrix)
+        over = capacity is not None and n > capacity
+        if self._consolidating or self._train_task is not None or (n == self._consolidated_rows and not over):
+            return None
+        self._consolidating = True
+        try:
+            vectors = self.matrix.vectors  # only consolidate() moves rows, so the view is stable until apply
+            ids = self.matrix.ids.copy()
+            usage = self.db.get_usage(ids)
+            hits = [usage[i][0] for i in ids.tolist()]
+            last_used = [max(usage[i][1], self.last_used.get(i, 0.0)) for i in ids.tolist()]
+            result = await asyncio.to_thread(
+                consolidation.plan, vectors, hits, last_used,
+                min(self._consolidated_rows, n), threshold, capacity, policy,
+            )
+            async with self.lock:
+                self._apply(result, ids)
+            return result
+        finally:
+            self._consolidating = False
+
+    def _apply(self, result, ids):
+        """Drop the plan's rows from the database, matrix and index (caller holds the lock)."""
+        total = len(self.matrix)  # rows appended while planning follow the kept ones
+        keep = np.concatenate([result.keep, np.arange(result.n, total)])
+        new_rows = np.full(total, -1, dtype=np.int64)
+        new_rows[keep] = np.arange(len(keep))
+        current = self.matrix.ids.tolist()
+        moves = [(current[old], new) for new, old in enumerate(keep.tolist()) if old != new]
+        ids = ids.tolist()
+        touched = set(result.merged_into.values())
+        touched.update(r for r in result.keep.tolist() if ids[r] in self.last_used)
+        usage = {ids[r]: (int(result.hits[r]), float(result.last_used[r])) for r in touched}
+        removed = [ids[r] for r in result.removed.tolist()]
+
+        with self.matrix.compacting(keep) as generation:  # new rows are synced before the commit
+            with self.db.transaction():
+                self.db.compact(removed, moves, usage, generation)
+        self.index.compact(new_rows)
+        if self.index_path:
+            self.index.save(self.index_path)  # the saved file named the old rows
+        if self.keywords is not None:
+            self.keywords.compact(new_rows)
+        for i in itertools.chain(removed, usage):
+            self.last_used.pop(i, None)
+        self._consolidated_rows = len(result.keep)
+        self.version += 1
+        self.result_cache.clear()
+        self._maybe_train_index()
+
+    # --------------------------------------------------------------
+    # Embedding model (lazy, background load)
+    # --------------------------------------------------------------
+    def load_model_async(self):
+        """Start loading the embedding model on a background thread (idempotent)."""
+        if self._model_thread is None:
+            self._model_thread = threading.Thread(
+                target=self._load_model, name="embedding-model-loader", daemon=True
+            )
+            self._model_thread.start()
+
+    async def wait_until_ready(self):
+        """Await the background model load; raises if it failed."""
+        self.load_model_async()
+        self._maybe_build_keywords()
+        await asyncio.to_thread(self._require_model)
+
+    def set_model(self, model):
+        """Use an already-built encoder (anything with SentenceTransformer's encode())."""
+        self.model = model
+        self._model_ready.set()
+
+    def _load_model(self):
+        start = time.perf_counter()
+        try:
+            from sentence_transformers import SentenceTransformer  # slow import, kept off the startup path
+            self.model = SentenceTransformer(self.model_name)
+            self.model_load_seconds = time.perf_counter() - start
+            print(f"[MemoryStore] Embedding model loaded in {self.model_load_seconds:.1f}s.")
+        except Exception as e:
+            self._model_error = e
+            print(f"[MemoryStore] Embedding model failed to load: {e}")
+        finally:
+            self._model_ready.set()
+
+    def _require_model(self):
+        if self.model is None:
+            self.load_model_async()
+            self._model_ready.wait()
+            if self.model is None:
+                raise RuntimeError(f"Embedding model unavailable: {self._model_error}")
+        return self.model
+
+    # --------------------------------------------------------------
+    # Index maintenance
+    # --------------------------------------------------------------
+    def _maybe_train_index(self):
+        if self._train_task is None and self.index.needs_training():
+            self._train_task = asyncio.create_task(self._train_index())
+
+    async def _train_index(self):
+        """Cluster a snapshot of the matrix on a worker thread, then swap it in."""
+        try:
+            snapshot = self.matrix.vectors  # rows only move in consolidate(); see the check below
+            compactions = self.compactions
+            print(f"[MemoryStore] Training {self.index.kind} index on {len(snapshot)} fragments...")
+            trained = await asyncio.to_thread(self.index.train, snapshot)
+            async with self.lock:
+                if compactions != self.compactions:
+                    return  # rows moved underneath the snapshot; the next add retrains
+                self.index.adopt(trained)
+                if self.index_path:
+                    self.index.save(self.index_path)
+            print("[MemoryStore] Index ready.")
+        except Exception as e:
+            print(f"[MemoryStore] Index training failed: {e}")
+        finally:
+            self._train_task = None
+
+    def _maybe_build_keywords(self):
+        if self.keyword_prefilter and self.keywords is None and self._keyword_task is None:
+            self._keyword_task = asyncio.create_task(self._build_keywords())
+
+    async def _build_keywords(self):
+        """Re-tokenize the stored fragments on a worker thread, then catch up and swap in."""
+        try:
+            while True:
+                n, compactions = len(self.matrix), self.compactions
+                start = time.perf_counter()
+                built = await asyncio.to_thread(self._keyword_snapshot, n)
+                async with self.lock:
+                    if compactions != self.compactions:
+                        continue  # rows moved underneath the snapshot: rebuild
+                    built.add(n, self.db.load_keyword_texts(n, len(self.matrix)))
+                    self.keywords = built
+                    self.result_cache.clear()
+                break
+            print(f"[MemoryStore] Keyword index ready ({built.terms} terms, "
+                  f"{time.perf_counter() - start:.1f}s).")
+        except Exception as e:
+            print(f"[MemoryStore] Keyword index build failed, searching dense only: {e}")
+            self.keyword_prefilter = False
+        finally:
+            self._keyword_task = None
+
+    def _keyword_snapshot(self, n: int) -> KeywordIndex:
+        index = KeywordIndex()
+        index.add(0, self.db.load_keyword_texts(0, n, separate=True))
+        return index
+
+    def close(self):
+        """Flush the embedding file, save the index and close the database."""
+        self.matrix.flush()
+        if self.index_path:
+            self.index.save(self.index_path)
+        self.db.close()
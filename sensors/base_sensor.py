@@ -1,6 +1,11 @@
 class BaseSensor:
-    def __init__(self, name):
+    def __init__(self, name, store=None):
         self.name = name
+        self.store = store  # optional TimeSeriesStore that gets every sample
+
+    def record(self, channel: str, value: float):
+        if self.store is not None:
+            self.store.record(channel, value)
 
     def read(self):
         raise NotImplementedError
\ No newline at end of file
@@ -4,19 +4,19 @@ class DistanceSensor(BaseSensor):
     """
     Virtual distance sensor that receives lines like 'DIST:32.5'
     from the serial dispatcher and tracks min/max/current values
-    since the last read() call.
+    since the last read() call. Every sample also goes to the time-series
+    store when one is attached.
+    handle_line and read both run on the event loop thread and never
+    interleave, so no lock is needed.
     """
-    def __init__(self):
-        super().__init__("distance")
+    def __init__(self, store=None):
+        super().__init__("distance", store)
         self._current = None
         self._min = None
         self._max = None
-        self._lock = False  # prevents re-entry during read/update
 
     def handle_line(self, text: str):
         """Handle one line from serial (called by SerialDispatcher)."""
-        if self._lock:
-            return  # avoid update while being read
         try:
             _, raw = text.split(":", 1)
             val = float(raw)
@@ -25,6 +25,7 @@ class DistanceSensor(BaseSensor):
                 self._min = val
             if self._max is None or val > self._max:
                 self._max = val
+            self.record("distance", val)
         except (ValueError, IndexError):
             pass
 
@@ -33,7 +34,6 @@ class DistanceSensor(BaseSensor):
         Return a dictionary containing the min, max, and current distance
         since the last read() call, then reset min/max tracking.
         """
-        self._lock = True
         result = {
             "curr (cm)": self._current,
             "min (cm)": self._min,
@@ -42,5 +42,4 @@ class DistanceSensor(BaseSensor):
         # Reset min/max for next window
         self._min = self._current
         self._max = self._current
-        self._lock = False
         return result
\ No newline at end of file
@@ -1,16 +1,81 @@
 import asyncio
+import binascii
+import struct
+
 import serial_asyncio
 
+from utils.tracing import tracer
+
+TEXT = "text"
+BINARY = "binary"
+
+# Binary framing (see arduino/LLM_Controller, BINARY_FRAMING):
+#   0xA5 | type | len | payload[len] | crc16(type, len, payload), little-endian
+SYNC = 0xA5
+FRAME_DIST = 0x01   # int16 distance in mm
+FRAME_TEMP = 0x02   # int16 temperature and uint16 humidity, both x10
+FRAME_TEXT = 0x7F   # raw text line (acks, errors, "Arduino ready")
+
+
+def crc16(data) -> int:
+    """CRC-16/XMODEM, same as _crc_xmodem_update() from avr-libc's util/crc16.h."""
+    return binascii.crc_hqx(data, 0)
+
+
+def encode_frame(kind: int, payload: bytes) -> bytes:
+    body = bytes((kind, len(payload))) + payload
+    return bytes((SYNC,)) + body + crc16(body).to_bytes(2, "little")
+
+
+def _decode_dist(payload: bytes) -> str:
+    (mm,) = struct.unpack("<h", payload)
+    return f"DIST:{mm / 10:.1f}"
+
+
+def _decode_temp(payload: bytes) -> str:
+    t, h = struct.unpack("<hH", payload)
+    if t == -32768:
+        return "TEMP:ERROR"
+    return f"TEMP:{t / 10:.1f},HUM:{h / 10:.1f}"
+
+
+def _decode_text(payload: bytes) -> str:
+    return payload.decode(errors="ignore")
+
+
+# Binary frames are turned back into the text lines the sensor handlers parse
+FRAME_DECODERS = {FRAME_DIST: _decode_dist, FRAME_TEMP: _decode_temp, FRAME_TEXT: _decode_text}
+
+
 class SerialProtocol(asyncio.Protocol):
     """
     Async serial protocol that receives data line-by-line and
     dispatches each line to a matching handler in `handlers`.
+    - Lines are framed in a bytearray and cut out by offset; the buffer is
+      compacted once per chunk rather than once per line
+    - Handlers keyed "TAG:" are looked up by the tag before the first ':'
+    - Lines longer than max_line are discarded (up to the next newline)
+    - framing="binary" reads the compact checksummed frames instead
     """
 
-    def __init__(self, handlers: dict):
+    def __init__(self, handlers: dict, framing: str = TEXT, max_line: int = 512):
         super().__init__()
+        if framing not in (TEXT, BINARY):
+            raise ValueError(f"Unknown serial framing: {framing}")
         self.handlers = handlers or {}
-        self.buffer = ""
+        self.framing = framing
+        self.max_line = max_line
+        self.buffer = bytearray()
+        self._discarding = False  # inside an over-long line
+
+        # "TAG:" handlers go in a dict keyed by TAG; anything else falls back to prefix matching
+        self._by_tag = {p[:-1]: f for p, f in self.handlers.items() if p.endswith(":") and p.count(":") == 1}
+        self._prefixed = [p for p in self.handlers if not (p.endswith(":") and p[:-1] in self._by_tag)]
+
+        self.lines = 0
+        self.unmatched = 0
+        self.overlong = 0
+        self.bad_frames = 0
 
     # ------------------------------------------------------------------
     # Connection setup
@@ -19,36 +84,110 @@ class SerialProtocol(asyncio.Protocol):
         self.transport = transport
         port = transport.serial.port
         baud = transport.serial.baudrate
-        print(f"[SerialDispatcher] Connected to {port} @ {baud}")
+        print(f"[SerialDispatcher] Connected to {port} @ {baud} ({self.framing} framing)")
 
     # ------------------------------------------------------------------
     # Data reception
     # ------------------------------------------------------------------
     def data_received(self, data):
-        """Accumulate bytes until newline, then process full line."""
-        try:
-            text = data.decode(errors="ignore")
-        except UnicodeDecodeError:
+        """Accumulate bytes until a full line (or frame), then process it."""
+        self.buffer += data
+        with tracer.span("serial_chunk"):  # per chunk: a span per line would cost as much as the parse
+            if self.framing == BINARY:
+                self._read_frames()
+            else:
+                self._read_lines()
+
+    def _read_lines(self):
+        buf = self.buffer
+        last = buf.rfind(b"\n")
+        if last < 0:
+            if len(buf) > self.max_line or self._discarding:
+                # No newline in sight: drop the partial line and skip to the next one
+                if not self._discarding:
+                    self.overlong += 1
+                self._discarding = True
+                buf.clear()
             return
 
-        self.buffer += text
-        while "\n" in self.buffer:
-            line, self.buffer = self.buffer.split("\n", 1)
-            line = line.strip()
+        lines = buf[:last].split(b"\n")  # one copy per chunk, split in C
+        del buf[:last + 1]
+        if self._discarding:
+            lines[0] = b""  # tail of the over-long line
+            self._discarding = False
+        for raw in lines:
+            if len(raw) > self.max_line:
+                self.overlong += 1
+                continue
+            line = raw.decode(errors="ignore").strip()
             if line:
                 self._dispatch_line(line)
+        if len(buf) > self.max_line:
+            self.overlong += 1
+            self._discarding = True
+            buf.clear()
+
+    def _read_frames(self):
+        buf = self.buffer
+        start = 0
+        while True:
+            sync = buf.find(SYNC, start)
+            if sync < 0:
+                start = len(buf)
+                break
+            if len(buf) - sync < 5:
+                start = sync
+                break
+            kind, length = buf[sync + 1], buf[sync + 2]
+            decoder = FRAME_DECODERS.get(kind)
+            if decoder is None:  # stray 0xA5: don't wait for a length read from garbage
+                self.bad_frames += 1
+                start = sync + 1
+                continue
+            end = sync + 3 + length
+            if end + 2 > len(buf):
+                start = sync
+                break
+            crc = buf[end] | (buf[end + 1] << 8)
+            if crc16(buf[sync + 1:end]) != crc:
+                self.bad_frames += 1
+                start = sync + 1  # resync on the next 0xA5
+                continue
+            try:
+                line = decoder(bytes(buf[sync + 3:end])).strip()
+            except struct.error:
+                self.bad_frames += 1
+            else:
+                if line:
+                    self._dispatch_line(line)
+            start = end + 2
+        if start:
+            del buf[:start]
 
     def _dispatch_line(self, line: str):
         """Find a matching handler and call it."""
         # print(f"[SerialDispatcher] Line: {line}")  # Debug log
+        self.lines += 1
+        tag = line.partition(":")[0]
+        func = self._by_tag.get(tag)
+        if func is None and self._prefixed:
+            tag = next((p for p in self._prefixed if line.startswith(p)), None)
+            func = self.handlers.get(tag)
+        if func is None:
+            self.unmatched += 1
+            return
+        try:
+            func(line)
+        except Exception as e:
+            print(f"[SerialDispatcher] Error in handler for {tag}: {e}")
 
-        for prefix, func in self.handlers.items():
-            if line.startswith(prefix):
-                try:
-                    func(line)
-                except Exception as e:
-                    print(f"[SerialDispatcher] Error in handler for {prefix}: {e}")
-                break
+    def stats(self) -> dict:
+        return {
+            "lines": self.lines,
+            "unmatched": self.unmatched,
+            "overlong": self.overlong,
+            "bad_frames": self.bad_frames,
+        }
 
     # ------------------------------------------------------------------
     # Connection teardown
@@ -63,7 +202,8 @@ class SerialProtocol(asyncio.Protocol):
 # ----------------------------------------------------------------------
 # Factory function for creating and starting dispatcher
 # ----------------------------------------------------------------------
-async def create_dispatcher(port: str, baudrate: int, handlers: dict):
+async def create_dispatcher(port: str, baudrate: int, handlers: dict, framing: str = TEXT,
+                            max_line: int = 512):
     """
     Open an async serial connection using the provided handlers.
     Returns (transport, protocol) for control/cleanup.
@@ -71,8 +211,8 @@ async def create_dispatcher(port: str, baudrate: int, handlers: dict):
     loop = asyncio.get_running_loop()
     transport, protocol = await serial_asyncio.create_serial_connection(
         loop,
-        lambda: SerialProtocol(handlers),
+        lambda: SerialProtocol(handlers, framing, max_line),
         port,
         baudrate
     )
-    return transport, protocol
\ No newline at end of file
+    return transport, protocol
@@ -4,11 +4,12 @@ class TempSensor(BaseSensor):
     """
     Handles serial messages of the form:
       TEMP:<temperature>,HUM:<humidity>
-    Updates the latest readings for use by the reasoning agent.
+    Updates the latest readings for use by the reasoning agent, and records
+    every sample into the time-series store when one is attached.
     """
 
-    def __init__(self):
-        super().__init__("temperature")
+    def __init__(self, store=None):
+        super().__init__("temperature", store)
         self.last_temp = None
         self.last_hum = None
 
@@ -27,6 +28,8 @@ class TempSensor(BaseSensor):
                 if len(parts) == 2:
                     self.last_temp = float(parts[0])
                     self.last_hum = float(parts[1])
+                    self.record("temperature", self.last_temp)
+                    self.record("humidity", self.last_hum)
                     # print(f"[TempSensor] Temperature: {self.last_temp:.1f}°C, Humidity: {self.last_hum:.1f}%")
                 else:
                     print(f"[TempSensor] Malformed TEMP line: {line}")
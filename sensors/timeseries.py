@@ -0,0 +1,147 @@
+# sensors/timeseries.py
+"""
+Full-rate sensor time-series store.
+Every sample the Arduino sends is recorded per channel into fixed-size
+NumPy rings of incremental 1 s, 10 s and 1 min rollups (count / min /
+max / mean); the newest raw sample is kept for change triggers. Memory
+is constant and long-horizon queries read a bounded number of buckets.
+"""
+import time
+
+import numpy as np
+
+RESOLUTIONS = {1: 3600, 10: 8640, 60: 1440}   # bucket width (s) -> buckets kept (1 h, 24 h, 24 h)
+
+
+class Rollup:
+    """Ring of fixed-width time buckets, updated in O(1) per sample."""
+
+    def __init__(self, width_s: int, capacity: int):
+        self.width_s = width_s
+        self.capacity = capacity
+        self.bucket = np.full(capacity, -1, dtype=np.int64)  # bucket number (t // width)
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.min = np.zeros(capacity)
+        self.max = np.zeros(capacity)
+        self.sum = np.zeros(capacity)
+        self.head = -1        # ring position of the newest bucket
+        self.current = None   # bucket number at head
+
+    def add(self, t: float, value: float):
+        b = int(t // self.width_s)
+        if self.current is None or b > self.current:
+            self.head = (self.head + 1) % self.capacity
+            self.current = b
+            self.bucket[self.head] = b
+            self.count[self.head] = 0
+            self.min[self.head] = np.inf
+            self.max[self.head] = -np.inf
+            self.sum[self.head] = 0.0
+            pos = self.head
+        else:
+            # Late sample: find its bucket if it is still in the ring
+            back = self.current - b
+            pos = (self.head - back) % self.capacity
+            if back >= self.capacity or self.bucket[pos] != b:
+                return  # too old (or behind a gap in the ring): dropped from this rollup
+        self.count[pos] += 1
+        self.sum[pos] += value
+        if value < self.min[pos]:
+            self.min[pos] = value
+        if value > self.max[pos]:
+            self.max[pos] = value
+
+    def window(self, since: float) -> dict:
+        """Buckets starting at or after `since` (unix s), oldest first."""
+        if self.current is None:
+            return _empty_rollup()
+        first = int(since // self.width_s)
+        n = min(self.capacity, max(0, self.current - first + 1))
+        idx = (self.head - np.arange(n - 1, -1, -1)) % self.capacity
+        idx = idx[(self.bucket[idx] >= first) & (self.count[idx] > 0)]
+        count = self.count[idx]
+        return {
+            "t": self.bucket[idx] * float(self.width_s),
+            "count": count,
+            "min": self.min[idx],
+            "max": self.max[idx],
+            "mean": self.sum[idx] / np.maximum(count, 1),
+        }
+
+
+class Channel:
+    """Rollups of one signal plus its newest sample."""
+
+    def __init__(self, resolutions: dict = None):
+        self.total = 0      # samples ever recorded
+        self._last = None   # (timestamp, value) of the newest sample
+        self.rollups = {w: Rollup(w, cap) for w, cap in (resolutions or RESOLUTIONS).items()}
+
+    def record(self, value: float, t: float):
+        self._last = (float(t), float(value))
+        self.total += 1
+        for rollup in self.rollups.values():
+            rollup.add(t, value)
+
+    def latest(self):
+        """(timestamp, value) of the newest sample, or None."""
+        return self._last
+
+    def rollup(self, horizon_s: float, resolution: int = None, now: float = None, max_buckets: int = 120) -> dict:
+        """
+        Buckets covering the last `horizon_s`. Without an explicit resolution
+        the finest one giving at most `max_buckets` buckets is used, so the
+        cost does not grow with the horizon.
+        """
+        now = time.time() if now is None else now
+        if resolution is None:
+            widths = sorted(self.rollups)
+            resolution = next((w for w in widths if horizon_s / w <= max_buckets), widths[-1])
+        return self.rollups[resolution].window(now - horizon_s)
+
+    def stats(self, horizon_s: float, now: float = None) -> dict:
+        """count / min / max / mean over the last `horizon_s` (bucket-aligned)."""
+        r = self.rollup(horizon_s, now=now)
+        count = int(r["count"].sum())
+        if not count:
+            return {"count": 0, "min": None, "max": None, "mean": None}
+        return {
+            "count": count,
+            "min": float(r["min"].min()),
+            "max": float(r["max"].max()),
+            "mean": float((r["mean"] * r["count"]).sum() / count),
+        }
+
+
+class TimeSeriesStore:
+    """Named channels, created on first record. Subscribers see every sample."""
+
+    def __init__(self, resolutions: dict = None):
+        self.resolutions = resolutions or RESOLUTIONS
+        self.channels = {}
+        self.subscribers = []
+
+    def record(self, name: str, value: float, t: float = None):
+        channel = self.channels.get(name)
+        if channel is None:
+            channel = self.channels[name] = Channel(self.resolutions)
+        t = time.time() if t is None else t
+        channel.record(value, t)
+        for callback in self.subscribers:
+            callback(name, value, t)
+
+    def subscribe(self, callback):
+        """callback(name, value, t) after each recorded sample."""
+        self.subscribers.append(callback)
+
+    def channel(self, name: str) -> Channel:
+        return self.channels[name]
+
+    def summary(self, horizon_s: float, now: float = None) -> dict:
+        """Per-channel stats over the last `horizon_s`."""
+        return {name: ch.stats(horizon_s, now) for name, ch in self.channels.items()}
+
+
+def _empty_rollup() -> dict:
+    empty = np.zeros(0)
+    return {"t": empty, "count": np.zeros(0, dtype=np.int64), "min": empty, "max": empty, "mean": empty}
@@ -0,0 +1,89 @@
+# tests/test_bridge.py
+import asyncio
+
+import pytest
+
+from llm.bridge import ActionParser, Bridge
+
+
+def parse(tokens):
+    parser = ActionParser()
+    found = []
+    for token in tokens:
+        found += [command for command, _ in parser.feed(token)]
+    return found + [command for command, _ in parser.flush()]
+
+
+@pytest.mark.parametrize("text", [
+    "There is no need to stop now.",
+    "Let's move on to the next reading.",
+    "Nothing should move.",
+    "I will not immediately stop the motor.",
+])
+def test_prose_is_not_a_directive(text):
+    assert parse([text]) == []
+
+
+def test_explicit_commands():
+    assert parse(["Path clear. MOTOR_ON, then LED_OFF.\nTOGGLE_LED"]) == ["MOTOR_ON", "LED_OFF", "TOGGLE_LED"]
+
+
+def test_command_split_across_tokens():
+    assert parse(["Go: MO", "TOR", "_O", "N now"]) == ["MOTOR_ON"]
+
+
+def test_command_is_emitted_by_the_token_that_completes_it():
+    parser = ActionParser()
+    assert parser.feed("MOTOR_OFF", t=1.0) == []
+    assert parser.feed(" and wait", t=2.0) == [("MOTOR_OFF", 2.0)]
+
+
+def test_longer_word_is_not_a_command():
+    assert parse(["MOTOR_ON", "E and MOTOR_OFFSET"]) == []
+
+
+def test_flush_emits_trailing_command():
+    parser = ActionParser()
+    assert parser.feed("LED_ON", t=1.0) == []
+    assert parser.flush(t=3.0) == [("LED_ON", 3.0)]
+
+
+class _Transport:
+    def __init__(self):
+        self.lines = []
+
+    def write(self, data):
+        self.lines.append(data.decode().strip())
+
+    def is_closing(self):
+        return False
+
+
+def test_bridge_deduplicates_and_rate_limits():
+    async def run():
+        transport = _Transport()
+        bridge = Bridge(transport, min_interval_s=0.05, refresh_s=10.0)
+        bridge.begin()
+        bridge.feed("MOTOR_ON MOTOR_ON LED_ON ")   # second MOTOR_ON is a repeat
+        bridge.feed("MOTOR_OFF ")                   # urgent, never held
+        bridge.feed("MOTOR_ON ")                    # held until the gap ends
+        bridge.end()
+        assert transport.lines == ["MOTOR_ON", "LED_ON", "MOTOR_OFF"]
+        await asyncio.sleep(0.1)
+        assert transport.lines == ["MOTOR_ON", "LED_ON", "MOTOR_OFF", "MOTOR_ON"]
+        assert bridge.counts["deduplicated"] == 1
+
+    asyncio.run(run())
+
+
+def test_bridge_sends_only_the_latest_held_command():
+    async def run():
+        transport = _Transport()
+        bridge = Bridge(transport, min_interval_s=0.05, refresh_s=10.0)
+        bridge.feed("LED_ON LED_OFF TOGGLE_LED ")
+        bridge.end()
+        await asyncio.sleep(0.1)
+        assert transport.lines == ["LED_ON", "TOGGLE_LED"]
+        assert bridge.counts["coalesced"] == 1
+
+    asyncio.run(run())
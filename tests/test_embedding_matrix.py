@@ -0,0 +1,63 @@
+# tests/test_embedding_matrix.py
+import os
+
+import numpy as np
+import pytest
+
+from memory.embedding_matrix import INT8, EmbeddingMatrix
+
+
+def _filled(path, n=100, dim=8, dtype="float32"):
+    rng = np.random.default_rng(0)
+    v = rng.standard_normal((n, dim)).astype(np.float32)
+    v /= np.linalg.norm(v, axis=1, keepdims=True)
+    matrix = EmbeddingMatrix(dim, capacity=16, path=path, dtype=dtype)
+    matrix.append(np.arange(n), v)
+    matrix.flush()
+    return matrix, np.asarray(matrix.vectors).copy()
+
+
+def _reopen(path, generation, n=100, dim=8, dtype="float32"):
+    matrix = EmbeddingMatrix(dim, capacity=16, path=path, dtype=dtype, generation=generation)
+    matrix.restore_ids(np.arange(n))
+    return matrix
+
+
+def test_failed_commit_keeps_the_old_rows(tmp_path):
+    path = str(tmp_path / "m.npy")
+    matrix, before = _filled(path)
+    with pytest.raises(RuntimeError):
+        with matrix.compacting(np.arange(0, 100, 2)):
+            raise RuntimeError("commit failed")
+    assert len(matrix) == 100 and matrix.generation == 0
+    assert os.listdir(tmp_path) == ["m.npy"]
+    np.testing.assert_array_equal(np.asarray(_reopen(path, 0).vectors), before)
+
+
+def test_compaction_switches_files(tmp_path):
+    path = str(tmp_path / "m.npy")
+    matrix, before = _filled(path)
+    keep = np.arange(0, 100, 3)
+    with matrix.compacting(keep) as generation:
+        assert generation == 1
+    assert matrix.generation == 1 and len(matrix) == len(keep)
+    assert os.listdir(tmp_path) == ["m.1.npy"]
+    np.testing.assert_array_equal(matrix.ids, keep)
+    np.testing.assert_array_equal(np.asarray(_reopen(path, 1, len(keep)).vectors), before[keep])
+
+
+@pytest.mark.parametrize("committed", [False, True])
+def test_crash_during_compaction(tmp_path, committed):
+    path = str(tmp_path / "m.npy")
+    matrix, before = _filled(path, dtype=INT8)
+    keep = np.arange(0, 100, 2)
+    pending = matrix.compacting(keep)
+    pending.__enter__()  # staged and synced; the process dies here
+    generation = 1 if committed else 0
+    reopened = _reopen(path, generation, dtype=INT8)
+    expected = before[keep] if committed else before
+    assert len(reopened) == len(expected)
+    np.testing.assert_array_equal(np.asarray(reopened.vectors), expected)
+    assert sorted(os.listdir(tmp_path)) == (
+        ["m.1.npy", "m.scales.1.npy"] if committed else ["m.npy", "m.scales.npy"]
+    )
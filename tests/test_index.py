@@ -0,0 +1,62 @@
+# tests/test_index.py
+import numpy as np
+
+from memory.embedding_matrix import EmbeddingMatrix
+from memory.index import IVFIndex, create_index
+
+
+def _matrix(n, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    v = rng.standard_normal((n, dim)).astype(np.float32)
+    v /= np.linalg.norm(v, axis=1, keepdims=True)
+    matrix = EmbeddingMatrix(dim)
+    matrix.append(np.arange(n), v)
+    return matrix, v
+
+
+def _saved_ivf(path, n=500):
+    matrix, v = _matrix(n)
+    index = IVFIndex(matrix, nlist=64, nprobe=1, min_train=10)
+    index.adopt(index.train(matrix.vectors))
+    index.save(path)
+    return index, v
+
+
+def test_ivf_load_into_reset_matrix(tmp_path):
+    path = str(tmp_path / "ivf.index")
+    _saved_ivf(path)
+    index = create_index("ivf", EmbeddingMatrix(16), path, min_train=10)
+    assert not index.is_trained and len(index) == 0
+
+
+def test_ivf_load_into_shorter_matrix(tmp_path):
+    path = str(tmp_path / "ivf.index")
+    _, v = _saved_ivf(path)
+    matrix, _ = _matrix(100)
+    index = create_index("ivf", matrix, path, min_train=10)
+    assert not index.is_trained and index.needs_training()
+    rows, _ = index.search(v[:5], 3)
+    assert all((r < 100).all() for r in rows)
+
+
+def test_ivf_load_rejects_a_file_from_before_compaction(tmp_path):
+    path = str(tmp_path / "ivf.index")
+    index, v = _saved_ivf(path)
+    keep = np.arange(0, len(v), 2)
+    new_rows = np.full(len(v), -1)
+    new_rows[keep] = np.arange(len(keep))
+    with index.matrix.compacting(keep):
+        pass
+    index.compact(new_rows)
+    assert not create_index("ivf", index.matrix, path, min_train=10).is_trained
+    index.save(path)
+    reloaded = create_index("ivf", index.matrix, path, nprobe=64, min_train=10)
+    rows, _ = reloaded.search(v[keep[:50]], 1)
+    assert [r[0] for r in rows] == list(range(50))
+
+
+def test_ivf_search_keeps_each_querys_results(tmp_path):
+    index, v = _saved_ivf(str(tmp_path / "ivf.index"))
+    rows, scores = index.search(v[:20], 10)
+    assert max(len(r) for r in rows) == 10
+    assert all(len(r) == len(s) for r, s in zip(rows, scores))
@@ -0,0 +1,68 @@
+# tests/test_serial_dispatcher.py
+import struct
+
+from sensors.serial_dispatcher import (
+    BINARY, FRAME_DIST, FRAME_TEMP, FRAME_TEXT, SYNC, SerialProtocol, crc16, encode_frame,
+)
+
+
+def protocol():
+    seen = []
+    handlers = {"DIST:": seen.append, "TEMP:": seen.append, "Arduino ready": seen.append}
+    return SerialProtocol(handlers, framing=BINARY), seen
+
+
+def dist(mm):
+    return encode_frame(FRAME_DIST, struct.pack("<h", mm))
+
+
+def test_crc16_is_xmodem():
+    assert crc16(b"123456789") == 0x31C3
+
+
+def test_frames_decode_to_sensor_lines():
+    proto, seen = protocol()
+    proto.data_received(dist(1234)
+                        + encode_frame(FRAME_TEMP, struct.pack("<hH", 215, 480))
+                        + encode_frame(FRAME_TEXT, b"Arduino ready\n"))
+    assert seen == ["DIST:123.4", "TEMP:21.5,HUM:48.0", "Arduino ready"]
+    assert proto.stats() == {"lines": 3, "unmatched": 0, "overlong": 0, "bad_frames": 0}
+    assert not proto.buffer
+
+
+def test_resync_after_garbage():
+    proto, seen = protocol()
+    proto.data_received(b"\x00\xffnoise" + bytes((SYNC, 0x33)) + dist(500) + b"\x12" + dist(-20))
+    assert seen == ["DIST:50.0", "DIST:-2.0"]
+
+
+def test_frame_split_across_chunks():
+    proto, seen = protocol()
+    data = dist(10) + dist(20)
+    for i in range(len(data)):
+        proto.data_received(data[i:i + 1])
+    assert seen == ["DIST:1.0", "DIST:2.0"]
+    assert proto.bad_frames == 0
+
+
+def test_bad_crc_is_counted_and_skipped():
+    proto, seen = protocol()
+    corrupt = bytearray(dist(700))
+    corrupt[-1] ^= 0xFF
+    proto.data_received(bytes(corrupt) + dist(800))
+    assert seen == ["DIST:80.0"]
+    assert proto.bad_frames == 1
+
+
+def test_unknown_frame_type_is_bad():
+    proto, seen = protocol()
+    proto.data_received(encode_frame(0x42, b"\x01\x02") + dist(30))
+    assert seen == ["DIST:3.0"]
+    assert proto.bad_frames == 1
+
+
+def test_wrong_payload_length_is_bad():
+    proto, seen = protocol()
+    proto.data_received(encode_frame(FRAME_DIST, b"\x01") + dist(40))
+    assert seen == ["DIST:4.0"]
+    assert proto.bad_frames == 1
@@ -0,0 +1,67 @@
+# tests/test_vector_store.py
+import asyncio
+import zlib
+
+import numpy as np
+
+from memory.vector_store import MemoryStore
+
+
+def _open(tmp_path):
+    return MemoryStore(dim=16, db_path=str(tmp_path / "m.db"), index_type="ivf",
+                       index_path=str(tmp_path / "m.index"))
+
+
+def test_consolidated_store_reopens_with_a_matching_index(tmp_path):
+    async def run():
+        store = _open(tmp_path)
+        rng = np.random.default_rng(0)
+        v = rng.standard_normal((6000, 16)).astype(np.float32)
+        v /= np.linalg.norm(v, axis=1, keepdims=True)
+        await store.add_encoded(store.make_records([(f"r{i}", "c") for i in range(len(v))]), v)
+        await store._train_task
+        assert await store.consolidate(capacity=3000) is not None
+        return v  # no close(): the process dies here
+
+    v = asyncio.run(run())
+    reopened = _open(tmp_path)
+    assert len(reopened) == 3000 and reopened.compactions == 1
+    ids = reopened.matrix.ids
+    np.testing.assert_allclose(np.asarray(reopened.matrix.vectors), v[ids - 1], atol=1e-6)
+
+    rows = np.arange(0, 3000, 10)
+    found, _ = reopened.index.search(v[ids[rows] - 1], 3)
+    recall = np.mean([r in f for r, f in zip(rows, found)])
+    assert reopened.index.is_trained and recall > 0.9
+
+
+class _Encoder:
+    """Deterministic stand-in for SentenceTransformer: one random unit vector per text."""
+
+    def encode(self, texts, convert_to_numpy=True, normalize_embeddings=True):
+        out = []
+        for text in texts:
+            v = np.random.default_rng(zlib.crc32(text.encode())).standard_normal(16)
+            out.append(v / np.linalg.norm(v))
+        return np.asarray(out, dtype=np.float32)
+
+
+def test_cached_result_folds_in_newer_fragments():
+    async def run():
+        store = MemoryStore(dim=16, keyword_prefilter=False)
+        store.set_model(_Encoder())
+        await store.add_fragments([(f"thought {i}", f"ctx {i}") for i in range(50)])
+        query = "obstacle ahead"
+        first = await store.retrieve_from_keywords(query, top_k=3)
+
+        q = _Encoder().encode([query])[0]
+        record = store.make_records([("closest", "ctx")])
+        await store.add_encoded(record, q[None, :])   # a fragment matching the query exactly
+        refreshed = await store.retrieve_from_keywords(query, top_k=3)
+        assert store.refreshed_results == 1
+        assert refreshed[0] == record[0][0] and refreshed[1:] == first[:2]
+
+        store.result_cache.clear()
+        assert await store.retrieve_from_keywords(query, top_k=3) == refreshed
+
+    asyncio.run(run())
@@ -0,0 +1,144 @@
+# utils/change_gate.py
+"""
+Change detection for the summarizer.
+Computes per-key mean / min / max / slope / variance over a sensor window
+and compares them with the window behind the current summary, so a new
+LLM summarization pass only runs when the readings actually moved.
+"""
+import time
+
+import numpy as np
+
+DEFAULT_THRESHOLDS = {"mean": 0.5, "slope": 0.05, "std": 0.5}
+
+
+class WindowStats:
+    """Per-key statistics of one window; arrays are aligned with `keys`."""
+
+    def __init__(self, keys, timestamps, columns):
+        columns = np.asarray(columns, dtype=np.float64)
+        t = np.asarray(timestamps, dtype=np.float64)
+        valid = ~np.isnan(columns)
+
+        self.keys = list(keys)
+        self.count = valid.sum(axis=1)
+        self.span_s = float(t[-1] - t[0]) if len(t) else 0.0
+
+        n = np.maximum(self.count, 1)
+        filled = np.where(valid, columns, 0.0)
+        self.mean = filled.sum(axis=1) / n
+        dev = np.where(valid, columns - self.mean[:, None], 0.0)
+        self.var = (dev ** 2).sum(axis=1) / n
+        self.min = np.where(valid, columns, np.inf).min(axis=1, initial=np.inf)
+        self.max = np.where(valid, columns, -np.inf).max(axis=1, initial=-np.inf)
+
+        # Least-squares slope per second, over each key's own valid samples
+        t_mean = (valid * t).sum(axis=1) / n
+        tc = np.where(valid, t - t_mean[:, None], 0.0)
+        denom = (tc ** 2).sum(axis=1)
+        self.slope = np.divide((tc * dev).sum(axis=1), denom, out=np.zeros_like(denom), where=denom > 0)
+
+        self._index = {k: i for i, k in enumerate(self.keys)}
+
+    @classmethod
+    def of(cls, window):
+        """Stats of a SensorWindow."""
+        return cls(window.keys, window.timestamps, window.columns)
+
+    def get(self, key: str):
+        """(mean, min, max, slope, var) for a key, or None if it has no samples."""
+        i = self._index.get(key)
+        if i is None or self.count[i] == 0:
+            return None
+        return self.mean[i], self.min[i], self.max[i], self.slope[i], self.var[i]
+
+
+class ChangeGate:
+    """
+    Decides whether a new window differs enough from the summarized one.
+    - thresholds: {key prefix: {"mean", "slope", "std"} or None to ignore};
+      the longest matching prefix wins, "default" covers the rest
+    - max_defer_s: summarize anyway once the summary is this old
+    - min_span_s: slope and spread are only compared once both windows
+      cover at least this long (on a few samples they are mostly noise)
+    """
+
+    def __init__(self, thresholds: dict = None, max_defer_s: float = 60.0, min_span_s: float = 10.0):
+        self.thresholds = dict(thresholds or {})
+        self.max_defer_s = max_defer_s
+        self.min_span_s = min_span_s
+        self.baseline = None
+        self.summarized_at = None
+        self._resolved = {}
+
+        self.checks = 0
+        self.calls_saved = 0
+        self.calls_forced = 0
+        self.last_reasons = []
+
+    # --------------------------------------------------------------
+    def should_summarize(self, stats: WindowStats, now: float = None) -> bool:
+        now = time.monotonic() if now is None else now
+        self.checks += 1
+        if self.baseline is None:
+            self.last_reasons = ["no summary yet"]
+            return True
+
+        self.last_reasons = self.changes(stats)
+        if self.last_reasons:
+            return True
+        if now - self.summarized_at >= self.max_defer_s:
+            self.calls_forced += 1
+            self.last_reasons = [f"summary older than {self.max_defer_s:.0f}s"]
+            return True
+        self.calls_saved += 1
+        return False
+
+    def accept(self, stats: WindowStats, now: float = None):
+        """Record the window the current summary was built from."""
+        self.baseline = stats
+        self.summarized_at = time.monotonic() if now is None else now
+
+    def changes(self, stats: WindowStats) -> list:
+        """Human-readable reasons the window differs from the baseline (empty if it does not)."""
+        reasons = []
+        shape = min(stats.span_s, self.baseline.span_s) >= self.min_span_s
+        for key in stats.keys:
+            limits = self._limits(key)
+            new = stats.get(key)
+            if limits is None or new is None:
+                continue
+            old = self.baseline.get(key)
+            if old is None:
+                reasons.append(f"{key}: new")
+                continue
+
+            mean, lo, hi, slope, var = new
+            b_mean, b_lo, b_hi, b_slope, b_var = old
+            if abs(mean - b_mean) > limits["mean"]:
+                reasons.append(f"{key}: mean {b_mean:.2f} -> {mean:.2f}")
+            elif lo < b_lo - limits["mean"] or hi > b_hi + limits["mean"]:
+                reasons.append(f"{key}: range {lo:.2f}..{hi:.2f}")
+            elif shape and abs(slope - b_slope) > limits["slope"]:
+                reasons.append(f"{key}: slope {b_slope:+.3f} -> {slope:+.3f}/s")
+            elif shape and abs(np.sqrt(var) - np.sqrt(b_var)) > limits["std"]:
+                reasons.append(f"{key}: std {np.sqrt(b_var):.2f} -> {np.sqrt(var):.2f}")
+        return reasons
+
+    def stats(self) -> dict:
+        return {
+            "checks": self.checks,
+            "calls_saved": self.calls_saved,
+            "calls_forced": self.calls_forced,
+        }
+
+    # --------------------------------------------------------------
+    def _limits(self, key: str):
+        if key not in self._resolved:
+            matches = [p for p in self.thresholds if p != "default" and key.startswith(p)]
+            if matches:
+                limits = self.thresholds[max(matches, key=len)]
+            else:
+                limits = self.thresholds.get("default", {})
+            self._resolved[key] = None if limits is None else {**DEFAULT_THRESHOLDS, **limits}
+        return self._resolved[key]
@@ -1,25 +1,134 @@
-import json
+from utils.data_formatter import flatten
+from utils.tokens import MESSAGE_OVERHEAD, estimator
+from utils.tracing import tracer
+
+REASONING_INSTRUCTIONS = (
+    "[Provide reasoning and make conclusions regarding your current task in the form of a summary. Use the data available to you. "
+    "Keep your summary short, you don't have much time. Don't include grammer and use small words, use as little characters as possible. "
+    "Don't extrapolate, use only the information you have given to come to a conclusion. End when completed, don't follow up with another section.]\n"
+    "[If you decide to act, write the command as early as you can: MOTOR_ON, MOTOR_OFF, LED_ON or LED_OFF.]\n"
+    # "Example reasoning: I am in a room and am trying to leave. Based on the distance of 15cm, I am close to the door. I must move forward to leave.\n"
+)
+
+# Packing order and the share of the context budget each section is
+# guaranteed; whatever a section leaves unused goes to the next ones
+SECTION_SHARES = [("sensors", 0.25), ("short_term", 0.35), ("memory", 0.40)]
+
 
 class ContextBuilder:
-    def compose(self, initial: str, memory: list, short_term: str, sensors: dict):
-        mem_text = "\n".join(memory) if memory else "(no prior memories)"
-        sensor_text = json.dumps(sensors, indent=2)
+    """
+    Lays the reasoning prompt out as a static prefix followed by the
+    per-cycle content. The prefix (initial prompt + reasoning instructions)
+    is byte-identical between cycles, so Ollama can keep its KV cache and
+    only prefill what changed.
+    The per-cycle content is packed into a token budget (num_ctx minus room
+    for the reply) by section priority: sensors, then the short-term summary,
+    then as many whole memories as fit. `last_tokens` reports the result.
+    """
+
+    def __init__(self, num_ctx: int = 2048, reserve_output: int = 256):
+        self.num_ctx = num_ctx
+        self.reserve_output = reserve_output
+        self.last_tokens = {}
+
+    def system_prompt(self, initial: str) -> str:
         return (
             "=== INITIAL PROMPT ===\n"
             # "[Provide an initial prompt showing what your task is.]\n"
             f"{initial}\n\n"
-            "=== MEMORY ===\n"
-            # "[Provide your memories, what do you remember?]\n"
-            f"{mem_text}\n\n"
-            "=== SHORT TERM CONTEXT ===\n"
-            # "[Provide a summary of your recent knowledge of your environment]\n"
-            f"{short_term}\n\n"
-            "=== SENSORS ===\n"
-            # "[Provide a readout of what you are sensing in a readable format]\n"
-            f"{sensor_text}\n\n"
-            f"=== REASONING ===\n"
-            "[Provide reasoning and make conclusions regarding your current task in the form of a summary. Use the data available to you. "
-            "Keep your summary short, you don't have much time. Don't include grammer and use small words, use as little characters as possible. "
-            "Don't extrapolate, use only the information you have given to come to a conclusion. End when completed, don't follow up with another section.]\n"
-            # "Example reasoning: I am in a room and am trying to leave. Based on the distance of 15cm, I am close to the door. I must move forward to leave.\n"
-        )
\ No newline at end of file
+            "=== REASONING ===\n"
+            f"{REASONING_INSTRUCTIONS}"
+        )
+
+    def compose_messages(self, initial: str, memory: list, short_term: str, sensors: dict) -> list:
+        """Chat messages for /api/chat: static system prefix, then this cycle's packed context."""
+        with tracer.span("context_build"):
+            system = self.system_prompt(initial)
+            fixed = estimator.estimate(system) + estimator.estimate(_layout("", "", "")) + 2 * MESSAGE_OVERHEAD
+            sections = self._pack(
+                self.num_ctx - self.reserve_output - fixed,
+                sensors=encode_sensors(sensors),
+                short_term=short_term,
+                memory=memory or [],
+            )
+            context = _layout(sections["short_term"], sections["memory"], sections["sensors"])
+            self.last_tokens["system"] = estimator.estimate(system)
+            self.last_tokens["total"] = (
+                self.last_tokens["system"] + estimator.estimate(context) + 2 * MESSAGE_OVERHEAD
+            )
+            return [
+                {"role": "system", "content": system},
+                {"role": "user", "content": context},
+            ]
+
+    # --------------------------------------------------------------
+    def _pack(self, budget: int, **content) -> dict:
+        """Fit each section into its share of `budget`, passing slack down the priority list."""
+        budget = max(0, budget)
+        need = {
+            "sensors": estimator.estimate(content["sensors"]),
+            "short_term": estimator.estimate(content["short_term"]),
+            "memory": sum(estimator.estimate(m) + 1 for m in content["memory"]),
+        }
+        # Guaranteed shares first, then leftover to whoever still needs it, in priority order
+        alloc = {name: min(need[name], int(share * budget)) for name, share in SECTION_SHARES}
+        spare = budget - sum(alloc.values())
+        for name, _ in SECTION_SHARES:
+            extra = min(spare, need[name] - alloc[name])
+            alloc[name] += extra
+            spare -= extra
+
+        memories, used = [], 0
+        for m in content["memory"]:  # whole memories, best match first
+            cost = estimator.estimate(m) + 1
+            if used + cost > alloc["memory"]:
+                break
+            memories.append(m)
+            used += cost
+
+        packed = {
+            "sensors": estimator.truncate(content["sensors"], alloc["sensors"]),
+            "short_term": estimator.truncate(content["short_term"], alloc["short_term"], keep="end"),
+            "memory": "\n".join(memories),
+        }
+        self.last_tokens = {name: estimator.estimate(text) for name, text in packed.items()}
+        self.last_tokens["memories_kept"] = len(memories)
+        self.last_tokens["memories_dropped"] = len(content["memory"]) - len(memories)
+        return packed
+
+
+def _layout(short_term: str, memory: str, sensors: str) -> str:
+    return (
+        "=== SHORT TERM CONTEXT ===\n"
+        # "[Provide a summary of your recent knowledge of your environment]\n"
+        f"{short_term}\n\n"
+        "=== MEMORY ===\n"
+        # "[Provide your memories, what do you remember?]\n"
+        f"{memory or '(no prior memories)'}\n\n"
+        "=== SENSORS ===\n"
+        # "[Provide a readout of what you are sensing in a readable format]\n"
+        f"{sensors}\n"
+    )
+
+
+def encode_sensors(sensors: dict) -> str:
+    """
+    Compact one-line-per-sensor readout instead of indented JSON:
+        distance: curr (cm)=21.3 min (cm)=18 max (cm)=23.2
+    """
+    lines = []
+    for name, reading in sensors.items():
+        if isinstance(reading, dict):
+            fields = " ".join(f"{k}={_value(v)}" for k, v in flatten(reading).items())
+        else:
+            fields = _value(reading)
+        lines.append(f"{name}: {fields}")
+    return "\n".join(lines)
+
+
+def _value(v) -> str:
+    if v is None:
+        return "-"
+    if isinstance(v, float):
+        return f"{v:.2f}".rstrip("0").rstrip(".")
+    return str(v)
@@ -1,87 +1,179 @@
 # utils/data_formatter.py
 """
 Data Formatter — prepares sensor data batches for LLM summarization.
-Adds dynamic context culling to fit within a character budget.
+Fits the table to a character budget by picking which rows to keep
+(LTTB or min/max decimation) rather than deleting rows one by one.
 """
+import math
 
-def format_sensor_batch(batch, max_chars=1024):
+import numpy as np
+
+LTTB = "lttb"
+MINMAX = "minmax"
+
+
+def format_sensor_batch(batch, max_chars=1024, method=LTTB):
     """
     Formats a list of sensor readings into a compact, LLM-readable table.
     - Keeps only one header line for all entries
     - Uses '|' as delimiter (pipe table style)
     - Removes redundant whitespace and JSON clutter
-    - Dynamically truncates rows to fit within max_chars
+    - Flattens each entry once, then downsamples rows to fit within max_chars
+    Only the formatter benchmark and the __main__ demo call this; the
+    summarizer formats ring-buffer columns with format_sensor_columns().
     """
 
     if not batch:
         return "(no data)"
 
-    # Flatten and unify keys across all samples
-    all_keys = set()
-    for entry in batch:
-        if isinstance(entry, dict):
-            for k, v in _flatten(entry).items():
-                all_keys.add(k)
-    all_keys = sorted(all_keys)
-
-    # Build header
-    header = "|".join(all_keys)
-
-    # Build each row
-    rows = []
-    for entry in batch:
-        flat = _flatten(entry)
-        row = "|".join(str(flat.get(k, "")) for k in all_keys)
-        rows.append(row)
-
-    # Start full text
-    table = header + "\n" + "\n".join(rows)
+    # Flatten once and unify keys across all samples
+    flat_rows = [flatten(entry) for entry in batch if isinstance(entry, dict)]
+    if not flat_rows:
+        return "(no data)"
+    all_keys = sorted({k for flat in flat_rows for k in flat})
+    cells = [[flat.get(k) for flat in flat_rows] for k in all_keys]
+    numeric = np.array([[to_float(v) for v in col] for col in cells], dtype=np.float64)
+    return _format_table(all_keys, cells, numeric, max_chars, method)
 
-    # ✅ Keep newlines; just strip extra spaces per line
-    table = "\n".join(line.strip() for line in table.splitlines() if line.strip())
-    table = table.replace(" |", "|").replace("| ", "|")
 
-    # If too long, trim rows dynamically around center
-    if len(table) > max_chars:
-        table = _cull_rows(table, header, rows, max_chars)
+def format_sensor_columns(keys, columns, max_chars=1024, method=LTTB):
+    """
+    Same table from columnar data, e.g. a SensorRingBuffer window:
+    `columns` is (len(keys), n) with NaN for missing values.
+    """
+    columns = np.asarray(columns, dtype=np.float64)
+    if not keys or columns.shape[1] == 0:
+        return "(no data)"
 
-    return table
+    order = sorted(range(len(keys)), key=keys.__getitem__)
+    keys = [keys[i] for i in order]
+    columns = columns[order]
+    return _format_table(keys, columns, columns, max_chars, method)
 
 
 # ---------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------
-def _flatten(d, parent_key="", sep="."):
+def flatten(d, parent_key="", sep="."):
     """Flattens nested dicts like {'a': {'b': 1}} → {'a.b': 1}"""
     items = []
     for k, v in d.items():
         new_key = f"{parent_key}{sep}{k}" if parent_key else k
         if isinstance(v, dict):
-            items.extend(_flatten(v, new_key, sep=sep).items())
+            items.extend(flatten(v, new_key, sep=sep).items())
         else:
             items.append((new_key, v))
     return dict(items)
 
 
-def _cull_rows(table, header, rows, max_chars):
+def select_rows(numeric, n_out, method=LTTB):
     """
-    Dynamically removes rows from the middle outward to fit within max_chars.
-    Keeps temporal start/end structure to preserve sequence comprehension.
+    Indices of `n_out` rows that best preserve the shape of the data.
+    `numeric` is (ncols, n); the first and last rows are always kept.
+    - lttb: largest-triangle-three-buckets over all columns at once
+    - minmax: per bucket, the min and max row of the column that moves most
     """
-    header_len = len(header) + 1  # + newline
-    remaining_budget = max_chars - header_len
-    if remaining_budget <= 0:
+    n = numeric.shape[1]
+    if n_out >= n:
+        return np.arange(n)
+    if n_out <= 2:
+        return np.array([0, n - 1])[:max(n_out, 1)]
+
+    y = _normalize(numeric).T  # (n, ncols)
+    if method == MINMAX:
+        return _minmax(y, n_out)
+    if method == LTTB:
+        return _lttb(y, n_out)
+    raise ValueError(f"Unknown downsampling method: {method}")
+
+
+def _format_table(keys, cells, numeric, max_chars, method):
+    header = "|".join(keys)
+    n = numeric.shape[1]
+    budget = max_chars - len(header) - 1  # + newline
+    if budget <= 0:
         return header
 
-    culled = rows.copy()
+    # Estimate how many rows fit from an evenly spaced sample, then shrink
+    # until the rendered rows do (usually one or two passes)
+    probe = np.unique(np.linspace(0, n - 1, min(n, 64)).astype(int))
+    avg = sum(len(r) + 1 for r in _render_rows(cells, probe)) / len(probe)
+    n_fit = min(n, max(2, int(budget / avg)))
     while True:
-        text = header + "\n" + "\n".join(culled)
-        if len(text) <= max_chars or len(culled) <= 2:
-            return text
-
-        # Remove rows from the middle outward (center → quarter points → etc.)
-        idx = len(culled) // 2
-        del culled[idx]
+        idx = select_rows(numeric, n_fit, method)
+        rows = _render_rows(cells, idx)
+        used = sum(len(r) + 1 for r in rows)
+        if used <= budget + 1 or n_fit <= 2:  # last row has no trailing newline
+            return header + "\n" + "\n".join(rows)
+        n_fit = max(2, min(n_fit - 1, int(n_fit * budget / used)))
+
+
+def _render_rows(cells, idx):
+    """'|'-joined rows for the given indices, with empty cells for missing values."""
+    rendered = [[_cell(col[i]) for i in idx] for col in cells]
+    return ["|".join(parts) for parts in zip(*rendered)]
+
+
+def _cell(v):
+    if v is None or (isinstance(v, float) and math.isnan(v)):
+        return ""
+    if isinstance(v, float) and v.is_integer():
+        return str(int(v))
+    return str(v).strip()
+
+
+def to_float(v):
+    """Numeric values as float, anything else (None, strings) as NaN."""
+    return float(v) if isinstance(v, (int, float)) else np.nan
+
+
+def _normalize(numeric):
+    """Z-score each column so no single sensor dominates; missing → 0."""
+    with np.errstate(invalid="ignore"):
+        valid = ~np.isnan(numeric)
+        counts = np.maximum(valid.sum(axis=1, keepdims=True), 1)
+        filled = np.where(valid, numeric, 0.0)
+        mean = filled.sum(axis=1, keepdims=True) / counts
+        std = np.sqrt(np.where(valid, (numeric - mean) ** 2, 0.0).sum(axis=1, keepdims=True) / counts)
+        std[std == 0] = 1.0
+        return np.where(valid, (numeric - mean) / std, 0.0)
+
+
+def _buckets(n, n_buckets):
+    """Edges splitting the interior rows 1..n-2 into n_buckets ranges."""
+    return np.linspace(1, n - 1, n_buckets + 1).astype(int)
+
+
+def _lttb(y, n_out):
+    n = len(y)
+    x = np.arange(n, dtype=np.float64)
+    edges = _buckets(n, n_out - 2)
+    selected = np.empty(n_out, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for b in range(n_out - 2):
+        lo, hi = edges[b], edges[b + 1]
+        nlo, nhi = (hi, edges[b + 2]) if b + 2 < len(edges) else (n - 1, n)
+        cx, cy = x[nlo:nhi].mean(), y[nlo:nhi].mean(axis=0)
+        # Triangle (a, candidate, next-bucket average), generalised to many columns
+        cross = (x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi, None]) * (cy - y[a])
+        a = lo + int(np.argmax(np.einsum("ij,ij->i", cross, cross)))
+        selected[b + 1] = a
+    return selected
+
+
+def _minmax(y, n_out):
+    n = len(y)
+    edges = _buckets(n, max(1, (n_out - 2) // 2))
+    picks = [0, n - 1]
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if lo >= hi:
+            continue
+        seg = y[lo:hi]
+        col = int(np.argmax(seg.max(axis=0) - seg.min(axis=0)))
+        picks.extend((lo + int(np.argmin(seg[:, col])), lo + int(np.argmax(seg[:, col]))))
+    return np.unique(picks)
 
 
 # ---------------------------------------------------------------------
@@ -93,4 +185,4 @@ if __name__ == "__main__":
         {"time": 2, "temp": 22.2, "hum": 53.2},
         {"time": 3, "temp": 22.3, "hum": 53.1},
     ]
-    print(format_sensor_batch(batch, max_chars=100))
\ No newline at end of file
+    print(format_sensor_batch(batch, max_chars=100))
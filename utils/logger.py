@@ -1,16 +1,115 @@
 # utils/logger.py
 import asyncio
+from collections import deque
+
+
+class FrameQueue:
+    """
+    Bounded outgoing-frame queue that never blocks the producer: when full,
+    the oldest frame is dropped. The next frame handed to a consumer carries
+    a note saying how many were lost, so a late client sees the gap.
+    A deque plus an Event, for one consumer (the client's sender task).
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.dropped = 0     # frames discarded because nobody was reading
+        self.sent = 0        # frames a consumer confirmed with mark_sent()
+        self._frames = deque()
+        self._ready = asyncio.Event()
+        self._unreported = 0
+
+    def qsize(self) -> int:
+        return len(self._frames)
+
+    def empty(self) -> bool:
+        return not self._frames
+
+    def full(self) -> bool:
+        return self.maxsize > 0 and len(self._frames) >= self.maxsize
+
+    def put_nowait(self, item):
+        if self.full():
+            self._frames.popleft()
+            self.dropped += 1
+            self._unreported += 1
+        self._frames.append(item)
+        self._ready.set()
+
+    async def put(self, item):
+        self.put_nowait(item)
+
+    def get_nowait(self):
+        if not self._frames:
+            raise asyncio.QueueEmpty
+        item = self._frames.popleft()
+        if not self._frames:
+            self._ready.clear()
+        if self._unreported:
+            item = f"[... {self._unreported} log frames dropped ...]\n{item}"
+            self._unreported = 0
+        return item
+
+    async def get(self):
+        while not self._frames:
+            await self._ready.wait()
+        return self.get_nowait()
+
+    def mark_sent(self):
+        self.sent += 1
+
 
 class BroadcastLogger:
-    def __init__(self, output_queue=None):
+    """
+    Async logger for the WebSocket client.
+    Messages (e.g. single streamed tokens) are coalesced into one frame per
+    flush interval, or sooner once max_frame_chars have built up.
+    """
+
+    def __init__(self, output_queue=None, flush_interval: float = 0.05, max_frame_chars: int = 2048):
         self.output_queue = output_queue
+        self.flush_interval = flush_interval
+        self.max_frame_chars = max_frame_chars
+        self.messages = 0
+        self.frames = 0
+        self._pending = []
+        self._pending_chars = 0
+        self._timer = None
 
     async def aprint(self, msg: str):
         """Async print that sends logs to WebSocket if available, else console."""
-        if self.output_queue:
-            try:
-                await self.output_queue.put(msg)
-            except Exception as e:
-                print(f"[BroadcastLogger] Error sending to client: {e}")
-        else:
-            print(msg)
\ No newline at end of file
+        if not self.output_queue:
+            print(msg)
+            return
+        self._pending.append(msg)
+        self._pending_chars += len(msg)
+        self.messages += 1
+        if self._pending_chars >= self.max_frame_chars:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.flush_interval, self.flush)
+
+    def flush(self):
+        """Send everything pending as one frame."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        frame = "".join(self._pending)
+        self._pending, self._pending_chars = [], 0
+        try:
+            self.output_queue.put_nowait(frame)
+            self.frames += 1
+        except Exception as e:
+            print(f"[BroadcastLogger] Error sending to client: {e}")
+
+    def stats(self) -> dict:
+        queue = self.output_queue
+        return {
+            "messages": self.messages,
+            "frames": self.frames,
+            "frames_sent": getattr(queue, "sent", None),
+            "frames_dropped": getattr(queue, "dropped", None),
+            "queued": queue.qsize() if queue else 0,
+        }
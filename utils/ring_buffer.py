@@ -0,0 +1,126 @@
+# utils/ring_buffer.py
+"""
+Fixed-capacity, columnar ring buffer for sensor samples.
+One float64 column per flattened sensor key plus timestamps and sequence
+numbers; missing or non-numeric values are stored as NaN.
+"""
+import time
+
+import numpy as np
+
+from utils.data_formatter import flatten, to_float
+
+DROP_OLDEST = "drop_oldest"
+DOWNSAMPLE = "downsample"
+
+
+class SensorWindow:
+    """
+    A slice of the buffer: timestamps, sequence numbers and named columns.
+    View-backed windows are only valid until the buffer wraps over them.
+    """
+
+    def __init__(self, keys: list, timestamps, seqs, columns):
+        self.keys = keys
+        self.timestamps = timestamps   # (n,) float64
+        self.seqs = seqs               # (n,) int64
+        self.columns = columns         # (len(keys), n) float64, one row per key
+
+    def __len__(self):
+        return len(self.timestamps)
+
+
+class SensorRingBuffer:
+    """
+    - O(1) append of one flattened sample
+    - Readers track a sequence cursor and ask for everything since it
+    - Windows that do not wrap are zero-copy views into the buffer
+    - When full: `drop_oldest` overwrites the oldest row; `downsample` halves
+      the resolution of what is stored (keeping the newest row), so the
+      buffer keeps covering the whole horizon at coarser resolution
+    """
+
+    def __init__(self, capacity: int = 2048, policy: str = DOWNSAMPLE):
+        if policy not in (DROP_OLDEST, DOWNSAMPLE):
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.capacity = capacity
+        self.policy = policy
+        self.keys = []
+        self._key_index = {}
+        self._columns = np.full((0, capacity), np.nan)
+        self._timestamps = np.zeros(capacity)
+        self._seqs = np.zeros(capacity, dtype=np.int64)
+        self._start = 0      # physical index of the oldest row
+        self._count = 0
+        self.seq = 0         # sequence number of the next sample
+        self.dropped = 0     # rows lost to overflow
+
+    def __len__(self):
+        return self._count
+
+    # --------------------------------------------------------------
+    def append(self, sample: dict, timestamp: float = None):
+        flat = flatten(sample)
+        for key in flat:
+            if key not in self._key_index:
+                self._add_column(key)
+
+        if self._count == self.capacity:
+            self._make_room()
+
+        pos = (self._start + self._count) % self.capacity
+        self._columns[:, pos] = np.nan
+        for key, value in flat.items():
+            self._columns[self._key_index[key], pos] = to_float(value)
+        self._timestamps[pos] = time.time() if timestamp is None else timestamp
+        self._seqs[pos] = self.seq
+        self._count += 1
+        self.seq += 1
+
+    def window(self, since_seq: int = 0) -> SensorWindow:
+        """All rows with seq >= since_seq; a view unless the range wraps."""
+        parts = []
+        for lo, hi in self._segments():
+            first = lo + int(np.searchsorted(self._seqs[lo:hi], since_seq))
+            if first < hi:
+                parts.append((first, hi))
+
+        if len(parts) == 1:
+            lo, hi = parts[0]
+            return SensorWindow(list(self.keys), self._timestamps[lo:hi],
+                                self._seqs[lo:hi], self._columns[:, lo:hi])
+        idx = np.concatenate([np.arange(lo, hi) for lo, hi in parts]) if parts else np.arange(0)
+        return SensorWindow(list(self.keys), self._timestamps[idx],
+                            self._seqs[idx], self._columns[:, idx])
+
+    # --------------------------------------------------------------
+    def _segments(self):
+        """Physical (lo, hi) ranges in logical (oldest-first) order."""
+        end = self._start + self._count
+        if end <= self.capacity:
+            return [(self._start, end)]
+        return [(self._start, self.capacity), (0, end - self.capacity)]
+
+    def _make_room(self):
+        if self.policy == DROP_OLDEST:
+            self._start = (self._start + 1) % self.capacity
+            self._count -= 1
+            self.dropped += 1
+            return
+
+        # Downsample: keep every other row, always including the newest
+        order = np.concatenate([np.arange(lo, hi) for lo, hi in self._segments()])
+        keep = order[::-1][::2][::-1]
+        n = len(keep)
+        self._columns[:, :n] = self._columns[:, keep]
+        self._timestamps[:n] = self._timestamps[keep]
+        self._seqs[:n] = self._seqs[keep]
+        self.dropped += self._count - n
+        self._start = 0
+        self._count = n
+
+    def _add_column(self, key: str):
+        self._key_index[key] = len(self.keys)
+        self.keys.append(key)
+        self._columns = np.vstack([self._columns, np.full((1, self.capacity), np.nan)])
+
@@ -0,0 +1,30 @@
+# utils/settings.py
+"""
+Loads config/settings.yaml once and resolves the paths it names
+relative to the project root (so main.py can be started from anywhere).
+"""
+import os
+from functools import lru_cache
+
+import yaml
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SETTINGS_PATH = os.path.join(PROJECT_ROOT, "config", "settings.yaml")
+
+
+@lru_cache(maxsize=None)
+def load_settings(path: str = SETTINGS_PATH) -> dict:
+    """Return the parsed settings file (empty dict if it is missing)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        print(f"[Settings] {path} not found, using defaults.")
+        return {}
+
+
+def resolve_path(path: str) -> str:
+    """Resolve a settings path relative to the project root."""
+    if not path or path == ":memory:" or os.path.isabs(path):
+        return path
+    return os.path.join(PROJECT_ROOT, path)
@@ -0,0 +1,48 @@
+# utils/startup.py
+"""
+Startup timing — records how long each warm-start phase took, when it
+ran relative to process start, and one-off milestones such as the first
+reasoning token.
+"""
+import time
+
+
+class StartupTimer:
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.phases = {}   # name -> (start_s, end_s, ok)
+        self.marks = {}    # name -> seconds since t0
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.t0
+
+    async def track(self, name: str, awaitable):
+        """
+        Await `awaitable` and record its start/end times under `name`.
+        The phase counts as failed if it raises or returns False.
+        """
+        start = self.elapsed()
+        ok = False
+        try:
+            result = await awaitable
+            ok = result is not False
+            return result
+        finally:
+            self.phases[name] = (start, self.elapsed(), ok)
+
+    def mark(self, name: str):
+        """Record a milestone once (later calls are ignored)."""
+        self.marks.setdefault(name, self.elapsed())
+
+    def report(self) -> str:
+        lines = ["[Startup] Phase breakdown (seconds since launch):"]
+        for name, (start, end, ok) in sorted(self.phases.items(), key=lambda p: p[1][0]):
+            status = "" if ok else "  (failed)"
+            lines.append(f"  {name:<24} {start:7.2f} → {end:7.2f}  ({end - start:6.2f}s){status}")
+        if self.phases:
+            serial_sum = sum(end - start for start, end, _ in self.phases.values())
+            wall = max(end for _, end, _ in self.phases.values())
+            lines.append(f"  {'ready':<24} {wall:7.2f}s  (sequential sum would be {serial_sum:.2f}s)")
+        for name, t in sorted(self.marks.items(), key=lambda m: m[1]):
+            lines.append(f"  {name:<24} {t:7.2f}s")
+        return "\n".join(lines)
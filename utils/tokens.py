@@ -0,0 +1,84 @@
+# utils/tokens.py
+"""
+Tokenizer-free token estimates, for prompt budgets and prefill metrics.
+Starts at roughly 4 characters per token (llama/phi tokenizers on English
+text) and calibrates against the prompt_eval_count Ollama reports.
+"""
+from collections import deque
+
+CHARS_PER_TOKEN = 4.0
+MESSAGE_OVERHEAD = 4  # role markers the chat template adds around each message
+
+
+class TokenEstimator:
+    """
+    Characters-per-token estimate calibrated from Ollama's own counts.
+    A KV-cache hit makes prompt_eval_count cover only part of the prompt, so
+    each observation is a lower bound on tokens per character: the estimator
+    uses the densest ratio among the last `window` observations, which errs
+    on the side of overestimating but recovers once a dense prompt (numbers,
+    JSON) has aged out.
+    """
+
+    def __init__(self, chars_per_token: float = CHARS_PER_TOKEN, min_chars: int = 200,
+                 bounds: tuple = (2.0, 6.0), window: int = 32):
+        self.chars_per_token = chars_per_token
+        self.min_chars = min_chars      # ignore prompts too short to say much
+        self.bounds = bounds            # sanity range for the calibrated ratio
+        self.calibrated = False
+        self._ratios = deque(maxlen=window)
+
+    def estimate(self, text: str) -> int:
+        if not text:
+            return 0
+        return max(1, round(len(text) / self.chars_per_token))
+
+    def chars_for(self, tokens: int) -> int:
+        """How many characters fit in `tokens`."""
+        return max(0, int(tokens * self.chars_per_token))
+
+    def truncate(self, text: str, tokens: int, keep: str = "start") -> str:
+        """Cut `text` to about `tokens` tokens, keeping its start or its end."""
+        limit = self.chars_for(tokens)
+        if len(text) <= limit:
+            return text
+        if limit <= 3:
+            return ""
+        return text[:limit - 3] + "..." if keep == "start" else "..." + text[-(limit - 3):]
+
+    def observe(self, chars: int, tokens: int):
+        """Calibrate from a prompt of `chars` characters that Ollama prefilled as `tokens`."""
+        if chars < self.min_chars or tokens <= 0:
+            return
+        ratio = chars / tokens
+        if ratio > self.bounds[1]:
+            return  # mostly served from the KV cache: says nothing about density
+        self._ratios.append(max(ratio, self.bounds[0]))
+        self.chars_per_token = min(self._ratios)
+        self.calibrated = True
+
+
+estimator = TokenEstimator()
+
+
+def estimate_tokens(text: str) -> int:
+    return estimator.estimate(text)
+
+
+def prompt_chars(payload: dict) -> int:
+    """Characters of prompt text in an /api/generate or /api/chat payload."""
+    if "messages" in payload:
+        return sum(len(m.get("content", "")) for m in payload["messages"])
+    return len(payload.get("system", "")) + len(payload.get("prompt", ""))
+
+
+def template_tokens(payload: dict) -> int:
+    """Tokens the chat template adds on top of the message text."""
+    return MESSAGE_OVERHEAD * len(payload.get("messages", ()))
+
+
+def estimate_prompt_tokens(payload: dict) -> int:
+    """Estimated prompt size of an /api/generate or /api/chat payload."""
+    if "messages" in payload:
+        return sum(estimate_tokens(m.get("content", "")) for m in payload["messages"]) + template_tokens(payload)
+    return estimate_tokens(payload.get("system", "")) + estimate_tokens(payload.get("prompt", ""))
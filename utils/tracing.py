@@ -0,0 +1,157 @@
+# utils/tracing.py
+"""
+Lightweight tracing: spans and observed values aggregated into fixed-bucket
+histograms, plus counters and scrape-time gauges, rendered as Prometheus
+text for GET /metrics.
+- A span costs two perf_counter() calls, a dict lookup and a bisect, so it
+  can stay on in production; nothing is kept per event
+- Spans are plain context managers and can wrap awaits
+- Label values should come from a small fixed set (stage, model, class)
+"""
+import bisect
+import time
+from contextlib import contextmanager
+
+# Latency buckets (s): 0.5 ms .. 60 s
+SECONDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKENS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+RATES = (1, 2, 5, 10, 20, 30, 50, 75, 100, 200)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Tracer:
+    def __init__(self, prefix: str = "robot", enabled: bool = True):
+        self.prefix = prefix
+        self.enabled = enabled
+        self._families = {}   # name -> (kind, help, buckets)
+        self._series = {}     # (name, labels) -> Histogram or [value]
+        self._gauges = {}     # name -> (help, fn returning a number or {labels: number})
+
+        self.histogram("stage_seconds", "Time spent in each pipeline stage.", SECONDS)
+
+    # --------------------------------------------------------------
+    # Declaration
+    # --------------------------------------------------------------
+    def histogram(self, name: str, help: str, buckets=SECONDS):
+        self._families[name] = ("histogram", help, tuple(buckets))
+
+    def counter(self, name: str, help: str):
+        self._families[name] = ("counter", help, None)
+
+    def gauge(self, name: str, help: str, fn):
+        """Read `fn()` at scrape time: a number, or a dict of {label tuple: number}."""
+        self._gauges[name] = (help, fn)
+
+    # --------------------------------------------------------------
+    # Recording
+    # --------------------------------------------------------------
+    @contextmanager
+    def span(self, stage: str):
+        """Time the block into stage_seconds{stage=...}."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - start, stage=stage)
+
+    def observe(self, name: str, value: float, **labels):
+        if not self.enabled or value is None:
+            return
+        key = (name, tuple(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = Histogram(self._families[name][2])
+        series.observe(value)
+
+    def inc(self, name: str, value: float = 1, **labels):
+        if not self.enabled or not value:
+            return
+        key = (name, tuple(labels.items()))
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = [0]
+        series[0] += value
+
+    # --------------------------------------------------------------
+    # Exposition
+    # --------------------------------------------------------------
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        by_name = {}
+        for (name, labels), series in self._series.items():
+            by_name.setdefault(name, []).append((labels, series))
+
+        out = []
+        for name, (kind, help, buckets) in self._families.items():
+            full = f"{self.prefix}_{name}"
+            out.append(f"# HELP {full} {help}")
+            out.append(f"# TYPE {full} {kind}")
+            for labels, series in sorted(by_name.get(name, ()), key=lambda s: s[0]):
+                if kind == "counter":
+                    out.append(f"{full}{_labels(labels)} {_num(series[0])}")
+                    continue
+                cumulative = 0
+                for le, n in zip(buckets + ("+Inf",), series.counts):
+                    cumulative += n
+                    out.append(f"{full}_bucket{_labels(labels + (('le', _num(le)),))} {cumulative}")
+                out.append(f"{full}_sum{_labels(labels)} {_num(series.sum)}")
+                out.append(f"{full}_count{_labels(labels)} {series.count}")
+
+        for name, (help, fn) in self._gauges.items():
+            full = f"{self.prefix}_{name}"
+            try:
+                value = fn()
+            except Exception as e:
+                out.append(f"# {full} unavailable: {e}")
+                continue
+            out.append(f"# HELP {full} {help}")
+            out.append(f"# TYPE {full} gauge")
+            values = value.items() if isinstance(value, dict) else [((), value)]
+            for labels, v in values:
+                out.append(f"{full}{_labels(labels)} {_num(v)}")
+        return "\n".join(out) + "\n"
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        k + '="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for k, v in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _num(v) -> str:
+    if isinstance(v, str):
+        return v
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+# ---------------------------------------------------------------------
+# Shared instance
+# ---------------------------------------------------------------------
+tracer = Tracer()
+tracer.histogram("llm_queue_wait_seconds", "Time LLM requests waited for a scheduler slot.")
+tracer.histogram("llm_ttft_seconds", "Time to first token per Ollama request.")
+tracer.histogram("llm_request_seconds", "Total time per Ollama request.")
+tracer.histogram("llm_tokens_per_second", "Generation rate per Ollama request.", RATES)
+tracer.histogram("llm_prompt_eval_tokens", "Prompt tokens Ollama prefilled per request.", TOKENS)
+tracer.counter("llm_prompt_tokens_saved_total", "Prompt tokens served from the KV cache (estimate).")
+tracer.counter("llm_requests_total", "Ollama requests by model.")
+tracer.histogram("memory_encode_batch", "Fragments per memory encode batch.", (1, 2, 4, 8, 16, 32, 64))
@@ -0,0 +1,89 @@
+# utils/trigger.py
+"""
+Event-driven pacing for reasoning cycles.
+Cycles start when something happens (a large sensor change, a new summary,
+client input) no sooner than min_interval apart; with nothing happening
+the idle interval starts at loop_interval and backs off up to max_interval.
+"""
+import asyncio
+import time
+from collections import Counter
+
+
+class ReasoningTrigger:
+    def __init__(self, interval: float = 3.0, min_interval: float = 0.5,
+                 max_interval: float = 30.0, backoff: float = 2.0):
+        self.base_interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = interval      # current idle interval
+        self._event = asyncio.Event()
+        self._reasons = []
+        self._last_cycle = None
+        self._watched = []            # (store, thresholds, reference values)
+
+        self.cycles = 0
+        self.by_reason = Counter()
+
+    # --------------------------------------------------------------
+    def notify(self, reason: str):
+        """Ask for a reasoning cycle as soon as min_interval allows."""
+        self._reasons.append(reason)
+        self._event.set()
+
+    def watch(self, store, thresholds: dict):
+        """
+        Notify when a channel of a TimeSeriesStore moves more than its
+        threshold away from its value at the start of the last cycle.
+        """
+        refs = {}
+        self._watched.append((store, thresholds, refs))
+
+        def on_sample(name, value, t):
+            limit = thresholds.get(name)
+            if limit is None:
+                return
+            ref = refs.setdefault(name, value)
+            if abs(value - ref) > limit:
+                refs[name] = value  # one notification per excursion
+                self.notify(f"{name} {ref:g} -> {value:g}")
+
+        store.subscribe(on_sample)
+
+    async def wait(self) -> list:
+        """Sleep until the next cycle is due; returns why it was started."""
+        if self._last_cycle is not None:
+            since = time.monotonic() - self._last_cycle
+            if since < self.min_interval:
+                await asyncio.sleep(self.min_interval - since)
+            try:
+                remaining = self.interval - (time.monotonic() - self._last_cycle)
+                await asyncio.wait_for(self._event.wait(), max(0.0, remaining))
+            except asyncio.TimeoutError:
+                pass
+
+        reasons, self._reasons = self._reasons or ["timer"], []
+        self._event.clear()
+        if reasons == ["timer"] and self._last_cycle is not None:
+            self.interval = min(self.max_interval, self.interval * self.backoff)  # quiet: slow down
+        else:
+            self.interval = self.base_interval
+
+        self._last_cycle = time.monotonic()
+        self._snapshot()
+        self.cycles += 1
+        self.by_reason.update(r.split(" ")[0] for r in reasons)
+        return reasons
+
+    def stats(self) -> dict:
+        return {"cycles": self.cycles, "interval_s": self.interval, "by_reason": dict(self.by_reason)}
+
+    # --------------------------------------------------------------
+    def _snapshot(self):
+        """Sensor deltas are measured against the state the cycle starts from."""
+        for store, thresholds, refs in self._watched:
+            for name in thresholds:
+                latest = store.channels[name].latest() if name in store.channels else None
+                if latest is not None:
+                    refs[name] = latest[1]
@@ -1,22 +1,154 @@
 # web/server.py
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
 import asyncio
+import json
+
+from utils.logger import FrameQueue
+from utils.settings import load_settings
+from utils.tracing import tracer
 
 app = FastAPI()
 
+TOPICS = ("reasoning", "summarizer", "sensors")
+DROP = "drop"
+DISCONNECT = "disconnect"
+
+
+class _Client:
+    def __init__(self, websocket: WebSocket, topics: set, queue_size: int):
+        self.websocket = websocket
+        self.topics = topics
+        self.queue = FrameQueue(queue_size)
+        self.overflowed = False
+
+
+class BroadcastHub:
+    """
+    Pub/sub fan-out to every connected WebSocket client.
+    - publish() never blocks: each client has its own bounded queue and
+      sender task, so a slow client cannot stall the producer or the others
+    - slow_client="drop" drops that client's oldest frames (it is told how
+      many on its next frame); "disconnect" closes it instead
+    - clients pick topics with /ws?topics=reasoning,sensors (default:
+      reasoning). Reasoning frames are plain text, other topics are JSON
+      {"topic": ..., "data": ...}
+    """
+
+    def __init__(self, queue_size: int = 256, slow_client: str = DROP):
+        if slow_client not in (DROP, DISCONNECT):
+            raise ValueError(f"Unknown slow client policy: {slow_client}")
+        self.queue_size = queue_size
+        self.slow_client = slow_client
+        self.clients = set()
+        self.published = 0
+        self.disconnected = 0    # clients closed for falling behind
+        self._sent_gone = 0      # frames sent / dropped to clients that have since left
+        self._dropped_gone = 0
+
+    def publish(self, frame, topic: str = "reasoning"):
+        if topic != "reasoning":
+            frame = json.dumps({"topic": topic, "data": frame})
+        self.published += 1
+        for client in self.clients:
+            if topic not in client.topics or client.overflowed:
+                continue
+            if self.slow_client == DISCONNECT and client.queue.full():
+                client.overflowed = True
+                self.disconnected += 1
+                asyncio.get_running_loop().create_task(client.websocket.close(code=1013))
+                continue
+            client.queue.put_nowait(frame)
+
+    def channel(self, topic: str) -> "_Channel":
+        """Queue-like publisher for one topic (what BroadcastLogger writes to)."""
+        return _Channel(self, topic)
+
+    def add(self, websocket: WebSocket, topics: set) -> _Client:
+        client = _Client(websocket, topics, self.queue_size)
+        self.clients.add(client)
+        return client
+
+    def remove(self, client: _Client):
+        if client in self.clients:
+            self.clients.discard(client)
+            self._sent_gone += client.queue.sent
+            self._dropped_gone += client.queue.dropped
+
+    @property
+    def sent(self) -> int:
+        return self._sent_gone + sum(c.queue.sent for c in self.clients)
+
+    @property
+    def dropped(self) -> int:
+        return self._dropped_gone + sum(c.queue.dropped for c in self.clients)
+
+    def stats(self) -> dict:
+        return {
+            "clients": len(self.clients),
+            "published": self.published,
+            "frames_sent": self.sent,
+            "frames_dropped": self.dropped,
+            "disconnected_slow": self.disconnected,
+        }
+
+
+class _Channel:
+    def __init__(self, hub: BroadcastHub, topic: str):
+        self.hub = hub
+        self.topic = topic
+
+    def put_nowait(self, frame):
+        self.hub.publish(frame, self.topic)
+
+    async def put(self, frame):
+        self.hub.publish(frame, self.topic)
+
+    def qsize(self) -> int:
+        return max((c.queue.qsize() for c in self.hub.clients), default=0)
+
+    @property
+    def sent(self) -> int:
+        return self.hub.sent
+
+    @property
+    def dropped(self) -> int:
+        return self.hub.dropped
+
+
+_settings = load_settings()
+hub = BroadcastHub(
+    queue_size=_settings.get("ws_queue_size", 256),
+    slow_client=_settings.get("ws_slow_client", DROP),
+)
+
 input_queue = asyncio.Queue()
-output_queue = asyncio.Queue()
+output_queue = hub.channel("reasoning")
+
+tracer.gauge("ws_clients", "Connected WebSocket clients.", lambda: len(hub.clients))
+tracer.gauge("ws_frames_dropped", "Frames dropped for slow WebSocket clients.", lambda: hub.dropped)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Stage histograms and counters in Prometheus text format."""
+    return PlainTextResponse(tracer.render(), media_type="text/plain; version=0.0.4")
+
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
-    print("[WebSocket] Client connected.")
+    requested = websocket.query_params.get("topics", "reasoning")
+    topics = {t for t in requested.split(",") if t in TOPICS} or {"reasoning"}
+    client = hub.add(websocket, topics)
+    print(f"[WebSocket] Client connected ({', '.join(sorted(topics))}); {len(hub.clients)} total.")
 
     async def sender():
         try:
             while True:
-                msg = await output_queue.get()
+                msg = await client.queue.get()
                 await websocket.send_text(msg)
+                client.queue.mark_sent()
         except WebSocketDisconnect:
             print("[WebSocket] Client disconnected during send.")
         except Exception as e:
@@ -32,9 +164,10 @@ async def websocket_endpoint(websocket: WebSocket):
         except Exception as e:
             print(f"[WebSocket] Receiver error: {e}")
 
+    send_task = asyncio.create_task(sender())
     try:
-        await asyncio.gather(sender(), receiver())
-    except WebSocketDisconnect:
-        print("[WebSocket] Client disconnected (main).")
+        await receiver()  # returns once the client goes away (or is closed as too slow)
     finally:
-        print("[WebSocket] Connection closed cleanly.")
\ No newline at end of file
+        send_task.cancel()
+        hub.remove(client)
+        print("[WebSocket] Connection closed cleanly.")